@@ -0,0 +1,55 @@
+"""create a table for content addressed image blobs
+
+Revision ID: b3c1d7e9f2a4
+Revises: 40400f64bfb9
+Create Date: 2026-10-19 10:30:12.418263
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "b3c1d7e9f2a4"
+down_revision: Union[str, None] = "40400f64bfb9"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "image_blob",
+        sa.Column("name", sa.String(length=80), nullable=False),
+        sa.Column("size", sa.BigInteger(), nullable=False),
+        sa.Column(
+            "ref_count", sa.Integer(), server_default=sa.text("0"), nullable=False
+        ),
+        sa.Column(
+            "created_at",
+            sa.TIMESTAMP(timezone=True),
+            server_default=sa.text("NOW()"),
+            nullable=False,
+        ),
+        sa.Column(
+            "last_uploaded_at",
+            sa.TIMESTAMP(timezone=True),
+            server_default=sa.text("NOW()"),
+            nullable=False,
+        ),
+        sa.PrimaryKeyConstraint("name"),
+    )
+    # gc scans for unreferenced blobs past the grace period
+    op.create_index(
+        "image_blob_unreferenced_idx",
+        "image_blob",
+        ["last_uploaded_at"],
+        postgresql_where=sa.text("ref_count = 0"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("image_blob_unreferenced_idx", table_name="image_blob")
+    op.drop_table("image_blob")
@@ -0,0 +1,43 @@
+"""add indexes for keyset comment pages
+
+Revision ID: 4f6a2c8d1e90
+Revises: b3c1d7e9f2a4
+Create Date: 2026-10-19 14:15:41.207385
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "4f6a2c8d1e90"
+down_revision: Union[str, None] = "b3c1d7e9f2a4"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # comment page, newest first by id within a post
+    op.create_index(
+        "comment_post_id_id_idx",
+        "comment",
+        ["post_id", sa.text("id DESC")],
+        postgresql_where=sa.text("is_deleted = false"),
+    )
+    # like count and curr user like flag per comment
+    op.create_index(
+        "comment_like_comment_id_user_id_active_idx",
+        "comment_like",
+        ["comment_id", "user_id"],
+        postgresql_where=sa.text("status = 'ACT' AND is_deleted = false"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(
+        "comment_like_comment_id_user_id_active_idx", table_name="comment_like"
+    )
+    op.drop_index("comment_post_id_id_idx", table_name="comment")
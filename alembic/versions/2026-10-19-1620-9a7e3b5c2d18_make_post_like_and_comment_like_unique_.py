@@ -0,0 +1,95 @@
+"""make post_like and comment_like unique per user and post/comment
+
+Revision ID: 9a7e3b5c2d18
+Revises: 4f6a2c8d1e90
+Create Date: 2026-10-19 16:20:09.631544
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "9a7e3b5c2d18"
+down_revision: Union[str, None] = "4f6a2c8d1e90"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# keep one row per user and post/comment, active like first, then hidden, then the latest
+def remove_duplicate_likes(table: str, target_column: str):
+    op.execute(
+        f"""
+        DELETE FROM {table}
+        USING (
+            SELECT
+                id,
+                ROW_NUMBER() OVER (
+                    PARTITION BY user_id, {target_column}
+                    ORDER BY
+                        is_deleted ASC,
+                        (status = 'ACT') DESC,
+                        (status = 'HID') DESC,
+                        COALESCE(updated_at, created_at) DESC
+                ) AS row_num
+            FROM {table}
+        ) AS ranked_likes
+        WHERE {table}.id = ranked_likes.id AND ranked_likes.row_num > 1
+        """
+    )
+
+
+def upgrade() -> None:
+    # post_like
+    remove_duplicate_likes("post_like", "post_id")
+    op.drop_constraint(
+        "post_like_post_id_user_id_status_created_at_key",
+        "post_like",
+        type_="unique",
+    )
+    op.create_unique_constraint(
+        "post_like_user_id_post_id_key",
+        "post_like",
+        ["user_id", "post_id"],
+    )
+
+    # comment_like
+    remove_duplicate_likes("comment_like", "comment_id")
+    op.drop_constraint(
+        "comment_like_comment_id_user_id_status_created_at_key",
+        "comment_like",
+        type_="unique",
+    )
+    op.create_unique_constraint(
+        "comment_like_user_id_comment_id_key",
+        "comment_like",
+        ["user_id", "comment_id"],
+    )
+
+
+# removed duplicate history rows are not restored
+def downgrade() -> None:
+    # comment_like
+    op.drop_constraint(
+        "comment_like_user_id_comment_id_key",
+        "comment_like",
+        type_="unique",
+    )
+    op.create_unique_constraint(
+        "comment_like_comment_id_user_id_status_created_at_key",
+        "comment_like",
+        ["comment_id", "user_id", "status", "created_at"],
+    )
+
+    # post_like
+    op.drop_constraint(
+        "post_like_user_id_post_id_key",
+        "post_like",
+        type_="unique",
+    )
+    op.create_unique_constraint(
+        "post_like_post_id_user_id_status_created_at_key",
+        "post_like",
+        ["post_id", "user_id", "status", "created_at"],
+    )
@@ -0,0 +1,57 @@
+"""create job checkpoint table and indexes for chunked jobs
+
+Revision ID: 6d2b8e4f1a37
+Revises: 9a7e3b5c2d18
+Create Date: 2026-10-19 19:00:12.514930
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import UUID
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "6d2b8e4f1a37"
+down_revision: Union[str, None] = "9a7e3b5c2d18"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "job_checkpoint",
+        sa.Column("job_name", sa.String(length=100), nullable=False),
+        sa.Column("last_id", UUID(as_uuid=True), nullable=True),
+        sa.Column(
+            "updated_at",
+            sa.TIMESTAMP(timezone=True),
+            nullable=False,
+            server_default=sa.text("NOW()"),
+        ),
+        sa.PrimaryKeyConstraint("job_name"),
+    )
+    # latest auth track/account history entry per user for the chunked jobs
+    op.create_index(
+        "user_auth_track_user_id_created_at_idx",
+        "user_auth_track",
+        ["user_id", sa.text("created_at DESC")],
+    )
+    op.create_index(
+        "user_account_history_user_id_created_at_idx",
+        "user_account_history",
+        ["user_id", sa.text("created_at DESC")],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(
+        "user_account_history_user_id_created_at_idx",
+        table_name="user_account_history",
+    )
+    op.drop_index(
+        "user_auth_track_user_id_created_at_idx", table_name="user_auth_track"
+    )
+    op.drop_table("job_checkpoint")
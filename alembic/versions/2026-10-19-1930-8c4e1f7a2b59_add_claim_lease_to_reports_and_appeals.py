@@ -0,0 +1,56 @@
+"""add claim lease to reports and appeals
+
+Revision ID: 8c4e1f7a2b59
+Revises: 6d2b8e4f1a37
+Create Date: 2026-10-19 19:30:47.081263
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "8c4e1f7a2b59"
+down_revision: Union[str, None] = "6d2b8e4f1a37"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "user_content_report_detail",
+        sa.Column("lease_expires_at", sa.TIMESTAMP(timezone=True), nullable=True),
+    )
+    op.add_column(
+        "user_content_restrict_ban_appeal_detail",
+        sa.Column("lease_expires_at", sa.TIMESTAMP(timezone=True), nullable=True),
+    )
+    # work queue candidates, open cases not yet reviewed
+    op.create_index(
+        "user_content_report_detail_open_queue_idx",
+        "user_content_report_detail",
+        ["created_at"],
+        postgresql_where=sa.text("status = 'OPN' AND is_deleted = false"),
+    )
+    op.create_index(
+        "user_content_restrict_ban_appeal_detail_open_queue_idx",
+        "user_content_restrict_ban_appeal_detail",
+        ["created_at"],
+        postgresql_where=sa.text("status = 'OPN' AND is_deleted = false"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(
+        "user_content_restrict_ban_appeal_detail_open_queue_idx",
+        table_name="user_content_restrict_ban_appeal_detail",
+    )
+    op.drop_index(
+        "user_content_report_detail_open_queue_idx",
+        table_name="user_content_report_detail",
+    )
+    op.drop_column("user_content_restrict_ban_appeal_detail", "lease_expires_at")
+    op.drop_column("user_content_report_detail", "lease_expires_at")
@@ -0,0 +1,130 @@
+"""aggregate open reports per item and reason
+
+Revision ID: 3f9a6d2c7e14
+Revises: 8c4e1f7a2b59
+Create Date: 2026-10-19 20:00:26.638190
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import UUID
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "3f9a6d2c7e14"
+down_revision: Union[str, None] = "8c4e1f7a2b59"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+OPEN_REPORT_KEY = """reported_item_id, reported_item_type, report_reason,
+    COALESCE(report_reason_user_id, '00000000-0000-0000-0000-000000000000'::uuid)"""
+
+
+def upgrade() -> None:
+    op.create_table(
+        "user_content_report_reporter",
+        sa.Column("report_id", UUID(as_uuid=True), nullable=False),
+        sa.Column("reporter_user_id", UUID(as_uuid=True), nullable=False),
+        sa.Column(
+            "created_at",
+            sa.TIMESTAMP(timezone=True),
+            nullable=False,
+            server_default=sa.text("NOW()"),
+        ),
+        sa.PrimaryKeyConstraint("report_id", "reporter_user_id"),
+        sa.ForeignKeyConstraint(
+            ["report_id"], ["user_content_report_detail.id"], ondelete="CASCADE"
+        ),
+        sa.ForeignKeyConstraint(["reporter_user_id"], ["user.id"], ondelete="CASCADE"),
+    )
+    op.create_index(
+        "user_content_report_reporter_reporter_user_id_idx",
+        "user_content_report_reporter",
+        ["reporter_user_id"],
+    )
+    op.add_column(
+        "user_content_report_detail",
+        sa.Column(
+            "reporter_count",
+            sa.Integer(),
+            nullable=False,
+            server_default=sa.text("1"),
+        ),
+    )
+
+    # every existing report has its reporter
+    op.execute(
+        """
+        INSERT INTO user_content_report_reporter
+            (report_id, reporter_user_id, created_at)
+        SELECT id, reporter_user_id, created_at FROM user_content_report_detail
+        """
+    )
+
+    # merge duplicate open reports into the oldest one, the others are closed
+    op.execute(
+        f"""
+        CREATE TEMPORARY TABLE duplicate_open_report ON COMMIT DROP AS
+        SELECT id, keep_id FROM (
+            SELECT id, first_value(id) OVER (
+                PARTITION BY {OPEN_REPORT_KEY} ORDER BY case_number
+            ) AS keep_id
+            FROM user_content_report_detail
+            WHERE status = 'OPN' AND is_deleted = false
+        ) AS ranked
+        WHERE id != keep_id
+        """
+    )
+    op.execute(
+        """
+        INSERT INTO user_content_report_reporter
+            (report_id, reporter_user_id, created_at)
+        SELECT dup.keep_id, reporter.reporter_user_id, reporter.created_at
+        FROM duplicate_open_report AS dup
+        JOIN user_content_report_reporter AS reporter ON reporter.report_id = dup.id
+        ON CONFLICT DO NOTHING
+        """
+    )
+    op.execute(
+        """
+        UPDATE user_content_report_detail
+        SET status = 'CSD', moderator_note = 'DUP', updated_at = NOW()
+        WHERE id IN (SELECT id FROM duplicate_open_report)
+        """
+    )
+    op.execute(
+        """
+        UPDATE user_content_report_detail AS report
+        SET reporter_count = (
+            SELECT count(*) FROM user_content_report_reporter AS reporter
+            WHERE reporter.report_id = report.id
+        )
+        WHERE report.id IN (SELECT DISTINCT keep_id FROM duplicate_open_report)
+        """
+    )
+
+    # one open report per key, the report upsert targets this index
+    op.execute(
+        f"""
+        CREATE UNIQUE INDEX user_content_report_detail_open_report_idx
+        ON user_content_report_detail ({OPEN_REPORT_KEY})
+        WHERE status = 'OPN' AND is_deleted = false
+        """
+    )
+
+
+def downgrade() -> None:
+    # merged reports stay closed
+    op.drop_index(
+        "user_content_report_detail_open_report_idx",
+        table_name="user_content_report_detail",
+    )
+    op.drop_column("user_content_report_detail", "reporter_count")
+    op.drop_index(
+        "user_content_report_reporter_reporter_user_id_idx",
+        table_name="user_content_report_reporter",
+    )
+    op.drop_table("user_content_report_reporter")
@@ -0,0 +1,75 @@
+"""create user violation summary table
+
+Revision ID: a5d7c3e9b1f2
+Revises: 3f9a6d2c7e14
+Create Date: 2026-10-19 20:30:58.320417
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import UUID
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "a5d7c3e9b1f2"
+down_revision: Union[str, None] = "3f9a6d2c7e14"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COUNT_COLUMNS = (
+    "num_of_post_violations_no_restrict_ban",
+    "num_of_comment_violations_no_restrict_ban",
+    "num_of_account_violations_no_restrict_ban",
+    "total_num_of_violations_no_restrict_ban",
+    "num_of_partial_account_restrictions",
+    "num_of_full_account_restrictions",
+    "num_of_account_temporary_bans",
+    "num_of_account_permanent_bans",
+    "total_num_of_account_restrict_bans",
+)
+
+
+def upgrade() -> None:
+    # summaries are filled by the rebuild job, reads compute the counts meanwhile
+    op.create_table(
+        "user_violation_summary",
+        sa.Column("user_id", UUID(as_uuid=True), nullable=False),
+        *(
+            sa.Column(column, sa.Integer(), nullable=False, server_default="0")
+            for column in COUNT_COLUMNS
+        ),
+        sa.Column(
+            "updated_at",
+            sa.TIMESTAMP(timezone=True),
+            nullable=False,
+            server_default=sa.text("NOW()"),
+        ),
+        sa.PrimaryKeyConstraint("user_id"),
+        sa.ForeignKeyConstraint(["user_id"], ["user.id"], ondelete="CASCADE"),
+    )
+    # violation counts per reported user
+    op.create_index(
+        "user_content_report_detail_reported_user_id_idx",
+        "user_content_report_detail",
+        ["reported_user_id"],
+    )
+    op.create_index(
+        "user_restrict_ban_detail_report_id_idx",
+        "user_restrict_ban_detail",
+        ["report_id"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(
+        "user_restrict_ban_detail_report_id_idx",
+        table_name="user_restrict_ban_detail",
+    )
+    op.drop_index(
+        "user_content_report_detail_reported_user_id_idx",
+        table_name="user_content_report_detail",
+    )
+    op.drop_table("user_violation_summary")
@@ -0,0 +1,41 @@
+"""add last reduced at to guideline violation score
+
+Revision ID: b8e2f4a6c3d0
+Revises: a5d7c3e9b1f2
+Create Date: 2026-10-19 21:00:09.774126
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "b8e2f4a6c3d0"
+down_revision: Union[str, None] = "a5d7c3e9b1f2"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "guideline_violation_score",
+        sa.Column("last_reduced_at", sa.TIMESTAMP(timezone=True), nullable=True),
+    )
+    # resolved reports per user for the score reduction job
+    op.create_index(
+        "user_content_report_detail_resolved_user_id_updated_at_idx",
+        "user_content_report_detail",
+        ["reported_user_id", "updated_at"],
+        postgresql_where=sa.text("status = 'RSD' AND is_deleted = false"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(
+        "user_content_report_detail_resolved_user_id_updated_at_idx",
+        table_name="user_content_report_detail",
+    )
+    op.drop_column("guideline_violation_score", "last_reduced_at")
@@ -0,0 +1,49 @@
+"""add related case lookup indexes for report and appeal detail views
+
+Revision ID: c4f1a9e7d2b6
+Revises: b8e2f4a6c3d0
+Create Date: 2026-10-19 21:30:41.208613
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "c4f1a9e7d2b6"
+down_revision: Union[str, None] = "b8e2f4a6c3d0"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # related reports of the same item under review by a moderator, open reports of an
+    # item are already served by user_content_report_detail_open_report_idx
+    op.create_index(
+        "user_content_report_detail_under_review_item_idx",
+        "user_content_report_detail",
+        ["reported_item_id", "reported_item_type", "moderator_id"],
+        postgresql_where=sa.text("status = 'URV' AND is_deleted = false"),
+    )
+    # open appeals of the same content
+    op.create_index(
+        "user_content_restrict_ban_appeal_detail_content_status_idx",
+        "user_content_restrict_ban_appeal_detail",
+        ["content_id", "content_type", "status", "moderator_id"],
+        postgresql_include=["case_number"],
+        postgresql_where=sa.text("is_deleted = false"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(
+        "user_content_restrict_ban_appeal_detail_content_status_idx",
+        table_name="user_content_restrict_ban_appeal_detail",
+    )
+    op.drop_index(
+        "user_content_report_detail_under_review_item_idx",
+        table_name="user_content_report_detail",
+    )
@@ -0,0 +1,54 @@
+"""add attachment status and staging key to appeal
+
+Revision ID: d7a3c5e1f9b4
+Revises: c4f1a9e7d2b6
+Create Date: 2026-10-19 22:00:27.361592
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "d7a3c5e1f9b4"
+down_revision: Union[str, None] = "c4f1a9e7d2b6"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "user_content_restrict_ban_appeal_detail",
+        sa.Column("attachment_status", sa.String(length=3), nullable=True),
+    )
+    op.add_column(
+        "user_content_restrict_ban_appeal_detail",
+        sa.Column("attachment_staging_key", sa.String(), nullable=True),
+    )
+    # existing attachments were validated on upload
+    op.execute(
+        """
+        UPDATE user_content_restrict_ban_appeal_detail
+        SET attachment_status = 'RDY'
+        WHERE attachment IS NOT NULL
+        """
+    )
+    # pending attachments for the retry job
+    op.create_index(
+        "user_content_restrict_ban_appeal_detail_attachment_pending_idx",
+        "user_content_restrict_ban_appeal_detail",
+        ["created_at"],
+        postgresql_where=sa.text("attachment_status = 'PND' AND is_deleted = false"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(
+        "user_content_restrict_ban_appeal_detail_attachment_pending_idx",
+        table_name="user_content_restrict_ban_appeal_detail",
+    )
+    op.drop_column("user_content_restrict_ban_appeal_detail", "attachment_staging_key")
+    op.drop_column("user_content_restrict_ban_appeal_detail", "attachment_status")
@@ -0,0 +1,35 @@
+"""add active user session index for superseded session deactivation
+
+Revision ID: e2b9f6d4a8c1
+Revises: d7a3c5e1f9b4
+Create Date: 2026-10-19 22:30:52.106384
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "e2b9f6d4a8c1"
+down_revision: Union[str, None] = "d7a3c5e1f9b4"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # active sessions per user and device, for logout and the deactivation job
+    op.create_index(
+        "user_session_active_user_id_device_info_idx",
+        "user_session",
+        ["user_id", "device_info", "login_at"],
+        postgresql_where=sa.text("is_active = true AND is_deleted = false"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(
+        "user_session_active_user_id_device_info_idx", table_name="user_session"
+    )
@@ -0,0 +1,36 @@
+"""add version to post and user for etags
+
+Revision ID: f5c8a2d6b3e7
+Revises: e2b9f6d4a8c1
+Create Date: 2026-10-19 23:00:18.640271
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "f5c8a2d6b3e7"
+down_revision: Union[str, None] = "e2b9f6d4a8c1"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# bumped by the triggers in app/sql/function_trigger.sql
+def upgrade() -> None:
+    op.add_column(
+        "post",
+        sa.Column("version", sa.BigInteger(), nullable=False, server_default="0"),
+    )
+    op.add_column(
+        "user",
+        sa.Column("version", sa.BigInteger(), nullable=False, server_default="0"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("user", "version")
+    op.drop_column("post", "version")
@@ -7,9 +7,10 @@ from uuid import UUID
 
 from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query
 from fastapi import status as http_status
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from fastapi_mail.errors import ConnectionErrors
 from pydantic import EmailStr
-from sqlalchemy import func
+from sqlalchemy import and_, func
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import Session
 
@@ -30,8 +31,12 @@ from app.services import user as user_service
 from app.utils import auth as auth_utils
 from app.utils import basic as basic_utils
 from app.utils import email as email_utils
+from app.utils import export as export_utils
+from app.utils import image as image_utils
 from app.utils import log as log_utils
 from app.utils import map as map_utils
+from app.utils import metrics as metrics_utils
+from app.utils import notification as notification_utils
 from app.utils import operation as operation_utils
 
 router = APIRouter(prefix=settings.api_prefix + "/admin", tags=["Admin"])
@@ -40,7 +45,7 @@ router = APIRouter(prefix=settings.api_prefix + "/admin", tags=["Admin"])
 # reports dashboard
 @router.get(
     "/reports/dashboard",
-    response_model=list[admin_schema.AllReportResponse],
+    responses={200: {"model": list[admin_schema.AllReportResponse]}},
 )
 @auth_utils.authorize(["content_admin", "content_mgmt"])
 def get_reports_dashboard(
@@ -84,7 +89,7 @@ def get_reports_dashboard(
         return []
 
     all_reports_response = [
-        admin_schema.AllReportResponse(
+        admin_schema.AllReportResponse.construct(
             case_number=report.case_number,
             status=report.status,
             reported_at=report.created_at,
@@ -96,7 +101,8 @@ def get_reports_dashboard(
 
 
 @router.get(
-    "/reports/admin-dashboard", response_model=list[admin_schema.AllReportResponse]
+    "/reports/admin-dashboard",
+    responses={200: {"model": list[admin_schema.AllReportResponse]}},
 )
 @auth_utils.authorize(["content_admin"])
 def get_reports_admin_dashboard(
@@ -159,7 +165,7 @@ def get_reports_admin_dashboard(
 
     # prepare the response
     all_reports_response = [
-        admin_schema.AllReportResponse(
+        admin_schema.AllReportResponse.construct(
             case_number=report.case_number,
             status=report.status,
             reported_at=report.created_at,
@@ -195,7 +201,7 @@ def get_requested_report(
         and (not requested_report.moderator_id)
         and (
             current_employee.type
-            not in map_utils.transform_access_role(value="content_admin")
+            not in map_utils.access_role_types_dict["content_admin"]
         )
     ):
         raise HTTPException(
@@ -226,6 +232,7 @@ def get_requested_report(
     requested_report_data = {
         "case_number": requested_report.case_number,
         "reporter_user": requested_report.reporter_user.__dict__,
+        "reporter_count": requested_report.reporter_count,
         "reported_user": requested_report.reported_user.__dict__,
         "reported_item_type": requested_report.reported_item_type,
         "reported_item": (
@@ -263,7 +270,7 @@ def get_requested_report(
 # get all other open reports related to a particular content report
 @router.get(
     "/reports/{case_number}/related",
-    response_model=list[admin_schema.AllReportResponse],
+    responses={200: {"model": list[admin_schema.AllReportResponse]}},
 )
 @auth_utils.authorize(["content_admin", "content_mgmt"])
 def get_all_related_open_reports_for_specific_report(
@@ -335,7 +342,7 @@ def get_all_related_open_reports_for_specific_report(
     # loop through the list of UserContentReportDetail objects and get required params
     # create response object
     all_other_reports_response = [
-        admin_schema.AllReportResponse(
+        admin_schema.AllReportResponse.construct(
             case_number=report.case_number,
             status=report.status,
             reported_at=report.created_at,
@@ -373,23 +380,19 @@ def selected_reports_under_review_update(
     messages = []
     errors = []
 
-    for case_no in reports_request.case_number_list:
-        get_report_query = admin_service.get_a_report_query(
-            case_number=case_no, status_in_list=["OPN", "URV"], db_session=db
-        )
-        get_report = get_report_query.first()
-        if not get_report or get_report.moderator_id != curr_employee.id:
-            invalid_reports.append(case_no)
-        elif get_report.status == "URV":
-            already_urv_reports.append(case_no)
-        else:
-            get_report_query.update(
-                {"status": "URV"},
-                synchronize_session=False,
-            )
-            valid_reports.append(case_no)
-
+    case_number_list = list(dict.fromkeys(reports_request.case_number_list))
     try:
+        # open reports assigned to current employee are marked, all in one statement
+        reports = admin_service.bulk_transition_cases(
+            model=admin_model.UserContentReportDetail,
+            case_number_list=case_number_list,
+            status_in_list=["OPN", "URV"],
+            can_update=lambda report: and_(
+                report.status == "OPN", report.moderator_id == curr_employee.id
+            ),
+            values={"status": "URV", "lease_expires_at": None},
+            db_session=db,
+        )
         db.commit()
     except SQLAlchemyError as exc:
         db.rollback()
@@ -406,6 +409,21 @@ def selected_reports_under_review_update(
             detail=str(exc),
         ) from exc
 
+    reports_dict = {report.case_number: report for report in reports}
+    for case_no in case_number_list:
+        report = reports_dict.get(case_no)
+        if report and report.is_updated:
+            valid_reports.append(case_no)
+        elif not report or report.moderator_id != curr_employee.id:
+            invalid_reports.append(case_no)
+        else:
+            already_urv_reports.append(case_no)
+
+    if valid_reports:
+        metrics_utils.moderation_cases_reviewed_total.inc(
+            len(valid_reports), case_type="report", moderator=curr_employee.emp_id
+        )
+
     if is_func_call:
         return valid_reports
 
@@ -470,23 +488,17 @@ def selected_reports_assign_update(
     messages = []
     errors = []
 
-    for case_no in reports_request.case_number_list:
-        get_report_query = admin_service.get_a_report_query(
-            case_number=case_no, status_in_list=["OPN"], db_session=db
-        )
-        get_report = get_report_query.first()
-        if not get_report:
-            invalid_reports.append(case_no)
-        elif get_report.moderator_id:
-            already_assigned_reports.append(case_no)
-        else:
-            get_report_query.update(
-                {"moderator_id": moderator.id},
-                synchronize_session=False,
-            )
-            valid_reports.append(case_no)
-
+    case_number_list = list(dict.fromkeys(reports_request.case_number_list))
     try:
+        # unassigned open reports are assigned, all in one statement
+        reports = admin_service.bulk_transition_cases(
+            model=admin_model.UserContentReportDetail,
+            case_number_list=case_number_list,
+            status_in_list=["OPN"],
+            can_update=lambda report: report.moderator_id == None,
+            values={"moderator_id": moderator.id, "lease_expires_at": None},
+            db_session=db,
+        )
         db.commit()
     except SQLAlchemyError as exc:
         db.rollback()
@@ -503,6 +515,16 @@ def selected_reports_assign_update(
             detail=str(exc),
         ) from exc
 
+    reports_dict = {report.case_number: report for report in reports}
+    for case_no in case_number_list:
+        report = reports_dict.get(case_no)
+        if not report:
+            invalid_reports.append(case_no)
+        elif report.is_updated:
+            valid_reports.append(case_no)
+        else:
+            already_assigned_reports.append(case_no)
+
     if valid_reports:
         messages.append(
             f"{len(valid_reports)} report(s), case number(s): {valid_reports} is/are assigned to {moderator.emp_id}"
@@ -526,6 +548,76 @@ def selected_reports_assign_update(
     }
 
 
+# claim the next open reports from the work queue, most severe first
+# a claimed report goes back to the queue if not marked for review before lease expiry
+@router.post(
+    "/reports/claim",
+    responses={200: {"model": list[admin_schema.ClaimedReportResponse]}},
+)
+@auth_utils.authorize(["content_admin", "content_mgmt"])
+def claim_reports(
+    count: int = Query(10, ge=1, le=settings.moderation_claim_max_items),
+    db: Session = Depends(get_db),
+    logger: Logger = Depends(log_utils.get_logger),
+    current_employee: auth_schema.AccessTokenPayload = Depends(
+        auth_utils.get_current_user
+    ),
+):
+    # get current employee
+    curr_employee = employee_service.get_employee_by_work_email(
+        work_email=str(current_employee.email),
+        status_not_in_list=["SUP", "TER"],
+        db_session=db,
+    )
+
+    try:
+        claimed_reports = admin_service.claim_next_cases(
+            case_type="report",
+            limit=count,
+            moderator_id=curr_employee.id,
+            lease_minutes=settings.moderation_claim_lease_minutes,
+            report_reason_rank_dict=map_utils.report_reasons_severity_rank_dict,
+            db_session=db,
+        )
+        db.commit()
+    except SQLAlchemyError as exc:
+        db.rollback()
+        logger.error(exc, exc_info=True)
+        raise HTTPException(
+            status_code=http_status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error processing claim reports request",
+        ) from exc
+    except Exception as exc:
+        db.rollback()
+        logger.error(exc, exc_info=True)
+        raise HTTPException(
+            status_code=http_status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=str(exc),
+        ) from exc
+
+    if not claimed_reports:
+        return []
+
+    metrics_utils.moderation_cases_claimed_total.inc(
+        len(claimed_reports), case_type="report", moderator=curr_employee.emp_id
+    )
+    num_of_reclaimed = sum(1 for report in claimed_reports if report.is_reclaimed)
+    if num_of_reclaimed:
+        metrics_utils.moderation_cases_reclaimed_total.inc(
+            num_of_reclaimed, case_type="report", moderator=curr_employee.emp_id
+        )
+
+    return [
+        admin_schema.ClaimedReportResponse.construct(
+            case_number=report.case_number,
+            status=report.status,
+            reported_at=report.created_at,
+            lease_expires_at=report.lease_expires_at,
+        )
+        for report in claimed_reports
+    ]
+
+
 @router.patch("/reports/{case_number}/close")
 @auth_utils.authorize(["content_admin", "content_mgmt"])
 def close_report(
@@ -1143,6 +1235,10 @@ def enforce_report_action_auto(
                     },
                 )
 
+        admin_service.refresh_user_violation_summary(
+            user_id_list=[reported_user.id], db_session=db
+        )
+
         db.commit()
 
         if send_mail:
@@ -1174,6 +1270,16 @@ def enforce_report_action_auto(
             detail=str(exc),
         ) from exc
 
+    # notify the reported user if the stream is open
+    if not no_action:
+        notification_utils.notify_moderation_action(
+            user_id=reported_user.id,
+            case_number=action_request.case_number,
+            content_type=report.reported_item_type,
+            action=violation_status,
+            is_active=bool(is_active),
+        )
+
     moderator_note_full = map_utils.create_violation_moderator_notes(
         username=reported_user.username,
         moderator_note=report.moderator_note,
@@ -1663,6 +1769,10 @@ def enforce_report_action_manual(
         ):
             reported_user.status = action_request.action
 
+        admin_service.refresh_user_violation_summary(
+            user_id_list=[reported_user.id], db_session=db
+        )
+
         db.commit()
 
         # send email if action status is TBN/PBN and active action
@@ -1717,6 +1827,15 @@ def enforce_report_action_manual(
             detail=str(exc),
         ) from exc
 
+    # notify the reported user if the stream is open
+    notification_utils.notify_moderation_action(
+        user_id=reported_user.id,
+        case_number=action_request.case_number,
+        content_type=report.reported_item_type,
+        action=action_request.action,
+        is_active=bool(is_active),
+    )
+
     moderator_note_full = map_utils.create_violation_moderator_notes(
         username=reported_user.username,
         moderator_note=report.moderator_note,
@@ -1741,7 +1860,8 @@ def enforce_report_action_manual(
 
 # reports admin dashboard
 @router.get(
-    "/appeals/admin-dashboard", response_model=list[admin_schema.AllAppealResponse]
+    "/appeals/admin-dashboard",
+    responses={200: {"model": list[admin_schema.AllAppealResponse]}},
 )
 @auth_utils.authorize(["content_admin"])
 def get_appeals_admin_dashboard(
@@ -1803,7 +1923,7 @@ def get_appeals_admin_dashboard(
 
     # prepare the response
     all_appeals_response = [
-        admin_schema.AllAppealResponse(
+        admin_schema.AllAppealResponse.construct(
             case_number=appeal.case_number,
             status=appeal.status,
             appealed_at=appeal.created_at,
@@ -1817,7 +1937,7 @@ def get_appeals_admin_dashboard(
 # appeal dashboard
 @router.get(
     "/appeals/dashboard",
-    response_model=list[admin_schema.AllAppealResponse],
+    responses={200: {"model": list[admin_schema.AllAppealResponse]}},
 )
 @auth_utils.authorize(["content_admin", "content_mgmt"])
 def get_appeals_dashboard(
@@ -1861,7 +1981,7 @@ def get_appeals_dashboard(
         return []
 
     all_appeals_response = [
-        admin_schema.AllAppealResponse(
+        admin_schema.AllAppealResponse.construct(
             case_number=report.case_number,
             status=report.status,
             appealed_at=report.created_at,
@@ -1897,7 +2017,7 @@ def get_requested_appeal(
         and (not requested_appeal.moderator_id)
         and (
             current_employee.type
-            not in map_utils.transform_access_role(value="content_admin")
+            not in map_utils.access_role_types_dict["content_admin"]
         )
     ):
         raise HTTPException(
@@ -1918,6 +2038,10 @@ def get_requested_appeal(
         ),
         "appeal_detail": requested_appeal.appeal_detail,
         "attachment": requested_appeal.attachment,
+        "attachment_url": image_utils.get_appeal_attachment_url(
+            requested_appeal.attachment
+        ),
+        "attachment_status": requested_appeal.attachment_status,
         "status": requested_appeal.status,
         "moderator_note": requested_appeal.moderator_note,
         "moderator": (
@@ -1933,7 +2057,7 @@ def get_requested_appeal(
 # get related open appeals for a specific appeal
 @router.get(
     "/appeals/{case_number}/related",
-    response_model=list[admin_schema.AllAppealResponse],
+    responses={200: {"model": list[admin_schema.AllAppealResponse]}},
 )
 @auth_utils.authorize(["content_admin", "content_mgmt"])
 def get_all_related_open_appeals_for_specific_appeal(
@@ -1994,7 +2118,7 @@ def get_all_related_open_appeals_for_specific_appeal(
         return []
 
     all_other_appeals_response = [
-        admin_schema.AllAppealResponse(
+        admin_schema.AllAppealResponse.construct(
             case_number=appeal.case_number,
             status=appeal.status,
             appealed_at=appeal.created_at,
@@ -2031,27 +2155,19 @@ def selected_appeals_under_review_update(
     already_urv_appeals = []
     messages = []
     errors = []
-    for case_no in appeals_request.case_number_list:
-        get_appeal_query = admin_service.get_an_appeal_query(
-            case_no, ["OPN", "URV"], db
-        )
-        get_appeal = get_appeal_query.first()
-        if (
-            not get_appeal
-            or not get_appeal.moderator_id
-            or get_appeal.moderator_id != curr_employee.id
-        ):
-            invalid_appeals.append(case_no)
-        elif get_appeal.status == "URV":
-            already_urv_appeals.append(case_no)
-        else:
-            get_appeal_query.update(
-                {"status": "URV"},
-                synchronize_session=False,
-            )
-            valid_appeals.append(case_no)
-
+    case_number_list = list(dict.fromkeys(appeals_request.case_number_list))
     try:
+        # open appeals assigned to current employee are marked, all in one statement
+        appeals = admin_service.bulk_transition_cases(
+            model=admin_model.UserContentRestrictBanAppealDetail,
+            case_number_list=case_number_list,
+            status_in_list=["OPN", "URV"],
+            can_update=lambda appeal: and_(
+                appeal.status == "OPN", appeal.moderator_id == curr_employee.id
+            ),
+            values={"status": "URV", "lease_expires_at": None},
+            db_session=db,
+        )
         db.commit()
     except SQLAlchemyError as exc:
         db.rollback()
@@ -2068,6 +2184,21 @@ def selected_appeals_under_review_update(
             detail=str(exc),
         ) from exc
 
+    appeals_dict = {appeal.case_number: appeal for appeal in appeals}
+    for case_no in case_number_list:
+        appeal = appeals_dict.get(case_no)
+        if appeal and appeal.is_updated:
+            valid_appeals.append(case_no)
+        elif not appeal or appeal.moderator_id != curr_employee.id:
+            invalid_appeals.append(case_no)
+        else:
+            already_urv_appeals.append(case_no)
+
+    if valid_appeals:
+        metrics_utils.moderation_cases_reviewed_total.inc(
+            len(valid_appeals), case_type="appeal", moderator=curr_employee.emp_id
+        )
+
     if is_func_call:
         return valid_appeals
 
@@ -2132,23 +2263,17 @@ def selected_appeals_assign_update(
     already_assign_appeals = []
     messages = []
     errors = []
-    for case_no in appeals_request.case_number_list:
-        get_appeal_query = admin_service.get_an_appeal_query(
-            case_number=case_no, status_in_list=["OPN"], db_session=db
-        )
-        get_appeal = get_appeal_query.first()
-        if not get_appeal:
-            invalid_appeals.append(case_no)
-        elif get_appeal.moderator_id:
-            already_assign_appeals.append(case_no)
-        else:
-            get_appeal_query.update(
-                {"moderator_id": moderator.id},
-                synchronize_session=False,
-            )
-            valid_appeals.append(case_no)
-
+    case_number_list = list(dict.fromkeys(appeals_request.case_number_list))
     try:
+        # unassigned open appeals are assigned, all in one statement
+        appeals = admin_service.bulk_transition_cases(
+            model=admin_model.UserContentRestrictBanAppealDetail,
+            case_number_list=case_number_list,
+            status_in_list=["OPN"],
+            can_update=lambda appeal: appeal.moderator_id == None,
+            values={"moderator_id": moderator.id, "lease_expires_at": None},
+            db_session=db,
+        )
         db.commit()
     except SQLAlchemyError as exc:
         db.rollback()
@@ -2165,6 +2290,16 @@ def selected_appeals_assign_update(
             detail=str(exc),
         ) from exc
 
+    appeals_dict = {appeal.case_number: appeal for appeal in appeals}
+    for case_no in case_number_list:
+        appeal = appeals_dict.get(case_no)
+        if not appeal:
+            invalid_appeals.append(case_no)
+        elif appeal.is_updated:
+            valid_appeals.append(case_no)
+        else:
+            already_assign_appeals.append(case_no)
+
     # if not func call
     if valid_appeals:
         messages.append(
@@ -2189,6 +2324,76 @@ def selected_appeals_assign_update(
     }
 
 
+# claim the next open appeals from the work queue, most severe first
+# a claimed appeal goes back to the queue if not marked for review before lease expiry
+@router.post(
+    "/appeals/claim",
+    responses={200: {"model": list[admin_schema.ClaimedAppealResponse]}},
+)
+@auth_utils.authorize(["content_admin", "content_mgmt"])
+def claim_appeals(
+    count: int = Query(10, ge=1, le=settings.moderation_claim_max_items),
+    db: Session = Depends(get_db),
+    logger: Logger = Depends(log_utils.get_logger),
+    current_employee: auth_schema.AccessTokenPayload = Depends(
+        auth_utils.get_current_user
+    ),
+):
+    # get current employee
+    curr_employee = employee_service.get_employee_by_work_email(
+        work_email=str(current_employee.email),
+        status_not_in_list=["SUP", "TER"],
+        db_session=db,
+    )
+
+    try:
+        claimed_appeals = admin_service.claim_next_cases(
+            case_type="appeal",
+            limit=count,
+            moderator_id=curr_employee.id,
+            lease_minutes=settings.moderation_claim_lease_minutes,
+            report_reason_rank_dict=map_utils.report_reasons_severity_rank_dict,
+            db_session=db,
+        )
+        db.commit()
+    except SQLAlchemyError as exc:
+        db.rollback()
+        logger.error(exc, exc_info=True)
+        raise HTTPException(
+            status_code=http_status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error processing claim appeals request",
+        ) from exc
+    except Exception as exc:
+        db.rollback()
+        logger.error(exc, exc_info=True)
+        raise HTTPException(
+            status_code=http_status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=str(exc),
+        ) from exc
+
+    if not claimed_appeals:
+        return []
+
+    metrics_utils.moderation_cases_claimed_total.inc(
+        len(claimed_appeals), case_type="appeal", moderator=curr_employee.emp_id
+    )
+    num_of_reclaimed = sum(1 for appeal in claimed_appeals if appeal.is_reclaimed)
+    if num_of_reclaimed:
+        metrics_utils.moderation_cases_reclaimed_total.inc(
+            num_of_reclaimed, case_type="appeal", moderator=curr_employee.emp_id
+        )
+
+    return [
+        admin_schema.ClaimedAppealResponse.construct(
+            case_number=appeal.case_number,
+            status=appeal.status,
+            appealed_at=appeal.created_at,
+            lease_expires_at=appeal.lease_expires_at,
+        )
+        for appeal in claimed_appeals
+    ]
+
+
 # appeal policy check
 @router.patch("/appeals/{case_number}/check-policy")
 @auth_utils.authorize(["content_admin", "content_mgmt"])
@@ -2953,7 +3158,7 @@ def get_all_user_posts(
         return {"message": "No posts yet"}
 
     all_posts_response = [
-        post_schema.PostProfileResponse(
+        post_schema.PostProfileResponse.construct(
             id=post.id,
             image=post.image,
             num_of_likes=(
@@ -3155,6 +3360,99 @@ def get_comment(
     return comment_response
 
 
+# bulk export of reports, appeals and their event timelines, streamed as csv/ndjson
+@router.get("/export/{export_type}")
+@auth_utils.authorize(["content_admin"])
+def export_cases(
+    export_type: Literal["reports", "appeals", "report_timelines", "appeal_timelines"],
+    format_: Literal["csv", "ndjson"] = Query("csv", alias="format"),
+    is_gzip: bool = Query(False, alias="gzip"),
+    status: (
+        list[
+            Literal[
+                "open",
+                "closed",
+                "review",
+                "resolved",
+                "future_resolved",
+                "accepted",
+                "rejected",
+            ]
+        ]
+        | None
+    ) = Query(None),
+    emp_id: str = Query(None),
+    start_date: date = Query(None, description="date format YYYY-MM-DD"),
+    end_date: date = Query(None, description="date format YYYY-MM-DD"),
+    db: Session = Depends(get_db),
+    current_employee: auth_schema.AccessTokenPayload = Depends(
+        auth_utils.get_current_user
+    ),
+):
+    # check parameters
+    if start_date and end_date and start_date > end_date:
+        raise HTTPException(
+            status_code=http_status.HTTP_400_BAD_REQUEST,
+            detail="Start date cannot be after end date",
+        )
+    if status:
+        invalid_status = (
+            {"accepted", "rejected"}
+            if export_type.startswith("report")
+            else {"resolved", "future_resolved"}
+        ).intersection(status)
+        if invalid_status:
+            raise HTTPException(
+                status_code=http_status.HTTP_400_BAD_REQUEST,
+                detail=f"Invalid status: {', '.join(invalid_status)} for {export_type}",
+            )
+
+    # transform status, timelines are filtered by the status of their case
+    status_in_list = None
+    if status:
+        status_in_list = [
+            status_code
+            for value in status
+            for status_code in map_utils.transform_status(value=value)
+        ]
+
+    # get moderator if emp_id
+    moderator = None
+    if emp_id:
+        moderator = employee_service.get_employee_by_emp_id(
+            emp_id=emp_id,
+            status_not_in_list=["TER"],
+            db_session=db,
+        )
+        if not moderator:
+            raise HTTPException(
+                status_code=http_status.HTTP_404_NOT_FOUND,
+                detail="Employee not found",
+            )
+    # the export can run for long, it reads through its own session
+    db.close()
+
+    filename = (
+        f"{export_type}_{datetime.now().strftime('%Y%m%d%H%M%S')}.{format_}"
+        + (".gz" if is_gzip else "")
+    )
+    return StreamingResponse(
+        export_utils.stream_export(
+            export_type=export_type,
+            format_=format_,
+            is_gzip=is_gzip,
+            status_in_list=status_in_list,
+            moderator_id=moderator.id if moderator else None,
+            start_date=start_date,
+            end_date=end_date,
+        ),
+        media_type=(
+            "application/gzip" if is_gzip else export_utils.EXPORT_MEDIA_TYPES[format_]
+        ),
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
 # app metrics dashboard
 @router.get("/app-metrics")
 @auth_utils.authorize(["management", "software_dev", "content_admin"])
@@ -3311,3 +3609,17 @@ def app_activity_metrics(
     )
 
     return {"app_activity_metrics": app_activity_metrics_response}
+
+
+# service metrics in prometheus text format
+@router.get("/metrics", response_class=PlainTextResponse)
+@auth_utils.authorize(["management", "software_dev"])
+def service_metrics(
+    current_employee: auth_schema.AccessTokenPayload = Depends(
+        auth_utils.get_current_user
+    ),
+):
+    return PlainTextResponse(
+        content=metrics_utils.render_metrics(),
+        media_type="text/plain; version=0.0.4; charset=utf-8",
+    )
@@ -12,9 +12,7 @@ from app.config.app import settings
 from app.db.session import get_db
 from app.models import auth as auth_model
 from app.models import employee as employee_model
-from app.models import user as user_model
 from app.schemas import auth as auth_schema
-from app.services import admin as admin_service
 from app.services import auth as auth_service
 from app.services import employee as employee_service
 from app.services import user as user_service
@@ -42,23 +40,18 @@ def user_login(
     # check if username field is email or username
     is_email = auth_utils.check_username_or_email(credential=credentials.username)
 
-    # get user
-    if is_email:
-        user_query = user_service.get_user_by_email_query(
-            email=credentials.username,
-            status_not_in_list=["DEL"],
-            db_session=db,
-        )
-    else:
-        user_query = user_service.get_user_by_username_query(
-            credentials.username, ["DEL"], db
-        )
-
-    user = user_query.first()
-    if not user:
+    # get user along with its active restrict/ban entry if any
+    login_entry = auth_service.get_login_user_with_active_restrict_ban_entry(
+        credential=credentials.username,
+        is_email=is_email,
+        status_not_in_list=["DEL"],
+        db_session=db,
+    )
+    if not login_entry:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN, detail="Invalid Credentials"
         )
+    user, restrict_ban_entry = login_entry
 
     # verify password
     verify_pass = password_utils.verify_password(
@@ -88,11 +81,6 @@ def user_login(
             detail="Your account has been permanently deleted because it did not follow our community guidelines. This decision cannot be reversed either because we have already reviewed it, or because 30 days have passed since your account was permanently banned.",
         )
 
-    # check and get user restrict/ban entry if any
-    restrict_ban_entry = admin_service.get_user_active_restrict_ban_entry(
-        user_id=str(user.id), db_session=db
-    )
-
     refresh_token_unique_id = str()
     try:
         # if account is deactivated then it should be activated by updating status to active
@@ -140,26 +128,15 @@ def user_login(
             claims=refresh_token_claims
         )
 
-        # check if there is any previous active session for the user with same device info, if yes then invalidate it (is_active to False)
         # add new login session to user session table and add an entry to user auth track to track the refresh token wrt to user and device
-        previous_active_user_session = user_service.get_user_session_one_entry_query(
-            user_id=user.id, device_info=user_device_info, is_active=True, db_session=db
-        ).first()
-        if previous_active_user_session:
-            previous_active_user_session.is_active = False
-
-        add_user_session = user_model.UserSession(
-            device_info=user_device_info, user_id=user.id
-        )
-        add_user_auth_track = auth_model.UserAuthTrack(
-            refresh_token_id=refresh_token_unique_id,
-            device_info=user_device_info,
+        # previous active session on the same device is closed later by a batched job
+        auth_service.add_user_session_auth_track_entry(
             user_id=user.id,
+            device_info=user_device_info,
+            refresh_token_id=refresh_token_unique_id,
+            db_session=db,
         )
 
-        db.add(add_user_session)
-        db.add(add_user_auth_track)
-
         db.commit()
 
     except SQLAlchemyError as exc:
@@ -8,7 +8,6 @@ from sqlalchemy.orm import Session
 
 from app.config.app import settings
 from app.db.session import get_db
-from app.models import comment as comment_model
 from app.schemas import auth as auth_schema
 from app.schemas import comment as comment_schema
 from app.services import comment as comment_service
@@ -16,6 +15,7 @@ from app.services import post as post_service
 from app.services import user as user_service
 from app.utils import auth as auth_utils
 from app.utils import basic as basic_utils
+from app.utils import like_buffer as like_buffer_utils
 from app.utils import log as log_utils
 
 router = APIRouter(prefix=settings.api_prefix + "/comments", tags=["Comments"])
@@ -247,53 +247,39 @@ def like_unlike_comment(
             detail=f"Cannot {action} flagged to be banned comments",
         )
 
-    try:
-        # check if you have already liked or not
-        comment_like = comment_service.user_like_exists(
-            user_id=curr_auth_user.id, comment_id=comment.id, db_session=db
-        )
-
-        # like a post, create a new entry
-        if action == "like":
-            if comment_like:
-                raise HTTPException(
-                    status_code=status.HTTP_409_CONFLICT,
-                    detail="User has already liked the comment",
-                )
-
-            # add a like
-            db.add(
-                comment_model.CommentLike(
-                    user_id=curr_auth_user.id, comment_id=comment.id
-                )
+    # check if you have already liked or not, a buffered action not yet written wins
+    like_status = like_buffer_utils.like_buffer.get_pending_status(
+        kind="comment", user_id=curr_auth_user.id, target_id=comment.id
+    )
+    if like_status is None:
+        like_status = (
+            "ACT"
+            if comment_service.user_like_exists(
+                user_id=curr_auth_user.id, comment_id=comment.id, db_session=db
             )
+            else None
+        )
 
-        # unlike a post, update the existing like entry
-        elif action == "unlike":
-            if not comment_like:
-                raise HTTPException(
-                    status_code=status.HTTP_404_NOT_FOUND,
-                    detail="Like of user for the comment not found",
-                )
-
-            # update the like
-            comment_like.status = "RMV"
-
-        db.commit()
-    except SQLAlchemyError as exc:
-        db.rollback()
-        logger.error(exc, exc_info=True)
+    if action == "like" and like_status == "ACT":
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Error {action}ing comment",
-        ) from exc
-    except Exception as exc:
-        db.rollback()
-        logger.error(exc, exc_info=True)
+            status_code=status.HTTP_409_CONFLICT,
+            detail="User has already liked the comment",
+        )
+    if action == "unlike" and like_status != "ACT":
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=str(exc),
-        ) from exc
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Like of user for the comment not found",
+        )
+
+    # like/unlike is buffered and upserted in batches, (user_id, comment_id) is unique
+    # so repeated or concurrent taps can't create duplicate likes
+    like_buffer_utils.like_buffer.submit(
+        kind="comment",
+        user_id=curr_auth_user.id,
+        target_id=comment.id,
+        initial_status=like_status,
+        status="ACT" if action == "like" else "RMV",
+    )
 
     return {"message": f"Comment has been {action}d successfully"}
 
@@ -301,7 +287,11 @@ def like_unlike_comment(
 # get users who liked the comment
 @router.get(
     "/{comment_id}/like",
-    response_model=dict[str, list[comment_schema.LikeUserResponse] | UUID | str],
+    responses={
+        200: {
+            "model": dict[str, list[comment_schema.LikeUserResponse] | UUID | str]
+        }
+    },
 )
 @auth_utils.authorize(["user"])
 def get_comment_like_users(
@@ -352,7 +342,7 @@ def get_comment_like_users(
 
     # like users response
     like_users_response = [
-        comment_schema.LikeUserResponse(
+        comment_schema.LikeUserResponse.construct(
             profile_picture=user["profile_picture"],
             username=user["username"],
             follows_user=user["follows_user"],
@@ -11,6 +11,7 @@ from app.db.session import get_db
 from app.models import employee as employee_model
 from app.schemas import employee as employee_schema
 from app.services import employee as employee_service
+from app.services import image as image_service
 from app.utils import image as image_utils
 from app.utils import log as log_utils
 from app.utils import password as password_utils
@@ -76,54 +77,38 @@ def create_employee(
         **request.dict(), emp_id=emp_id, supervisor_id=supervisor_id
     )
 
-    # create a subfolder for added employee specific uploads, if folder exists get it.
-    employee_subfolder = image_utils.get_or_create_entity_image_subfolder(
-        entity="employee", repr_id=str(emp_id), logger=logger
-    )
-
-    # create a subfolder for profile images, if folder exists get it.
-    profile_subfolder = image_utils.get_or_create_entity_profile_image_subfolder(
-        entity_subfolder=employee_subfolder, logger=logger
-    )
-
     try:
-        # image validation and handling
-        image_name = image_utils.validate_image_generate_name(
-            username=emp_id, image=image, logger=logger
+        # image validation and write to blob store
+        image_name, image_size = image_utils.handle_image_operations(
+            image=image, logger=logger
+        )
+        image_service.register_image_blob(
+            image_name=image_name, size=image_size, db_session=db
         )
 
         add_employee.profile_picture = image_name
 
-        image_path = profile_subfolder / image_name
-
-        # write image to target
-        image_utils.write_image(
-            image=image,
-            image_path=image_path,
-            logger=logger,
-        )
-
         db.add(add_employee)
         db.commit()
 
     except SQLAlchemyError as exc:
         db.rollback()
         logger.error(exc, exc_info=True)
-        image_utils.remove_folder(path=employee_subfolder)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Error registering employee",
         ) from exc
     except HTTPException as exc:
-        image_utils.remove_folder(path=employee_subfolder)
         raise exc
     except Exception as exc:
         db.rollback()
         logger.error(exc, exc_info=True)
-        image_utils.remove_folder(path=employee_subfolder)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=str(exc),
         ) from exc
 
+    # generate profile picture variants in background
+    image_utils.schedule_image_derivatives(image_name=image_name, logger=logger)
+
     return add_employee
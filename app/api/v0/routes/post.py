@@ -1,8 +1,19 @@
+import time
 from logging import Logger
 from typing import Literal
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, Form, HTTPException, Query, UploadFile, status
+from fastapi import (
+    APIRouter,
+    Depends,
+    Form,
+    Header,
+    HTTPException,
+    Query,
+    Response,
+    UploadFile,
+    status,
+)
 from fastapi.responses import RedirectResponse
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import Session
@@ -15,12 +26,17 @@ from app.schemas import auth as auth_schema
 from app.schemas import comment as comment_schema
 from app.schemas import post as post_schema
 from app.services import comment as comment_service
+from app.services import image as image_service
 from app.services import post as post_service
 from app.services import user as user_service
 from app.utils import auth as auth_utils
 from app.utils import basic as basic_utils
+from app.utils import etag as etag_utils
 from app.utils import image as image_utils
+from app.utils import like_buffer as like_buffer_utils
 from app.utils import log as log_utils
+from app.utils import notification as notification_utils
+from app.utils import visibility as visibility_utils
 
 router = APIRouter(prefix=settings.api_prefix + "/posts", tags=["Posts"])
 
@@ -58,25 +74,10 @@ def create_post(
             detail="Cannot create new post, user is under full restriction",
         )
 
-    image_path = None
     try:
-        # image validation and handling
-        image_name = image_utils.validate_image_generate_name(
-            username=curr_auth_user.username,
-            image=image,
-            logger=logger,
-        )
-
-        # posts folder
-        posts_subfolder = image_folder / "user" / str(curr_auth_user.repr_id) / "posts"
-
-        image_path = posts_subfolder / image_name
-
-        # write image to target folder
-        image_utils.write_image(
-            image=image,
-            image_path=image_path,
-            logger=logger,
+        # image validation and write to blob store
+        image_name, image_size = image_utils.handle_image_operations(
+            image=image, logger=logger
         )
 
         new_post = post_model.Post(
@@ -87,13 +88,14 @@ def create_post(
         )
 
         db.add(new_post)
+        image_service.register_image_blob(
+            image_name=image_name, size=image_size, db_session=db
+        )
         db.commit()
 
     except SQLAlchemyError as exc:
         db.rollback()
         logger.error(exc, exc_info=True)
-        if image_path:
-            image_utils.remove_image(path=image_path)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Error creating post",
@@ -103,8 +105,6 @@ def create_post(
     except Exception as exc:
         db.rollback()
         logger.error(exc, exc_info=True)
-        if image_path:
-            image_utils.remove_image(path=image_path)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=str(exc),
@@ -112,6 +112,13 @@ def create_post(
 
     db.refresh(new_post)
 
+    # generate image variants in background
+    image_utils.schedule_image_derivatives(image_name=image_name, logger=logger)
+
+    # let followers with an open notification stream know
+    if post_request.post_type == "PUB":
+        notification_utils.notify_new_post(user_id=curr_auth_user.id, db_session=db)
+
     if post_request.post_type == "DRF":
         new_post_response = post_schema.PostDraftResponse(id=new_post.id, status=new_post.status, image=new_post.image, caption=new_post.caption)  # type: ignore
         message = "Post created has been saved as draft successfully"
@@ -120,6 +127,12 @@ def create_post(
         new_post_response = post_schema.PostUserFeedResponse(
             id=new_post.id,
             image=new_post.image,
+            image_urls=image_utils.get_image_urls(
+                entity="user",
+                repr_id=str(curr_auth_user.repr_id),
+                subfolder="posts",
+                image_name=new_post.image,
+            ),
             num_of_likes=post_service.count_post_likes(
                 post_id=new_post.id, status="ACT", db_session=db
             ),
@@ -139,11 +152,142 @@ def create_post(
     return {"message": message, "post": new_post_response}
 
 
+# get many posts in one request, same visibility rules as get a post
+# owners, counts, like and follow state are fetched for all posts together
+# posts that cannot be shown are returned in errors instead of failing the request
+@router.post("/batch")
+@auth_utils.authorize(["user"])
+def get_posts_batch(
+    batch_request: post_schema.PostBatchRequest,
+    db: Session = Depends(get_db),
+    current_user: auth_schema.AccessTokenPayload = Depends(auth_utils.get_current_user),
+):
+    # get the current user, once for the whole batch
+    curr_auth_user = user_service.get_user_by_email(
+        email=str(current_user.email),
+        status_not_in_list=["INA", "DAH", "PDH", "TBN", "PBN", "PDB", "PDI", "DEL"],
+        db_session=db,
+    )
+
+    # keep the request order, drop repeated ids
+    post_ids = list(dict.fromkeys(batch_request.post_ids))
+
+    post_rows = post_service.get_posts_batch(
+        post_id_list=post_ids,
+        curr_user_id=curr_auth_user.id,
+        status_not_in_list=["HID", "FLD", "RMV"],
+        db_session=db,
+    )
+    post_row_dict = {row.Post.id: row for row in post_rows}
+
+    posts_response = []
+    errors_response = []
+    for post_id in post_ids:
+        row = post_row_dict.get(post_id)
+        if not row:
+            errors_response.append(
+                post_schema.BatchItemError.construct(
+                    id=str(post_id),
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Requested post not found or might be deleted",
+                    location=None,
+                )
+            )
+            continue
+
+        post, post_user = row.Post, row.User
+        visibility_error = visibility_utils.check_post_visibility(
+            post=post,
+            post_user=post_user,
+            curr_user_id=curr_auth_user.id,
+            is_follower=row.is_follower,
+        )
+        if visibility_error:
+            status_code, detail = visibility_error
+            errors_response.append(
+                post_schema.BatchItemError.construct(
+                    id=str(post_id),
+                    status_code=status_code,
+                    detail=detail,
+                    location=(
+                        visibility_utils.get_profile_url(str(post_user.username))
+                        if status_code == status.HTTP_303_SEE_OTHER
+                        else None
+                    ),
+                )
+            )
+            continue
+
+        if post.status == "DRF":
+            posts_response.append(
+                post_schema.PostDraftResponse.construct(
+                    id=post.id,
+                    status=post.status,
+                    image=post.image,
+                    caption=post.caption,
+                )
+            )
+            continue
+
+        # buffered likes not yet written are included in like count and curr user like
+        flagged = visibility_utils.is_post_flagged(
+            post=post, post_user=post_user, curr_user_id=curr_auth_user.id
+        )
+        curr_user_pending_like = like_buffer_utils.like_buffer.get_pending_status(
+            kind="post", user_id=curr_auth_user.id, target_id=post.id
+        )
+        posts_response.append(
+            post_schema.PostResponse.construct(
+                id=post.id,
+                image=post.image,
+                image_urls=image_utils.get_image_urls(
+                    entity="user",
+                    repr_id=str(post_user.repr_id),
+                    subfolder="posts",
+                    image_name=post.image,
+                ),
+                num_of_likes=row.num_of_likes
+                + like_buffer_utils.like_buffer.get_pending_delta(
+                    kind="post", target_id=post.id
+                ),
+                num_of_comments=row.num_of_comments,
+                post_user=post_schema.PostUserOutput.construct(
+                    profile_picture=post_user.profile_picture,
+                    username=post_user.username,
+                    profile_picture_urls=image_utils.get_image_urls(
+                        entity="user",
+                        repr_id=str(post_user.repr_id),
+                        subfolder="profile",
+                        image_name=post_user.profile_picture,
+                    ),
+                ),
+                caption=post.caption,
+                posted_time_ago=basic_utils.time_ago(post_datetime=post.created_at),
+                curr_user_like=(
+                    (
+                        curr_user_pending_like == "ACT"
+                        if curr_user_pending_like
+                        else row.curr_user_like
+                    )
+                    and not flagged
+                ),
+                date=post.created_at.date(),
+                tag="flagged to be banned" if flagged else None,
+            )
+        )
+
+    return post_schema.PostBatchResponse.construct(
+        posts=posts_response, errors=errors_response
+    )
+
+
 # get a post
 @router.get("/{post_id}")
 @auth_utils.authorize(["user"])
 def get_post(
     post_id: UUID,
+    response: Response,
+    if_none_match: str = Header(None),
     db: Session = Depends(get_db),
     current_user: auth_schema.AccessTokenPayload = Depends(auth_utils.get_current_user),
 ):
@@ -176,39 +320,60 @@ def get_post(
             status_code=status.HTTP_404_NOT_FOUND, detail="Post owner not found"
         )
 
-    # redirect to user profile if user is deactivated or deleted
-    if post_user.status in ("DAH", "PDH", "PBN", "PDB", "PDI", "DEL"):
-        return RedirectResponse(
-            settings.api_prefix + "/users/" + str(post_user.username) + "/profile",
-            status_code=status.HTTP_303_SEE_OTHER,
-        )
-
     # check whether current user follows post_user or not
     follower_check = user_service.check_user_follower_or_not(
         follower_id=str(curr_auth_user.id), followed_id=str(post_user.id), db_session=db
     )
 
-    flagged = False
-    tag = None
-    if post_user.username != curr_auth_user.username:
-        # if post user is private and curr user is not a follower then redirect to user profile
-        if post_user.account_visibility == "PRV" and not follower_check:
+    # redirect to user profile if owner is deactivated/deleted or private and not followed
+    visibility_error = visibility_utils.check_post_visibility(
+        post=post,
+        post_user=post_user,
+        curr_user_id=curr_auth_user.id,
+        is_follower=follower_check is not None,
+    )
+    if visibility_error:
+        status_code, detail = visibility_error
+        if status_code == status.HTTP_303_SEE_OTHER:
             return RedirectResponse(
-                settings.api_prefix + "/users/" + str(post_user.username) + "/profile",
-                status_code=status.HTTP_303_SEE_OTHER,
-            )
-        elif post.status == "BAN":
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN, detail="Requested post is banned"
-            )
-        elif post.status == "FLB":
-            flagged = True
-            tag = "flagged to be banned"
-        elif post.status == "DRF":
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Not authorized to access requested resource",
+                visibility_utils.get_profile_url(str(post_user.username)),
+                status_code=status_code,
             )
+        raise HTTPException(status_code=status_code, detail=detail)
+
+    flagged = visibility_utils.is_post_flagged(
+        post=post, post_user=post_user, curr_user_id=curr_auth_user.id
+    )
+    tag = "flagged to be banned" if flagged else None
+
+    # etag from post, post owner and post version (likes, comments)
+    # posted time ago is part of the response, so it is part of the etag as well
+    # buffered likes not yet written are included in like count and curr user like
+    pending_likes_delta = like_buffer_utils.like_buffer.get_pending_delta(
+        kind="post", target_id=post.id
+    )
+    curr_user_pending_like = like_buffer_utils.like_buffer.get_pending_status(
+        kind="post", user_id=curr_auth_user.id, target_id=post.id
+    )
+    etag = etag_utils.generate_etag(
+        post.id,
+        post.status,
+        post.updated_at,
+        post_user.updated_at,
+        curr_auth_user.id,
+        basic_utils.time_ago(post_datetime=post.created_at),
+        pending_likes_delta,
+        curr_user_pending_like,
+        post.version,
+    )
+    cache_control = etag_utils.get_cache_control(
+        is_private_account=post_user.account_visibility == "PRV",
+        is_owner_or_follower=post_user.id == curr_auth_user.id
+        or follower_check is not None,
+    )
+    if etag_utils.etag_matches(if_none_match, etag):
+        return etag_utils.not_modified_response(etag, cache_control)
+    etag_utils.set_cache_headers(response, etag, cache_control)
 
     # post response
     if post.status == "DRF":
@@ -219,9 +384,16 @@ def get_post(
         post_response = post_schema.PostResponse(
             id=post.id,
             image=post.image,
+            image_urls=image_utils.get_image_urls(
+                entity="user",
+                repr_id=str(post_user.repr_id),
+                subfolder="posts",
+                image_name=post.image,
+            ),
             num_of_likes=post_service.count_post_likes(
                 post_id=post.id, status="ACT", db_session=db
-            ),
+            )
+            + pending_likes_delta,
             num_of_comments=comment_service.count_comments(
                 post_id=post.id, status_in_list=["PUB", "FLB"], db_session=db
             ),
@@ -229,10 +401,14 @@ def get_post(
             caption=post.caption,
             posted_time_ago=basic_utils.time_ago(post_datetime=post.created_at),
             curr_user_like=(
-                post_service.user_like_exists(
-                    user_id=curr_auth_user.id, post_id=post.id, db_session=db
+                (
+                    curr_user_pending_like == "ACT"
+                    if curr_user_pending_like
+                    else post_service.user_like_exists(
+                        user_id=curr_auth_user.id, post_id=post.id, db_session=db
+                    )
+                    is not None
                 )
-                is not None
                 and not flagged
             ),
             date=post.created_at,
@@ -323,31 +499,16 @@ def edit_post(
             detail=f"Post type mismatch. Post to be {edit_request.action}ed is a draft post, not a published post",
         )
 
-    posts_subfolder = None
     old_image = post.image
-    image_path = None
 
     try:
         if image:
-            # image validation and name generation
-            image_name = image_utils.validate_image_generate_name(
-                username=curr_auth_user.username,
-                image=image,
-                logger=logger,
+            # image validation and write to blob store
+            image_name, image_size = image_utils.handle_image_operations(
+                image=image, logger=logger
             )
-
-            # posts folder
-            posts_subfolder = (
-                image_folder / "user" / str(curr_auth_user.repr_id) / "posts"
-            )
-
-            image_path = posts_subfolder / image_name
-
-            # write image
-            image_utils.write_image(
-                image=image,
-                image_path=image_path,
-                logger=logger,
+            image_service.register_image_blob(
+                image_name=image_name, size=image_size, db_session=db
             )
 
         else:
@@ -375,8 +536,12 @@ def edit_post(
 
         db.commit()
 
-        if image:
-            # if draft has updated image and everything is completed without error, delete old image of draft
+        # if draft has updated image and everything is completed without error, delete old image of draft
+        # old blob images are reclaimed by gc once nothing references them
+        if image and not image_utils.is_blob_name(old_image):
+            posts_subfolder = (
+                image_folder / "user" / str(curr_auth_user.repr_id) / "posts"
+            )
             remove_path = posts_subfolder / old_image
             image_utils.remove_image(path=remove_path)
             logger.info("Old draft image removed, path: %s", remove_path)
@@ -384,8 +549,6 @@ def edit_post(
     except SQLAlchemyError as exc:
         db.rollback()
         logger.error(exc, exc_info=True)
-        if image and image_path:
-            image_utils.remove_image(path=image_path)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Error editing post",
@@ -395,13 +558,19 @@ def edit_post(
     except Exception as exc:
         db.rollback()
         logger.error(exc, exc_info=True)
-        if image and image_path:
-            image_utils.remove_image(path=image_path)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=str(exc),
         ) from exc
 
+    # generate new image variants in background
+    if image:
+        image_utils.schedule_image_derivatives(image_name=image_name, logger=logger)
+
+    # draft published, let followers with an open notification stream know
+    if edit_request.action == "publish":
+        notification_utils.notify_new_post(user_id=curr_auth_user.id, db_session=db)
+
     if edit_request.post_type == "draft" and edit_request.action == "edit":
         edit_post_response = post_schema.PostDraftResponse(
             id=post.id, status=post.status, image=post.image, caption=post.caption
@@ -412,6 +581,12 @@ def edit_post(
         edit_post_response = post_schema.PostResponse(
             id=post.id,
             image=post.image,
+            image_urls=image_utils.get_image_urls(
+                entity="user",
+                repr_id=str(curr_auth_user.repr_id),
+                subfolder="posts",
+                image_name=post.image,
+            ),
             num_of_likes=post_service.count_post_likes(
                 post_id=post.id, status="ACT", db_session=db
             ),
@@ -561,51 +736,39 @@ def like_unlike_post(
             detail=f"Cannot {action} flagged to be banned posts",
         )
 
-    try:
-        # check if you have already like or not
-        post_like = post_service.user_like_exists(
-            user_id=curr_auth_user.id, post_id=post.id, db_session=db
-        )
-        # like a post, create a new entry
-        if action == "like":
-            if post_like:
-                raise HTTPException(
-                    status_code=status.HTTP_409_CONFLICT,
-                    detail="User has already liked the post",
-                )
-
-            # add a like
-            db.add(post_model.PostLike(user_id=curr_auth_user.id, post_id=post.id))
-
-        # unlike a post, update the existing like entry
-        elif action == "unlike":
-            if not post_like:
-                raise HTTPException(
-                    status_code=status.HTTP_404_NOT_FOUND,
-                    detail="Like of user for the post not found",
-                )
-
-            # update the like
-            post_like.status = "RMV"
+    # check if you have already like or not, a buffered action not yet written wins
+    like_status = like_buffer_utils.like_buffer.get_pending_status(
+        kind="post", user_id=curr_auth_user.id, target_id=post.id
+    )
+    if like_status is None:
+        like_status = (
+            "ACT"
+            if post_service.user_like_exists(
+                user_id=curr_auth_user.id, post_id=post.id, db_session=db
+            )
+            else None
+        )
 
-        db.commit()
-    except SQLAlchemyError as exc:
-        db.rollback()
-        logger.error(exc, exc_info=True)
+    if action == "like" and like_status == "ACT":
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Error {action}ing post",
-        ) from exc
-    except HTTPException as exc:
-        db.rollback()
-        raise exc
-    except Exception as exc:
-        db.rollback()
-        logger.error(exc, exc_info=True)
+            status_code=status.HTTP_409_CONFLICT,
+            detail="User has already liked the post",
+        )
+    if action == "unlike" and like_status != "ACT":
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=str(exc),
-        ) from exc
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Like of user for the post not found",
+        )
+
+    # like/unlike is buffered and upserted in batches, (user_id, post_id) is unique
+    # so repeated or concurrent taps can't create duplicate likes
+    like_buffer_utils.like_buffer.submit(
+        kind="post",
+        user_id=curr_auth_user.id,
+        target_id=post.id,
+        initial_status=like_status,
+        status="ACT" if action == "like" else "RMV",
+    )
 
     return {"message": f"Post has been {action}d successfully"}
 
@@ -613,7 +776,11 @@ def like_unlike_post(
 # get users who liked the post
 @router.get(
     "/{post_id}/like",
-    response_model=dict[str, list[post_schema.LikeUserResponse] | UUID | str],
+    responses={
+        200: {
+            "model": dict[str, list[post_schema.LikeUserResponse] | UUID | str]
+        }
+    },
 )
 @auth_utils.authorize(["user"])
 def get_post_like_users(
@@ -664,7 +831,7 @@ def get_post_like_users(
 
     # like users response
     like_users_response = [
-        post_schema.LikeUserResponse(
+        post_schema.LikeUserResponse.construct(
             profile_picture=user["profile_picture"],
             username=user["username"],
             follows_user=user["follows_user"],
@@ -773,13 +940,19 @@ def create_comment(
 # get post comments
 @router.get(
     "/{post_id}/comments",
-    response_model=dict[str, list[comment_schema.CommentResponse] | UUID | str],
+    responses={
+        200: {
+            "model": dict[str, list[comment_schema.CommentResponse] | UUID | str]
+        }
+    },
 )
 @auth_utils.authorize(["user"])
 def get_all_comments(
     post_id: UUID,
-    limit: int = Query(3, le=9),
+    response: Response,
+    limit: int = Query(3, ge=1, le=50),
     last_comment_id: UUID = Query(None),
+    if_none_match: str = Header(None),
     db: Session = Depends(get_db),
     current_user: auth_schema.AccessTokenPayload = Depends(auth_utils.get_current_user),
 ):
@@ -806,45 +979,76 @@ def get_all_comments(
             detail="Invalid request. Cannot get comments",
         )
 
-    # get all comments
-    all_comments, next_cursor = comment_service.get_all_comments_of_post(
+    # get a page of comments with author, like count and curr user like in one query
+    all_comments, next_cursor = comment_service.get_comments_page_of_post(
         post_id=post_id,
+        curr_user_id=curr_auth_user.id,
         status_in_list=["PUB", "FLB"],
         limit=limit,
         last_comment_id=last_comment_id,
         db_session=db,
     )
+
+    # buffered likes not yet written are included in like count and curr user like
+    pending_likes = [
+        (
+            like_buffer_utils.like_buffer.get_pending_delta(
+                kind="comment", target_id=comment.id
+            ),
+            like_buffer_utils.like_buffer.get_pending_status(
+                kind="comment", user_id=curr_auth_user.id, target_id=comment.id
+            ),
+        )
+        for comment in all_comments
+    ]
+
+    # etag from post version, comments, comment likes and comment authors bump it
+    # commented time ago changes with time, so etag is valid for a minute at most
+    # comments don't depend on the follow relationship here, so cache policy is the default one
+    etag = etag_utils.generate_etag(
+        post.id,
+        post.status,
+        curr_auth_user.id,
+        limit,
+        last_comment_id,
+        int(time.time() // 60),
+        post.version,
+        *pending_likes,
+    )
+    cache_control = etag_utils.get_cache_control(
+        is_private_account=False, is_owner_or_follower=True
+    )
+    if etag_utils.etag_matches(if_none_match, etag):
+        return etag_utils.not_modified_response(etag, cache_control)
+    etag_utils.set_cache_headers(response, etag, cache_control)
+
     if not all_comments:
         if last_comment_id:
             return {"message": "No more comments available", "info": "Done"}
 
         return {"message": "No comments yet"}
 
-    # get all comment ids
-    all_comments_ids = [comment.id for comment in all_comments]
-
-    # get likes of all comments
-    likes_comments = comment_service.count_all_comments_likes(
-        comment_id_list=all_comments_ids, db_session=db
-    )
-
-    # curr user comments like, all the comments liked by curr user
-    curr_user_comments_like = comment_service.curr_user_like_for_exists_comments(
-        comment_id_list=all_comments_ids, curr_user_id=curr_auth_user.id, db_session=db
-    )
-
-    # comments response
+    # comments response, built from db rows so skip validation using construct
     all_comments_response = [
-        comment_schema.CommentResponse(
+        comment_schema.CommentResponse.construct(
             id=comment.id,
-            comment_user=comment.comment_user,
+            comment_user=comment_schema.CommentUserOutput.construct(
+                profile_picture=comment.profile_picture,
+                username=comment.username,
+            ),
             content=comment.content,
-            num_of_likes=likes_comments.get(comment.id, 0),
+            num_of_likes=comment.num_of_likes + pending_likes_delta,
             commented_time_ago=basic_utils.time_ago(comment.created_at),
-            curr_user_like=comment.id in curr_user_comments_like,
+            curr_user_like=(
+                curr_user_pending_like == "ACT"
+                if curr_user_pending_like
+                else comment.curr_user_like
+            ),
             tag="flagged to be banned" if comment.status == "FLB" else None,
         )
-        for comment in all_comments
+        for comment, (pending_likes_delta, curr_user_pending_like) in zip(
+            all_comments, pending_likes
+        )
     ]
 
     return {"comments": all_comments_response, "next_cursor": next_cursor}
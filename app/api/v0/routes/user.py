@@ -9,8 +9,10 @@ from fastapi import (
     BackgroundTasks,
     Depends,
     Form,
+    Header,
     HTTPException,
     Query,
+    Response,
     UploadFile,
 )
 from fastapi import status as http_status
@@ -35,15 +37,20 @@ from app.schemas import user as user_schema
 from app.services import admin as admin_service
 from app.services import auth as auth_service
 from app.services import comment as comment_service
+from app.services import image as image_service
 from app.services import post as post_service
 from app.services import user as user_service
 from app.utils import auth as auth_utils
 from app.utils import basic as basic_utils
 from app.utils import email as email_utils
+from app.utils import etag as etag_utils
 from app.utils import image as image_utils
 from app.utils import log as log_utils
 from app.utils import map as map_utils
+from app.utils import notification as notification_utils
+from app.utils import operation as operation_utils
 from app.utils import password as password_utils
+from app.utils import visibility as visibility_utils
 
 router = APIRouter(prefix=settings.api_prefix + "/users", tags=["Users"])
 
@@ -120,68 +127,33 @@ def create_user(
 
     add_user = user_model.User(**request.dict(), repr_id=user_repr_id)
 
-    # create a subfolder for user specific uploads, if folder exists get it.
-    user_subfolder = image_utils.get_or_create_entity_image_subfolder(
-        entity="user", repr_id=str(user_repr_id), logger=logger
-    )
-
-    # create a subfolder for profile images, if folder exists get it.
-    profile_subfolder = image_utils.get_or_create_entity_profile_image_subfolder(
-        entity_subfolder=user_subfolder, logger=logger
-    )
-
-    # create a subfolder for profile images, if folder exists get it.
-    posts_subfolder = image_utils.get_or_create_user_posts_image_subfolder(
-        user_subfolder=user_subfolder, logger=logger
-    )
-
-    # create a subfolder for appeal attachments, if folder exists get it.
-    appeals_subfolder = image_utils.get_or_create_user_appeals_attachment_subfolder(
-        user_subfolder=user_subfolder, logger=logger
-    )
-
-    image_path = None
+    image_name = None
     try:
         if image:
-            # image validation and handling
-            image_name = image_utils.validate_image_generate_name(
-                username=request.username,
-                image=image,
-                logger=logger,
+            # image validation and write to blob store
+            image_name, image_size = image_utils.handle_image_operations(
+                image=image, logger=logger
+            )
+            image_service.register_image_blob(
+                image_name=image_name, size=image_size, db_session=db
             )
 
             add_user.profile_picture = image_name
 
-            image_path = profile_subfolder / image_name
-
-            # write image to target
-            image_utils.write_image(
-                image=image,
-                image_path=image_path,
-                logger=logger,
-            )
-
         db.add(add_user)
         db.commit()
 
     except SQLAlchemyError as exc:
         db.rollback()
         logger.error(exc, exc_info=True)
-        if image and image_path:
-            image_utils.remove_image(path=image_path)
-        image_utils.remove_folder(path=user_subfolder)
         raise HTTPException(
             status_code=http_status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Error registering user",
         ) from exc
     except HTTPException as exc:
-        image_utils.remove_folder(path=user_subfolder)
         raise exc
     except Exception as exc:
         logger.error(exc, exc_info=True)
-        if image and image_path:
-            image_utils.remove_image(path=image_path)
-        image_utils.remove_folder(path=user_subfolder)
         raise HTTPException(
             status_code=http_status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=str(exc),
@@ -189,6 +161,10 @@ def create_user(
 
     db.refresh(add_user)
 
+    # generate profile picture variants in background
+    if image_name:
+        image_utils.schedule_image_derivatives(image_name=image_name, logger=logger)
+
     # generate a token
     claims = {"sub": add_user.email, "role": add_user.type}
     user_verify_token, user_verify_token_id = auth_utils.create_user_verify_token(
@@ -977,6 +953,14 @@ def follow_user(
             detail=str(exc),
         ) from exc
 
+    # follow request or new follower notification for the followed user
+    if followed_user.action == "follow":
+        notification_utils.notify_follow(
+            followed_user_id=user_followed.id,
+            follower_username=follower_user.username,
+            status="PND" if user_followed.account_visibility == "PRV" else "ACP",
+        )
+
     return {"message": message}
 
 
@@ -1075,6 +1059,11 @@ def manage_follow_request(
             detail=str(exc),
         ) from exc
 
+    if follow_request.action == "accept":
+        notification_utils.notify_follow_request_accepted(
+            follower_user_id=follower_user.id, followed_username=user.username
+        )
+
     return {"message": message}
 
 
@@ -1257,6 +1246,35 @@ def get_follow_requests(
     return requests_users
 
 
+# notification stream (server-sent events) for new feed posts, follow requests and
+# moderation actions, clients refetch feed/follow requests when notified, no polling
+@router.get("/notifications/stream")
+@auth_utils.authorize(["user"])
+def notification_stream(
+    db: Session = Depends(get_db),
+    current_user: auth_schema.AccessTokenPayload = Depends(auth_utils.get_current_user),
+):
+    # get current user
+    curr_auth_user = user_service.get_user_by_email(
+        email=str(current_user.email),
+        status_not_in_list=["INA", "DAH", "PDH", "TBN", "PBN", "PDB", "PDI", "DEL"],
+        db_session=db,
+    )
+    # the stream can stay open for hours, don't hold the db connection for it
+    db.close()
+
+    subscription = notification_utils.notification_hub.connect(
+        user_id=curr_auth_user.id
+    )
+    if not subscription:
+        raise HTTPException(
+            status_code=http_status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many open notification streams, try again later",
+        )
+
+    return notification_utils.NotificationStreamResponse(subscription)
+
+
 # remove a follower
 @router.put("/follow/remove/{username}")
 @auth_utils.authorize(["user"])
@@ -1408,11 +1426,111 @@ def username_change(
     return {"message": "Username change successful"}
 
 
+# get many user profiles in one request, same visibility rules as user profile
+# counts and follow state are fetched for all users together
+# users that cannot be shown are returned in errors instead of failing the request
+@router.post("/batch")
+@auth_utils.authorize(["user"])
+def user_profiles_batch(
+    batch_request: user_schema.UserBatchRequest,
+    db: Session = Depends(get_db),
+    current_user: auth_schema.AccessTokenPayload = Depends(auth_utils.get_current_user),
+):
+    # get current user, once for the whole batch
+    curr_auth_user = user_service.get_user_by_email(
+        email=str(current_user.email),
+        status_not_in_list=["INA", "DAH", "PDH", "TBN", "PBN", "PDB", "PDI", "DEL"],
+        db_session=db,
+    )
+
+    # keep the request order, drop repeated usernames
+    usernames = list(dict.fromkeys(batch_request.usernames))
+
+    user_rows = user_service.get_users_batch(
+        username_list=usernames,
+        curr_user_id=curr_auth_user.id,
+        status_not_in_list=["DEL", "PDB", "PDI"],
+        db_session=db,
+    )
+    user_row_dict = {row.User.username: row for row in user_rows}
+
+    # followed_by of all visible profiles except the current user
+    visible_user_ids = [
+        row.User.id
+        for row in user_rows
+        if not visibility_utils.check_profile_visibility(user=row.User)
+        and row.User.id != curr_auth_user.id
+    ]
+    followed_by_dict: dict[UUID, list[str]] = {}
+    if visible_user_ids:
+        followed_by_rows = user_service.get_users_followed_by_batch(
+            current_user_id=curr_auth_user.id,
+            profile_user_id_list=visible_user_ids,
+            db_session=db,
+        )
+        for profile_user_id, followed_username in followed_by_rows:
+            followed_by_dict.setdefault(profile_user_id, []).append(followed_username)
+
+    users_response = []
+    errors_response = []
+    for username in usernames:
+        row = user_row_dict.get(username)
+        if not row:
+            errors_response.append(
+                post_schema.BatchItemError.construct(
+                    id=username,
+                    status_code=http_status.HTTP_404_NOT_FOUND,
+                    detail="User not found",
+                    location=None,
+                )
+            )
+            continue
+
+        user = row.User
+        visibility_error = visibility_utils.check_profile_visibility(user=user)
+        if visibility_error:
+            status_code, detail = visibility_error
+            errors_response.append(
+                post_schema.BatchItemError.construct(
+                    id=username, status_code=status_code, detail=detail, location=None
+                )
+            )
+            continue
+
+        is_curr_user = user.id == curr_auth_user.id
+        users_response.append(
+            user_schema.UserProfileResponse.construct(
+                username=user.username,
+                profile_picture=user.profile_picture,
+                profile_picture_urls=image_utils.get_image_urls(
+                    entity="user",
+                    repr_id=str(user.repr_id),
+                    subfolder="profile",
+                    image_name=user.profile_picture,
+                ),
+                num_of_posts=row.num_of_posts,
+                num_of_followers=row.num_of_followers,
+                num_of_following=row.num_of_following,
+                bio=user.bio,
+                followed_by=(
+                    followed_by_dict.get(user.id, []) if not is_curr_user else None
+                ),
+                follows_user=row.follows_user if not is_curr_user else None,
+            )
+        )
+
+    return user_schema.UserBatchResponse.construct(
+        users=users_response, errors=errors_response
+    )
+
+
 # get user profile
 @router.get("/{username}/profile")
 @auth_utils.authorize(["user"])
 def user_profile(
     username: str,
+    response: Response,
+    if_none_match: str = Header(None),
     db: Session = Depends(get_db),
     current_user: auth_schema.AccessTokenPayload = Depends(auth_utils.get_current_user),
 ):
@@ -1426,15 +1544,10 @@ def user_profile(
         raise HTTPException(
             status_code=http_status.HTTP_404_NOT_FOUND, detail="User not found"
         )
-    elif user.status in ("DAH", "PDH"):
-        raise HTTPException(
-            status_code=http_status.HTTP_404_NOT_FOUND, detail="User profile not found"
-        )
-    elif user.status == "PBN":
-        raise HTTPException(
-            status_code=http_status.HTTP_403_FORBIDDEN,
-            detail="User is banned, cannot access profile",
-        )
+    visibility_error = visibility_utils.check_profile_visibility(user=user)
+    if visibility_error:
+        status_code, detail = visibility_error
+        raise HTTPException(status_code=status_code, detail=detail)
 
     # get current user
     curr_auth_user = user_service.get_user_by_email(
@@ -1448,6 +1561,25 @@ def user_profile(
         follower_id=str(curr_auth_user.id), followed_id=str(user.id), db_session=db
     )
 
+    # etag from user and user version (posts, follows), return 304 if client copy is
+    # still valid, followed_by depends on whom the current user follows, so the current
+    # user version is part of it too
+    etag = etag_utils.generate_etag(
+        user.id,
+        user.updated_at,
+        curr_auth_user.id,
+        user.version,
+        curr_auth_user.version,
+    )
+    cache_control = etag_utils.get_cache_control(
+        is_private_account=user.account_visibility == "PRV",
+        is_owner_or_follower=curr_auth_user.id == user.id
+        or follower_check is not None,
+    )
+    if etag_utils.etag_matches(if_none_match, etag):
+        return etag_utils.not_modified_response(etag, cache_control)
+    etag_utils.set_cache_headers(response, etag, cache_control)
+
     # show dp, username, no of posts, no of followers and following, followed_by, follows_user, message
     # posts will be fetched by all posts api endpoint
     # get no. of posts
@@ -1480,6 +1612,12 @@ def user_profile(
     user_profile_details = user_schema.UserProfileResponse(
         username=user.username,
         profile_picture=user.profile_picture,
+        profile_picture_urls=image_utils.get_image_urls(
+            entity="user",
+            repr_id=str(user.repr_id),
+            subfolder="profile",
+            image_name=user.profile_picture,
+        ),
         num_of_posts=no_of_posts,
         num_of_followers=no_of_followers,
         num_of_following=no_of_following,
@@ -1568,9 +1706,15 @@ def get_all_user_posts(
         return {"message": "No posts yet"}
 
     all_posts_response = [
-        post_schema.PostProfileResponse(
+        post_schema.PostProfileResponse.construct(
             id=post.id,
             image=post.image,
+            image_urls=image_utils.get_image_urls(
+                entity="user",
+                repr_id=str(user.repr_id),
+                subfolder="posts",
+                image_name=post.image,
+            ),
             num_of_likes=(
                 post_service.count_post_likes(
                     post_id=post.id, status="ACT", db_session=db
@@ -1627,8 +1771,9 @@ def user_feed(
     if not user_feed_posts:
         return {"message": "You have completely caught up from the past 3 days"}
 
+    # feed response, built from db rows so skip validation using construct
     user_feed_posts_response = [
-        post_schema.PostUserFeedResponse(
+        post_schema.PostUserFeedResponse.construct(
             id=post.id,
             image=post.image,
             num_of_likes=post_service.count_post_likes(
@@ -1637,7 +1782,22 @@ def user_feed(
             num_of_comments=comment_service.count_comments(
                 post_id=post.id, status_in_list=["PUB", "FLB"], db_session=db
             ),
-            post_user=post.post_user,
+            image_urls=image_utils.get_image_urls(
+                entity="user",
+                repr_id=str(post.post_user.repr_id),
+                subfolder="posts",
+                image_name=post.image,
+            ),
+            post_user=post_schema.PostUserOutput.construct(
+                profile_picture=post.post_user.profile_picture,
+                username=post.post_user.username,
+                profile_picture_urls=image_utils.get_image_urls(
+                    entity="user",
+                    repr_id=str(post.post_user.repr_id),
+                    subfolder="profile",
+                    image_name=post.post_user.profile_picture,
+                ),
+            ),
             caption=post.caption,
             posted_time_ago=basic_utils.time_ago(post_datetime=post.created_at),
             curr_user_like=post_service.user_like_exists(
@@ -1648,7 +1808,7 @@ def user_feed(
         for post in user_feed_posts
     ]
 
-    user_feed_response = user_schema.UserFeedResponse(
+    user_feed_response = user_schema.UserFeedResponse.construct(
         posts=user_feed_posts_response, next_cursor=next_cursor
     )
 
@@ -1876,18 +2036,24 @@ def report_item(
             "message": f"This {reported_item.item_type} has already been reported by you with {reported_item.reason}."
         }
 
-    # add the report to table
-    user_report = admin_model.UserContentReportDetail(
-        reporter_user_id=reporter_user.id,
-        reported_item_id=reported_item.item_id,
-        reported_item_type=reported_item.item_type,
-        reported_user_id=reported_user.id,
-        report_reason=reported_item.reason,
-        report_reason_user_id=report_reason_user.id if report_reason_user else None,
-    )
-
     try:
-        db.add(user_report)
+        # add the report to the open report of the item for the same reason, if any
+        report_id = user_service.add_report(
+            reporter_user_id=reporter_user.id,
+            reported_item_id=reported_item.item_id,
+            reported_item_type=reported_item.item_type,
+            reported_user_id=reported_user.id,
+            report_reason=reported_item.reason,
+            report_reason_user_id=report_reason_user.id if report_reason_user else None,
+            db_session=db,
+        )
+        # reported meanwhile by same user
+        if not report_id:
+            db.rollback()
+            return {
+                "message": f"This {reported_item.item_type} has already been reported by you with {reported_item.reason}."
+            }
+
         db.commit()
 
     except SQLAlchemyError as exc:
@@ -1913,6 +2079,7 @@ def report_item(
 # appeal for a content
 @router.post("/appeal")
 def appeal_content(
+    background_tasks: BackgroundTasks,
     appeal_user_request: user_schema.UserContentAppeal = FormDepends(
         user_schema.UserContentAppeal
     ),  # type: ignore
@@ -2133,40 +2300,26 @@ def appeal_content(
         appeal_detail=appeal_user_request.detail,
     )
 
-    image_path = None
+    staging_key = None
     try:
         if attachment:
-            # image validation and handling
-            image_name = image_utils.validate_image_generate_name(
-                username=appeal_user.username,
-                image=attachment,
-                logger=logger,
-            )
-
-            new_appeal.attachment = image_name
-
-            # get appeals subfolder
-            appeals_subfolder = (
-                image_folder / "user" / str(appeal_user.repr_id) / "appeals"
-            )
-
-            image_path = appeals_subfolder / image_name
-
-            # write image to target
-            image_utils.write_image(
-                image=attachment,
-                image_path=image_path,
-                logger=logger,
+            # only size and format checks here, the attachment is validated, normalized
+            # and stored after the response
+            staging_key = image_utils.stage_image_upload(
+                image=attachment, logger=logger
             )
+            new_appeal.attachment_status = "PND"
+            new_appeal.attachment_staging_key = staging_key
 
         db.add(new_appeal)
         db.commit()
 
+    # the staged file of a failed request is removed
     except SQLAlchemyError as exc:
         db.rollback()
         logger.error(exc, exc_info=True)
-        if attachment and image_path:
-            image_utils.remove_image(path=image_path)
+        if staging_key:
+            image_utils.remove_staged_image(staging_key=staging_key)
         raise HTTPException(
             status_code=http_status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Error submitting appeal",
@@ -2176,13 +2329,20 @@ def appeal_content(
     except Exception as exc:
         db.rollback()
         logger.error(exc, exc_info=True)
-        if attachment and image_path:
-            image_utils.remove_image(path=image_path)
+        if staging_key:
+            image_utils.remove_staged_image(staging_key=staging_key)
         raise HTTPException(
             status_code=http_status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=str(exc),
         ) from exc
 
+    if staging_key:
+        background_tasks.add_task(
+            operation_utils.process_appeal_attachment,
+            appeal_id=new_appeal.id,
+            staging_key=staging_key,
+        )
+
     return {
         "message": f"Your appeal for {appeal_user_request.content_type} {'@'+ appeal_user.username if appeal_user_request.content_type == 'account' else appeal_user_request.content_id} has been submitted successfully and will be handled by content moderator."
     }
@@ -2311,6 +2471,8 @@ def get_user_violation_status_details(
 @auth_utils.authorize(["user"])
 def about_user(
     username: str,
+    response: Response,
+    if_none_match: str = Header(None),
     db: Session = Depends(get_db),
     current_user: auth_schema.AccessTokenPayload = Depends(auth_utils.get_current_user),
 ):
@@ -2341,6 +2503,18 @@ def about_user(
             detail="User is banned, cannot access profile",
         )
 
+    # etag from user version, username changes also update user
+    # about details are same for followers and non followers, so no follow check
+    etag = etag_utils.generate_etag(
+        user.id, user.updated_at, curr_auth_user.username == username
+    )
+    cache_control = etag_utils.get_cache_control(
+        is_private_account=False, is_owner_or_follower=True
+    )
+    if etag_utils.etag_matches(if_none_match, etag):
+        return etag_utils.not_modified_response(etag, cache_control)
+    etag_utils.set_cache_headers(response, etag, cache_control)
+
     if curr_auth_user.username == username:
         user_response = user_schema.UserAboutResponse(
             profile_picture=user.profile_picture,
@@ -40,6 +40,18 @@ class AppSettings(BaseAppSettings):
     ttlcache_max_size: int
 
     image_folder: Path = Path("images")
+    media_serve_in_app: bool = True
+    image_derivative_workers: int = 2
+    image_blob_gc_grace_hours: int = 24
+    image_blob_gc_batch_size: int = 500
+    storage_backend: str = "local"
+    s3_bucket: str | None = None
+    s3_endpoint_url: str | None = None
+    s3_region: str | None = None
+    s3_access_key_id: str | None = None
+    s3_secret_access_key: str | None = None
+    s3_public_base_url: str | None = None
+    s3_presigned_url_expire_seconds: int = 3600
     pbn_appeal_submit_limit_days: int = 21
     content_appeal_submit_limit_days: int = 28
     appeal_process_duration_limit_days: int = 30
@@ -47,6 +59,22 @@ class AppSettings(BaseAppSettings):
     deactivation_delete_expiry_days: int = 30
     user_feed_posts_days: int = 3
     user_inactivity_days: int = 91
+    db_query_repeat_threshold: int = 5
+    like_buffer_flush_interval_ms: int = 200
+    scheduler_mode: str = "embedded"
+    scheduler_max_workers: int = 4
+    scheduler_misfire_grace_seconds: int = 30
+    scheduler_leader_retry_seconds: int = 15
+    job_batch_size: int = 500
+    job_time_budget_seconds: int = 5
+    notification_max_connections: int = 1000
+    notification_max_connections_per_user: int = 3
+    notification_queue_size: int = 100
+    notification_heartbeat_seconds: int = 15
+    moderation_claim_lease_minutes: int = 30
+    moderation_claim_max_items: int = 50
+    export_batch_size: int = 1000
+    appeal_attachment_retry_minutes: int = 10
 
     allowed_cors_origin: str | list[AnyHttpUrl]
 
@@ -0,0 +1,123 @@
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# expanded IN lists render a param per element, collapse them so the shape is stable
+_IN_LIST_PARAMS = re.compile(r"\(\s*%\(\w+\)s(?:\s*,\s*%\(\w+\)s)*\s*\)")
+_PARAMS = re.compile(r"%\(\w+\)s")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def statement_shape(statement: str) -> str:
+    shape = _IN_LIST_PARAMS.sub("(?)", statement)
+    shape = _PARAMS.sub("?", shape)
+    return _WHITESPACE.sub(" ", shape).strip()
+
+
+class QueryStats:
+    def __init__(self):
+        self.count = 0
+        self.total_time = 0.0
+        self.shapes: Counter = Counter()
+
+    def record(self, statement: str, duration: float):
+        self.count += 1
+        self.total_time += duration
+        self.shapes[statement_shape(statement)] += 1
+
+    # statement shapes executed at least threshold times, likely N+1 candidates
+    def repeated_shapes(self, threshold: int) -> list[tuple[str, int]]:
+        return [
+            (shape, count)
+            for shape, count in self.shapes.most_common()
+            if count >= threshold
+        ]
+
+    def as_log_fields(self, threshold: int) -> dict:
+        return {
+            "queryCount": self.count,
+            "queryTimeMs": round(self.total_time * 1000, 2),
+            "repeatedStatements": [
+                {"statement": shape, "count": count}
+                for shape, count in self.repeated_shapes(threshold)
+            ],
+        }
+
+
+# stats of the request/block being tracked, None means queries are not tracked
+# the object is mutated (not replaced) so that threadpool copies of the context see the same stats
+_current_stats: ContextVar[QueryStats | None] = ContextVar(
+    "current_query_stats", default=None
+)
+
+# stats collecting queries from every thread, used by assert_max_queries
+# since test clients run the app in a different thread than the test
+_global_stats: list[QueryStats] = []
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current_stats.get() is not None or _global_stats:
+        conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start_times = conn.info.get("query_start_time")
+    if not start_times:
+        return
+    duration = time.perf_counter() - start_times.pop()
+
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.record(statement, duration)
+    for global_stats in _global_stats:
+        global_stats.record(statement, duration)
+
+
+# failed statements never reach after_cursor_execute, drop their start time
+def _handle_error(exception_context):
+    conn = exception_context.connection
+    if conn is not None and conn.info.get("query_start_time"):
+        conn.info["query_start_time"].pop()
+
+
+def register_query_listeners(engine: Engine):
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+
+@contextmanager
+def track_queries():
+    stats = QueryStats()
+    token = _current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
+
+
+# test helper, fails the block if it runs more than max_count queries
+# e.g. with assert_max_queries(5): client.get("/api/v0/users/feed")
+@contextmanager
+def assert_max_queries(max_count: int, repeat_threshold: int = 2):
+    stats = QueryStats()
+    _global_stats.append(stats)
+    try:
+        yield stats
+    finally:
+        _global_stats.remove(stats)
+
+    if stats.count > max_count:
+        repeated = "\n".join(
+            f"  {count}x {shape}"
+            for shape, count in stats.repeated_shapes(repeat_threshold)
+        )
+        raise AssertionError(
+            f"Expected at most {max_count} queries, got {stats.count}"
+            + (f"\nRepeated statements:\n{repeated}" if repeated else "")
+        )
@@ -0,0 +1,47 @@
+# standalone job runner, runs the scheduled jobs outside the api workers
+# run from project root: python -m app.job_runner
+# set SCHEDULER_MODE=standalone for the api so that its workers don't run the jobs,
+# runners elect a leader as well, extra replicas wait as standbys
+import json
+import logging.config
+import signal
+from pathlib import Path
+from threading import Event
+
+from app.config.app import settings
+from app.db.db_sqlalchemy import engine
+from app.utils import event  # user status listeners, jobs update user status
+from app.utils import log as log_utils
+from app.utils import scheduler as scheduler_utils
+
+stop_event = Event()
+
+
+def handle_stop_signal(signum, frame):
+    stop_event.set()
+
+
+def main():
+    with open(Path("app/config/log_config.json")) as f:
+        logging.config.dictConfig(config=json.load(f))
+    logger = log_utils.get_logger()
+
+    signal.signal(signal.SIGTERM, handle_stop_signal)
+    signal.signal(signal.SIGINT, handle_stop_signal)
+
+    scheduler_leader = scheduler_utils.SchedulerLeader(
+        retry_interval=settings.scheduler_leader_retry_seconds
+    )
+    scheduler_leader.start()
+    logger.info("Job runner started")
+
+    stop_event.wait()
+
+    # running jobs finish before exit
+    scheduler_leader.stop()
+    engine.dispose()
+    logger.info("Job runner stopped")
+
+
+if __name__ == "__main__":
+    main()
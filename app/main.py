@@ -1,25 +1,29 @@
 import json
 import logging.config
+import time
 from pathlib import Path
 
 import requests
-from apscheduler.schedulers.background import BackgroundScheduler
-from apscheduler.triggers.interval import IntervalTrigger
 from fastapi import Cookie, FastAPI, HTTPException, Request, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, RedirectResponse
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import JSONResponse, ORJSONResponse, RedirectResponse
 from starlette.background import BackgroundTask
 
+from app import media
 from app.api.v0 import api_routes
 from app.config.app import settings
+from app.db import query_stats
 from app.db.db_sqlalchemy import Base, engine
 from app.models import admin, auth, comment, post, user
 from app.utils import auth as auth_utils
 from app.utils import event
-from app.utils import job_task as job_task_utils
+from app.utils import image as image_utils
+from app.utils import like_buffer as like_buffer_utils
 from app.utils import log as log_utils
 from app.utils import map as map_utils
+from app.utils import metrics as metrics_utils
+from app.utils import notification as notification_utils
+from app.utils import scheduler as scheduler_utils
 from app.utils.exception import CustomValidationError, TokenExpiredSignatureError
 
 ENVIRONMENT = settings.app_environment
@@ -34,11 +38,19 @@ if ENVIRONMENT not in SHOW_DOCS_ENVIRONMENT:
 # all the models are imported and Base instance is used
 # Base.metadata.create_all(bind=engine)
 
-app = FastAPI(**settings.fastapi_kwargs)
+# orjson based response class for all routes, faster than stdlib json
+app = FastAPI(**settings.fastapi_kwargs, default_response_class=ORJSONResponse)
 
-app.mount("/images/user", StaticFiles(directory="images/user"), name="user_images")
-app.mount(
-    "/images/employee", StaticFiles(directory="images/employee"), name="employee_images"
+# media files, not mounted when media is served by the standalone media app (app.media:app)
+if settings.media_serve_in_app:
+    app.mount("/images/blobs", media.blob_images, name="blob_images")
+    app.mount("/images/user", media.user_images, name="user_images")
+    app.mount("/images/employee", media.employee_images, name="employee_images")
+
+# reject oversized image uploads before the multipart form is parsed
+app.add_middleware(
+    image_utils.UploadSizeLimitMiddleware,
+    max_body_size=settings.image_max_size + image_utils.UPLOAD_FORM_OVERHEAD_SIZE,
 )
 
 app.add_middleware(
@@ -61,10 +73,57 @@ logging.config.dictConfig(config=config)
 @app.middleware("http")
 async def log_request(request: Request, call_next):
     response = await call_next(request)
+    # no access log for media files
+    if request.url.path.startswith(media.MEDIA_PATH_PREFIX):
+        return response
     response.background = BackgroundTask(log_utils.write_log_data, request, response)
     return response
 
 
+@app.middleware("http")
+async def track_request_metrics(request: Request, call_next):
+    metrics_utils.http_requests_in_flight.inc()
+    start = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        metrics_utils.http_requests_in_flight.dec()
+        metrics_utils.http_request_duration_seconds.observe(
+            time.perf_counter() - start,
+            method=request.method,
+            route=metrics_utils.get_route_label(request),
+            status=status_code,
+        )
+
+
+# per request query count, db time and repeated statement shapes
+# sent as response headers in dev/test, added to the access log in prod
+@app.middleware("http")
+async def track_db_queries(request: Request, call_next):
+    with query_stats.track_queries() as stats:
+        if ENVIRONMENT not in SHOW_DOCS_ENVIRONMENT:
+            request.state.db_query_stats = stats
+        response = await call_next(request)
+
+    if ENVIRONMENT in SHOW_DOCS_ENVIRONMENT:
+        repeated_shapes = stats.repeated_shapes(settings.db_query_repeat_threshold)
+        response.headers["X-DB-Query-Count"] = str(stats.count)
+        response.headers["X-DB-Query-Time-Ms"] = f"{stats.total_time * 1000:.2f}"
+        response.headers["X-DB-Repeated-Statements"] = str(len(repeated_shapes))
+        if repeated_shapes:
+            log_utils.logger.warning(
+                "Possible N+1 on %s %s: %s",
+                request.method,
+                request.url.path,
+                repeated_shapes,
+            )
+
+    return response
+
+
 @app.exception_handler(CustomValidationError)
 def custom_validation_exception_handler(request, exc: CustomValidationError):
     # request
@@ -87,7 +146,7 @@ def token_expiry_exception_handler(request, exc: TokenExpiredSignatureError):
     refresh_token = request.cookies.get("refresh_token")
 
     # check user or employee
-    if type_ in map_utils.transform_access_role(value="user"):
+    if type_ in map_utils.access_role_types_dict["user"]:
         # user token refresh
         return refresh_request(
             refresh_token=refresh_token,
@@ -103,54 +162,39 @@ def token_expiry_exception_handler(request, exc: TokenExpiredSignatureError):
 
 app.include_router(api_routes.router)
 
-scheduler = BackgroundScheduler()
+# pool stats for metrics
+metrics_utils.register_db_pool(engine)
+
+# per request query tracking
+query_stats.register_query_listeners(engine)
 
+# scheduled jobs run in one process only, api workers elect a leader using a postgres
+# advisory lock (SCHEDULER_MODE=embedded), or the jobs run in the standalone job runner
+# (python -m app.job_runner) with SCHEDULER_MODE=standalone for the api
+scheduler_leader = scheduler_utils.SchedulerLeader(
+    retry_interval=settings.scheduler_leader_retry_seconds
+)
 
+
+# route templates for metrics, registered once all routes (root included) are defined
 @app.on_event("startup")
-def scheduler_init():
-    scheduler.add_job(
-        func=job_task_utils.delete_user_after_deactivation_period_expiration,
-        trigger=IntervalTrigger(seconds=10),
-    )
-    scheduler.add_job(
-        func=job_task_utils.remove_restriction_on_user_after_duration_expiration,
-        trigger=IntervalTrigger(seconds=5),
-    )
-    scheduler.add_job(
-        func=job_task_utils.remove_ban_on_user_after_duration_expiration,
-        trigger=IntervalTrigger(seconds=5),
-    )
-    scheduler.add_job(
-        func=job_task_utils.user_inactivity_inactive,
-        trigger=IntervalTrigger(seconds=7),
-    )
-    scheduler.add_job(
-        func=job_task_utils.user_inactivity_delete,
-        trigger=IntervalTrigger(seconds=7),
-    )
-    scheduler.add_job(
-        func=job_task_utils.close_appeal_after_duration_limit_expiration,
-        trigger=IntervalTrigger(seconds=3),
-    )
-    scheduler.add_job(
-        func=job_task_utils.delete_user_after_permanent_ban_appeal_limit_expiry,
-        trigger=IntervalTrigger(seconds=5),
-    )
-    scheduler.add_job(
-        func=job_task_utils.delete_content_after_ban_appeal_limit_expiry,
-        trigger=IntervalTrigger(seconds=3),
-    )
-    scheduler.add_job(
-        func=job_task_utils.reduce_violation_score_quarterly,
-        trigger=IntervalTrigger(seconds=10),
-    )
+def metrics_routes_init():
+    metrics_utils.register_routes(app.routes)
 
-    scheduler.start()
+
+@app.on_event("startup")
+def scheduler_init():
+    if settings.scheduler_mode == "embedded":
+        scheduler_leader.start()
+    like_buffer_utils.like_buffer.start()
 
 
 @app.on_event("shutdown")
 def scheduler_end():
-    scheduler.shutdown()
+    scheduler_leader.stop()
+    image_utils.shutdown_derivative_executor()
+    like_buffer_utils.like_buffer.stop()
+    notification_utils.notification_hub.close_all()
 
 
 def refresh_request(refresh_token: str, url: str):
@@ -0,0 +1,207 @@
+import os
+
+import anyio
+from starlette.applications import Starlette
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, RedirectResponse, Response
+from starlette.routing import Mount
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.types import Receive, Scope, Send
+
+from app.config.app import settings
+from app.utils import storage as storage_utils
+
+# path prefix of media routes, used by the api app to skip access logging
+MEDIA_PATH_PREFIX = "/images/"
+
+
+class MediaFileResponse(FileResponse):
+    # larger chunks than the default 64 KiB, fewer sends for big images
+    chunk_size = 256 * 1024
+
+
+# partial content response for a single byte range
+class RangeFileResponse(MediaFileResponse):
+    def __init__(
+        self,
+        path: str | os.PathLike,
+        start: int,
+        end: int,
+        stat_result: os.stat_result,
+        method: str | None = None,
+    ):
+        super().__init__(path, status_code=206, stat_result=stat_result, method=method)
+        self.start = start
+        self.end = end
+        self.headers["content-range"] = f"bytes {start}-{end}/{stat_result.st_size}"
+        self.headers["content-length"] = str(end - start + 1)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        await send(
+            {
+                "type": "http.response.start",
+                "status": self.status_code,
+                "headers": self.raw_headers,
+            }
+        )
+        if self.send_header_only:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+        else:
+            async with await anyio.open_file(self.path, mode="rb") as file:
+                await file.seek(self.start)
+                remaining = self.end - self.start + 1
+                more_body = True
+                while more_body:
+                    chunk = await file.read(min(self.chunk_size, remaining))
+                    remaining -= len(chunk)
+                    more_body = remaining > 0 and len(chunk) > 0
+                    await send(
+                        {
+                            "type": "http.response.body",
+                            "body": chunk,
+                            "more_body": more_body,
+                        }
+                    )
+
+        if self.background is not None:
+            await self.background()
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+# parse a single "bytes=start-end" range, returns None to serve the whole file
+# multiple ranges are allowed to be ignored as per RFC 9110, so we serve the whole file for those
+def parse_range_header(range_header: str, file_size: int):
+    unit, _, ranges = range_header.partition("=")
+    if unit.strip() != "bytes" or "," in ranges:
+        return None
+
+    start_str, _, end_str = ranges.strip().partition("-")
+    try:
+        if not start_str:
+            # suffix range, last n bytes
+            suffix_length = int(end_str)
+            if suffix_length <= 0:
+                raise ValueError("Invalid suffix range")
+            start = max(file_size - suffix_length, 0)
+            end = file_size - 1
+        else:
+            start = int(start_str)
+            end = int(end_str) if end_str else file_size - 1
+            end = min(end, file_size - 1)
+    except ValueError as exc:
+        raise RangeNotSatisfiable from exc
+
+    if start > end or start >= file_size:
+        raise RangeNotSatisfiable
+
+    return start, end
+
+
+# image names are content hashes (or embed the upload timestamp for older images),
+# a changed image always gets a new name so the files can be cached forever, appeal
+# attachments (old user/<id>/appeals/ files and blobs/appeals/ blobs) only privately
+class MediaFiles(StaticFiles):
+    def get_cache_control(self, full_path: str | os.PathLike):
+        return storage_utils.get_cache_control(full_path)
+
+    def file_response(
+        self,
+        full_path: str | os.PathLike,
+        stat_result: os.stat_result,
+        scope: Scope,
+        status_code: int = 200,
+    ) -> Response:
+        method = scope["method"]
+        request_headers = Headers(scope=scope)
+        cache_control = self.get_cache_control(full_path)
+
+        response = MediaFileResponse(
+            full_path, status_code=status_code, stat_result=stat_result, method=method
+        )
+        response.headers["cache-control"] = cache_control
+        response.headers["accept-ranges"] = "bytes"
+
+        # If-None-Match and If-Modified-Since
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+
+        range_header = request_headers.get("range")
+        if not range_header or status_code != 200:
+            return response
+
+        # If-Range, serve the whole file if the client copy is outdated
+        if_range = request_headers.get("if-range")
+        if if_range and if_range not in (
+            response.headers["etag"],
+            response.headers["last-modified"],
+        ):
+            return response
+
+        try:
+            byte_range = parse_range_header(range_header, stat_result.st_size)
+        except RangeNotSatisfiable:
+            return Response(
+                status_code=416,
+                headers={"content-range": f"bytes */{stat_result.st_size}"},
+            )
+        if byte_range is None:
+            return response
+
+        start, end = byte_range
+        range_response = RangeFileResponse(
+            full_path, start=start, end=end, stat_result=stat_result, method=method
+        )
+        range_response.headers["cache-control"] = cache_control
+        range_response.headers["accept-ranges"] = "bytes"
+
+        return range_response
+
+
+# blobs are served from disk with the local backend, other backends are redirected to
+# (presigned or public object store url), the in process backend is served from memory
+class BlobMedia:
+    def __init__(self, local_files: MediaFiles):
+        self.local_files = local_files
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        storage = storage_utils.get_storage()
+        if isinstance(storage, storage_utils.LocalStorage):
+            await self.local_files(scope, receive, send)
+            return
+
+        key = f"blobs/{scope['path'].lstrip('/')}"
+        if isinstance(storage, storage_utils.InMemoryStorage):
+            try:
+                response = Response(
+                    storage.read_bytes(key),
+                    media_type=storage_utils.get_content_type(key),
+                    headers={"cache-control": storage_utils.get_cache_control(key)},
+                )
+            except FileNotFoundError:
+                response = Response(status_code=404)
+        else:
+            response = RedirectResponse(storage.get_url(key), status_code=307)
+
+        await response(scope, receive, send)
+
+
+# check_dir off, blob folder is created on first upload
+blob_images = BlobMedia(
+    MediaFiles(directory=str(settings.image_folder / "blobs"), check_dir=False)
+)
+user_images = MediaFiles(directory=str(settings.image_folder / "user"))
+employee_images = MediaFiles(directory=str(settings.image_folder / "employee"))
+
+media_routes = [
+    Mount("/images/blobs", blob_images, name="blob_images"),
+    Mount("/images/user", user_images, name="user_images"),
+    Mount("/images/employee", employee_images, name="employee_images"),
+]
+
+# standalone media app, no logging/db middleware, run on its own workers with
+# uvicorn app.media:app --workers 4
+# set MEDIA_SERVE_IN_APP=false for the api app when media is served this way
+app = Starlette(routes=media_routes)
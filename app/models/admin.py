@@ -141,6 +141,8 @@ class UserContentReportDetail(Base):
         ForeignKey("employee.id", ondelete="CASCADE"),
         nullable=True,
     )
+    lease_expires_at = Column(TIMESTAMP(timezone=True), nullable=True)
+    reporter_count = Column(Integer(), nullable=False, server_default=text("1"))
 
     post = relationship(
         "Post",
@@ -179,6 +181,25 @@ class UserContentReportDetail(Base):
     )
 
 
+# reporters of a report, an open report is one case per item, reason (and reason user)
+# further reports on it add the reporter here instead of a new report
+class UserContentReportReporter(Base):
+    __tablename__ = "user_content_report_reporter"
+    report_id = Column(
+        UUID(as_uuid=True),
+        ForeignKey("user_content_report_detail.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    reporter_user_id = Column(
+        UUID(as_uuid=True),
+        ForeignKey("user.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    created_at = Column(
+        TIMESTAMP(timezone=True), nullable=False, server_default=text("NOW()")
+    )
+
+
 class GuidelineViolationScore(Base):
     __tablename__ = "guideline_violation_score"
     id = Column(
@@ -197,12 +218,55 @@ class GuidelineViolationScore(Base):
     updated_at = Column(TIMESTAMP(timezone=True), nullable=True, onupdate=func.now())
     # last_added_score = Column(Integer(), nullable=False, server_default=text("0"))
     is_deleted = Column(Boolean(), server_default=text("False"), nullable=False)
+    # last quarterly reduction, a score is reduced once per period
+    last_reduced_at = Column(TIMESTAMP(timezone=True), nullable=True)
 
     last_added_scores = relationship(
         "GuidelineViolationLastAddedScore", back_populates="score"
     )
 
 
+# per user violation counts, kept in sync wherever reports are resolved or appeals
+# concluded, rebuilt periodically by a job
+class UserViolationSummary(Base):
+    __tablename__ = "user_violation_summary"
+    user_id = Column(
+        UUID(as_uuid=True),
+        ForeignKey("user.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    num_of_post_violations_no_restrict_ban = Column(
+        Integer(), nullable=False, server_default=text("0")
+    )
+    num_of_comment_violations_no_restrict_ban = Column(
+        Integer(), nullable=False, server_default=text("0")
+    )
+    num_of_account_violations_no_restrict_ban = Column(
+        Integer(), nullable=False, server_default=text("0")
+    )
+    total_num_of_violations_no_restrict_ban = Column(
+        Integer(), nullable=False, server_default=text("0")
+    )
+    num_of_partial_account_restrictions = Column(
+        Integer(), nullable=False, server_default=text("0")
+    )
+    num_of_full_account_restrictions = Column(
+        Integer(), nullable=False, server_default=text("0")
+    )
+    num_of_account_temporary_bans = Column(
+        Integer(), nullable=False, server_default=text("0")
+    )
+    num_of_account_permanent_bans = Column(
+        Integer(), nullable=False, server_default=text("0")
+    )
+    total_num_of_account_restrict_bans = Column(
+        Integer(), nullable=False, server_default=text("0")
+    )
+    updated_at = Column(
+        TIMESTAMP(timezone=True), nullable=False, server_default=text("NOW()")
+    )
+
+
 class UserContentRestrictBanAppealDetail(Base):
     __tablename__ = "user_content_restrict_ban_appeal_detail"
     id = Column(
@@ -228,6 +292,9 @@ class UserContentRestrictBanAppealDetail(Base):
     content_id = Column(UUID(as_uuid=True), nullable=False)
     appeal_detail = Column(String(), nullable=False)
     attachment = Column(String(), nullable=True)
+    # PND: staged, waiting for validation, RDY: stored as attachment, INV: rejected
+    attachment_status = Column(String(length=3), nullable=True)
+    attachment_staging_key = Column(String(), nullable=True)
     status = Column(String(length=3), nullable=False, server_default=text("'OPN'"))
     moderator_id = Column(
         UUID(as_uuid=True),
@@ -247,6 +314,7 @@ class UserContentRestrictBanAppealDetail(Base):
         onupdate=func.now(),
     )
     is_policy_followed = Column(Boolean(), nullable=True)
+    lease_expires_at = Column(TIMESTAMP(timezone=True), nullable=True)
 
     post = relationship(
         "Post",
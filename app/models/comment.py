@@ -73,12 +73,9 @@ class CommentLike(Base):
         server_default=text("'ACT'"),
     )
     updated_at = Column(TIMESTAMP(timezone=True), nullable=True, onupdate=func.now())
+    # one row per user and comment, like/unlike flips the status
     UniqueConstraint(
-        "user_id",
-        "comment_id",
-        "status",
-        "created_at",
-        name="comment_like_comment_id_user_id_status_created_at_key",
+        "user_id", "comment_id", name="comment_like_user_id_comment_id_key"
     )
     comment_like_user = relationship(
         "User", back_populates="comment_likes", foreign_keys=[user_id]
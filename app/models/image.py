@@ -0,0 +1,19 @@
+from sqlalchemy import TIMESTAMP, BigInteger, Column, Integer, String, text
+
+from app.db.db_sqlalchemy import Base
+
+
+# orm model for image_blob table
+# uploaded images are stored once per content hash, name is "<sha256>.<ext>"
+# ref_count is the number of post, user/employee profile picture and appeal attachment rows using the blob
+class ImageBlob(Base):
+    __tablename__ = "image_blob"
+    name = Column(String(length=80), primary_key=True)
+    size = Column(BigInteger, nullable=False)
+    ref_count = Column(Integer, nullable=False, server_default=text("0"))
+    created_at = Column(
+        TIMESTAMP(timezone=True), nullable=False, server_default=text("NOW()")
+    )
+    last_uploaded_at = Column(
+        TIMESTAMP(timezone=True), nullable=False, server_default=text("NOW()")
+    )
@@ -0,0 +1,19 @@
+from sqlalchemy import TIMESTAMP, Column, String, func, text
+from sqlalchemy.dialects.postgresql import UUID
+
+from app.db.db_sqlalchemy import Base
+
+
+# orm model for job_checkpoint table
+# last id processed by a chunked job run that stopped early, next run resumes after it
+# last_id is null when the previous run went through all rows
+class JobCheckpoint(Base):
+    __tablename__ = "job_checkpoint"
+    job_name = Column(String(length=100), primary_key=True)
+    last_id = Column(UUID(as_uuid=True), nullable=True)
+    updated_at = Column(
+        TIMESTAMP(timezone=True),
+        nullable=False,
+        server_default=text("NOW()"),
+        onupdate=func.now(),
+    )
@@ -1,5 +1,6 @@
 from sqlalchemy import (
     TIMESTAMP,
+    BigInteger,
     Boolean,
     Column,
     ForeignKey,
@@ -33,6 +34,8 @@ class Post(Base):
         UUID(as_uuid=True), ForeignKey("user.id", ondelete="CASCADE"), nullable=False
     )
     is_ban_final = Column(Boolean, nullable=False, server_default="False")
+    # bumped by db triggers on like, comment and comment like changes, used for etags
+    version = Column(BigInteger, nullable=False, server_default=text("0"))
     post_user = relationship("User", back_populates="posts")
     likes = relationship("PostLike", back_populates="like_post")
 
@@ -71,13 +74,8 @@ class PostLike(Base):
         server_default=text("'ACT'"),
     )
     updated_at = Column(TIMESTAMP(timezone=True), nullable=True, onupdate=func.now())
-    UniqueConstraint(
-        "user_id",
-        "post_id",
-        "status",
-        "created_at",
-        name="post_like_post_id_user_id_status_created_at_key",
-    )
+    # one row per user and post, like/unlike flips the status
+    UniqueConstraint("user_id", "post_id", name="post_like_user_id_post_id_key")
     post_like_user = relationship(
         "User", back_populates="post_likes", foreign_keys=[user_id]
     )
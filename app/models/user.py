@@ -1,5 +1,6 @@
 from sqlalchemy import (
     TIMESTAMP,
+    BigInteger,
     Boolean,
     Column,
     Date,
@@ -90,6 +91,8 @@ class User(Base):
         nullable=False,
     )
     inactive_delete_after = Column(Integer, nullable=False, server_default=text("183"))
+    # bumped by db triggers on post and follow changes, used for etags
+    version = Column(BigInteger, nullable=False, server_default=text("0"))
     country_phone_code = Column(String(length=10), nullable=True)
     phone_number = Column(
         String(length=12),
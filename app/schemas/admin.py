@@ -35,6 +35,7 @@ class RestrictBanOutput(BaseModel):
 class ReportResponse(ReportRequest):
     case_number: int
     reporter_user: user_schema.UserBaseOutput
+    reporter_count: int
     reported_user: user_schema.UserBaseOutput
     reported_item_type: str
     reported_item: (
@@ -109,6 +110,10 @@ class AllReportResponse(ReportRequest):
         orm_mode = True
 
 
+class ClaimedReportResponse(AllReportResponse):
+    lease_expires_at: datetime
+
+
 class ReportUnderReviewUpdate(BaseModel):
     case_number_list: list[int]
 
@@ -144,6 +149,10 @@ class AllAppealResponse(AppealRequest):
         orm_mode = True
 
 
+class ClaimedAppealResponse(AllAppealResponse):
+    lease_expires_at: datetime
+
+
 class AppealResponse(AppealRequest):
     case_number: int
     appeal_user: user_schema.UserOutput
@@ -158,6 +167,12 @@ class AppealResponse(AppealRequest):
     attachment: str = Field(
         None, description="This attribute will only display if it's not None"
     )
+    attachment_url: str = Field(
+        None, description="This attribute will only display if it's not None"
+    )
+    attachment_status: str = Field(
+        None, description="This attribute will only display if it's not None"
+    )
     moderator_note: str = Field(
         None, description="This attribute will only display if it's not None"
     )
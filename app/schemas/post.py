@@ -2,10 +2,13 @@ from datetime import date, datetime
 from typing import Literal
 from uuid import UUID
 
-from pydantic import BaseModel, validator
+from pydantic import BaseModel, Field, validator
 
 from app.utils.exception import CustomValidationError
 
+# max items of a batch get request
+BATCH_MAX_ITEMS = 50
+
 
 class PostCreate(BaseModel):
     post_type: Literal["PUB", "DRF"]
@@ -26,9 +29,17 @@ class PostOutput(BaseModel):
     id: UUID
 
 
+# original image url and derivative urls keyed by format and variant (thumb, grid, full)
+class ImageUrlsOutput(BaseModel):
+    original: str
+    webp: dict[str, str]
+    jpeg: dict[str, str]
+
+
 class PostUserOutput(BaseModel):
     profile_picture: str
     username: str
+    profile_picture_urls: ImageUrlsOutput | None
 
     class Config:
         orm_mode = True
@@ -42,6 +53,7 @@ class PostDraftResponse(PostOutput):
 
 class PostProfileResponse(PostOutput):
     image: str
+    image_urls: ImageUrlsOutput | None
     num_of_likes: int | None
     num_of_comments: int | None
 
@@ -67,6 +79,24 @@ class PostResponse(PostUserFeedResponse):
         orm_mode = True
 
 
+class PostBatchRequest(BaseModel):
+    post_ids: list[UUID] = Field(..., min_items=1, max_items=BATCH_MAX_ITEMS)
+
+
+# item of a batch request that cannot be shown, same status code and detail as the
+# single get endpoint, location is set for 303 (user profile of the post owner)
+class BatchItemError(BaseModel):
+    id: str
+    status_code: int
+    detail: str
+    location: str | None
+
+
+class PostBatchResponse(BaseModel):
+    posts: list[PostResponse | PostDraftResponse]
+    errors: list[BatchItemError]
+
+
 class EditPostRequest(BaseModel):
     id: UUID
     post_type: Literal["published", "draft"]
@@ -5,7 +5,12 @@ from uuid import UUID
 
 from pydantic import UUID4, BaseModel, EmailStr, Field, validator
 
-from app.schemas.post import PostUserFeedResponse
+from app.schemas.post import (
+    BATCH_MAX_ITEMS,
+    BatchItemError,
+    ImageUrlsOutput,
+    PostUserFeedResponse,
+)
 from app.utils.exception import CustomValidationError
 
 
@@ -287,6 +292,7 @@ class UserContentAppeal(BaseModel):
 
 class UserProfileResponse(UserBaseOutput):
     profile_picture: str | None
+    profile_picture_urls: ImageUrlsOutput | None
     num_of_posts: int
     num_of_followers: int
     num_of_following: int
@@ -298,6 +304,15 @@ class UserProfileResponse(UserBaseOutput):
         orm_mode = True
 
 
+class UserBatchRequest(BaseModel):
+    usernames: list[str] = Field(..., min_items=1, max_items=BATCH_MAX_ITEMS)
+
+
+class UserBatchResponse(BaseModel):
+    users: list[UserProfileResponse]
+    errors: list[BatchItemError]
+
+
 class UserFeedResponse(BaseModel):
     posts: list[PostUserFeedResponse]
     next_cursor: UUID | None
@@ -1,7 +1,8 @@
 from datetime import date, timedelta
 from uuid import UUID
 
-from sqlalchemy import and_, case, exists, func, or_, select
+from sqlalchemy import and_, case, exists, func, or_, select, update
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.orm import Session
 
 from app.models import admin as admin_model
@@ -44,15 +45,16 @@ def get_all_reports_by_status_moderator_id_reported_at(
 def get_a_report_query(
     case_number: int, status_in_list: list[str] | None, db_session: Session
 ):
-    return db_session.query(admin_model.UserContentReportDetail).filter(
+    query = db_session.query(admin_model.UserContentReportDetail).filter(
         admin_model.UserContentReportDetail.case_number == case_number,
-        (
-            (admin_model.UserContentReportDetail.status.in_(status_in_list))
-            if status_in_list
-            else True
-        ),
         admin_model.UserContentReportDetail.is_deleted == False,
     )
+    if status_in_list:
+        query = query.filter(
+            admin_model.UserContentReportDetail.status.in_(status_in_list)
+        )
+
+    return query
 
 
 def get_a_report(
@@ -74,22 +76,18 @@ def get_open_reports_for_specific_content_report(
         admin_model.UserContentReportDetail.case_number != case_number,
         admin_model.UserContentReportDetail.reported_item_id == reported_item_id,
         admin_model.UserContentReportDetail.reported_item_type == reported_item_type,
-        (
-            (admin_model.UserContentReportDetail.report_reason == report_reason)
-            if report_reason
-            else True
-        ),
-        (
-            (
-                admin_model.UserContentReportDetail.report_reason_user_id
-                == report_reason_user
-            )
-            if report_reason_user
-            else True
-        ),
         admin_model.UserContentReportDetail.status == "OPN",
         admin_model.UserContentReportDetail.is_deleted == False,
     )
+    if report_reason:
+        query = query.filter(
+            admin_model.UserContentReportDetail.report_reason == report_reason
+        )
+    if report_reason_user:
+        query = query.filter(
+            admin_model.UserContentReportDetail.report_reason_user_id
+            == report_reason_user
+        )
     if moderator_id:
         query = query.filter(
             admin_model.UserContentReportDetail.moderator_id == moderator_id
@@ -154,6 +152,49 @@ def get_users_guideline_violation_score_query(
     )
 
 
+# reduce violation scores of users with no new violation in the period, in one update
+# users whose latest violations are resolved reports (not appealed successfully) older
+# than the period, scores not changed and not reduced within the period
+def reduce_violation_scores(reduce_rate: float, period_days: int, db_session: Session):
+    report = admin_model.UserContentReportDetail
+    appeal = admin_model.UserContentRestrictBanAppealDetail
+    score = admin_model.GuidelineViolationScore
+    period_start = func.now() - timedelta(days=period_days)
+
+    no_violation_user_ids = (
+        select(report.reported_user_id)
+        .distinct()
+        .outerjoin(
+            appeal, and_(appeal.report_id == report.id, appeal.is_deleted == False)
+        )
+        .where(
+            report.status == "RSD",
+            report.updated_at < period_start,
+            report.is_deleted == False,
+            or_(appeal.status.is_(None), appeal.status.notin_(["ACP", "ACR"])),
+        )
+        .subquery()
+    )
+
+    return db_session.execute(
+        update(score)
+        .where(
+            score.user_id == no_violation_user_ids.c.reported_user_id,
+            score.is_deleted == False,
+            score.updated_at < period_start,
+            or_(score.last_reduced_at.is_(None), score.last_reduced_at < period_start),
+        )
+        .values(
+            post_score=func.round(score.post_score * reduce_rate),
+            comment_score=func.round(score.comment_score * reduce_rate),
+            message_score=func.round(score.message_score * reduce_rate),
+            final_violation_score=func.round(score.final_violation_score * reduce_rate),
+            last_reduced_at=func.now(),
+        )
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+
 def get_user_final_violation_score(user_id: str, db_session: Session):
     return (
         db_session.query(
@@ -206,13 +247,26 @@ def get_related_reports_for_specific_report_query(
     )
 
 
+# reports of the reporters, reports with other reporters too are left out, they still
+# need a review
 def get_all_reports_reporter_user_id_status(
     reporter_user_id_list: list[UUID], status_in_list: list[str], db_session: Session
 ):
-    return db_session.query(admin_model.UserContentReportDetail).filter(
-        admin_model.UserContentReportDetail.reporter_user_id.in_(reporter_user_id_list),
-        admin_model.UserContentReportDetail.status.in_(status_in_list),
-        admin_model.UserContentReportDetail.is_deleted == False,
+    return (
+        db_session.query(admin_model.UserContentReportDetail)
+        .join(
+            admin_model.UserContentReportReporter,
+            admin_model.UserContentReportReporter.report_id
+            == admin_model.UserContentReportDetail.id,
+        )
+        .filter(
+            admin_model.UserContentReportReporter.reporter_user_id.in_(
+                reporter_user_id_list
+            ),
+            admin_model.UserContentReportDetail.reporter_count == 1,
+            admin_model.UserContentReportDetail.status.in_(status_in_list),
+            admin_model.UserContentReportDetail.is_deleted == False,
+        )
     )
 
 
@@ -403,23 +457,67 @@ def get_a_appeal_report_id_content_id(
     content_type: list[str],
     status: str,
     db_session: Session,
+):
+    query = db_session.query(admin_model.UserContentRestrictBanAppealDetail).filter(
+        admin_model.UserContentRestrictBanAppealDetail.content_id == content_id,
+        admin_model.UserContentRestrictBanAppealDetail.content_type.in_(content_type),
+        admin_model.UserContentRestrictBanAppealDetail.status == status,
+        admin_model.UserContentRestrictBanAppealDetail.is_deleted == False,
+    )
+    if report_id:
+        query = query.filter(
+            admin_model.UserContentRestrictBanAppealDetail.report_id == report_id
+        )
+
+    return query.first()
+
+
+# staged attachments still waiting for validation, e.g. the worker went down midway
+def get_pending_appeal_attachments(
+    older_than_minutes: int, limit: int, db_session: Session
 ):
     return (
-        db_session.query(admin_model.UserContentRestrictBanAppealDetail)
+        db_session.query(
+            admin_model.UserContentRestrictBanAppealDetail.id,
+            admin_model.UserContentRestrictBanAppealDetail.attachment_staging_key,
+        )
         .filter(
-            (
-                (admin_model.UserContentRestrictBanAppealDetail.report_id == report_id)
-                if report_id
-                else True
-            ),
-            admin_model.UserContentRestrictBanAppealDetail.content_id == content_id,
-            admin_model.UserContentRestrictBanAppealDetail.content_type.in_(
-                content_type
-            ),
-            admin_model.UserContentRestrictBanAppealDetail.status == status,
+            admin_model.UserContentRestrictBanAppealDetail.attachment_status == "PND",
+            admin_model.UserContentRestrictBanAppealDetail.created_at
+            < func.now() - timedelta(minutes=older_than_minutes),
             admin_model.UserContentRestrictBanAppealDetail.is_deleted == False,
         )
-        .first()
+        .order_by(admin_model.UserContentRestrictBanAppealDetail.created_at)
+        .limit(limit)
+        .all()
+    )
+
+
+# record the validation result, only if the attachment is still pending for the same
+# staged file, a result already recorded by another run is kept
+def set_appeal_attachment_result(
+    appeal_id: UUID,
+    staging_key: str,
+    attachment: str | None,
+    attachment_status: str,
+    db_session: Session,
+):
+    return (
+        db_session.query(admin_model.UserContentRestrictBanAppealDetail)
+        .filter(
+            admin_model.UserContentRestrictBanAppealDetail.id == appeal_id,
+            admin_model.UserContentRestrictBanAppealDetail.attachment_staging_key
+            == staging_key,
+            admin_model.UserContentRestrictBanAppealDetail.attachment_status == "PND",
+        )
+        .update(
+            {
+                "attachment": attachment,
+                "attachment_status": attachment_status,
+                "attachment_staging_key": None,
+            },
+            synchronize_session=False,
+        )
     )
 
 
@@ -524,15 +622,16 @@ def get_all_appeals_by_status_moderator_id_reported_at(
 def get_an_appeal_query(
     case_number: int, status_in_list: list[str] | None, db_session: Session
 ):
-    return db_session.query(admin_model.UserContentRestrictBanAppealDetail).filter(
+    query = db_session.query(admin_model.UserContentRestrictBanAppealDetail).filter(
         admin_model.UserContentRestrictBanAppealDetail.case_number == case_number,
-        (
-            (admin_model.UserContentRestrictBanAppealDetail.status.in_(status_in_list))
-            if status_in_list
-            else True
-        ),
         admin_model.UserContentRestrictBanAppealDetail.is_deleted == False,
     )
+    if status_in_list:
+        query = query.filter(
+            admin_model.UserContentRestrictBanAppealDetail.status.in_(status_in_list)
+        )
+
+    return query
 
 
 def get_an_appeal(
@@ -541,6 +640,121 @@ def get_an_appeal(
     return get_an_appeal_query(case_number, status_in_list, db_session).first()
 
 
+# move a list of reports/appeals to a new state in one statement, the cases are locked
+# and checked with can_update(columns of current state), the ones passing are updated
+# returns case_number, status, moderator_id (state before update) and is_updated of
+# each existing case with status in status_in_list, other case numbers are not returned
+def bulk_transition_cases(
+    model: type[admin_model.UserContentReportDetail]
+    | type[admin_model.UserContentRestrictBanAppealDetail],
+    case_number_list: list[int],
+    status_in_list: list[str],
+    can_update,
+    values: dict,
+    db_session: Session,
+):
+    target = (
+        select(model.id, model.case_number, model.status, model.moderator_id)
+        .where(
+            model.case_number.in_(case_number_list),
+            model.status.in_(status_in_list),
+            model.is_deleted == False,
+        )
+        .with_for_update()
+        .cte("target")
+    )
+    updated = (
+        update(model)
+        .where(model.id == target.c.id, can_update(target.c))
+        .values(**values)
+        .returning(model.id)
+        .cte("updated")
+    )
+
+    return db_session.execute(
+        select(
+            target.c.case_number,
+            target.c.status,
+            target.c.moderator_id,
+            (updated.c.id != None).label("is_updated"),
+        )
+        .select_from(target)
+        .outerjoin(updated, updated.c.id == target.c.id)
+    ).all()
+
+
+# claim the next open reports/appeals (case_type) for a moderator, most severe and
+# oldest first, severity of an appeal is the one of its report
+# unassigned cases and claimed cases whose lease expired can be claimed, rows locked by
+# another claim are skipped, so concurrent claims don't wait or get the same case
+# returns case_number, status, created_at, lease_expires_at and is_reclaimed
+def claim_next_cases(
+    case_type: str,
+    limit: int,
+    moderator_id: UUID,
+    lease_minutes: int,
+    report_reason_rank_dict: dict[str, int],
+    db_session: Session,
+):
+    report_model = admin_model.UserContentReportDetail
+    model = (
+        report_model
+        if case_type == "report"
+        else admin_model.UserContentRestrictBanAppealDetail
+    )
+    severity_rank = case(
+        report_reason_rank_dict,
+        value=report_model.report_reason,
+        else_=max(report_reason_rank_dict.values()) + 1,
+    )
+
+    candidates = select(
+        model.id, model.moderator_id, severity_rank.label("severity_rank")
+    ).select_from(model)
+    if model is not report_model:
+        candidates = candidates.join(report_model, report_model.id == model.report_id)
+    candidates = (
+        candidates.where(
+            model.status == "OPN",
+            model.is_deleted == False,
+            or_(model.moderator_id == None, model.lease_expires_at < func.now()),
+        )
+        .order_by(severity_rank, model.created_at)
+        .limit(limit)
+        .with_for_update(of=model, skip_locked=True)
+        .cte("candidates")
+    )
+    claimed = (
+        update(model)
+        .where(model.id == candidates.c.id)
+        .values(
+            moderator_id=moderator_id,
+            lease_expires_at=func.now() + timedelta(minutes=lease_minutes),
+        )
+        .returning(
+            model.id,
+            model.case_number,
+            model.status,
+            model.created_at,
+            model.lease_expires_at,
+        )
+        .cte("claimed")
+    )
+
+    return db_session.execute(
+        select(
+            claimed.c.case_number,
+            claimed.c.status,
+            claimed.c.created_at,
+            claimed.c.lease_expires_at,
+            (candidates.c.moderator_id != None).label("is_reclaimed"),
+        )
+        .select_from(claimed)
+        .join(candidates, candidates.c.id == claimed.c.id)
+        .order_by(candidates.c.severity_rank, claimed.c.created_at)
+    ).all()
+
+
 def get_open_appeals_for_specific_content_appeal(
     case_number: int,
     content_id: UUID,
@@ -587,155 +801,162 @@ def get_related_appeals_for_specific_appeal(
     )
 
 
-# get user violation details
-def get_user_violation_details(user_id: UUID, db_session: Session):
-    query = (
-        db_session.query(
-            func.count(
-                case(
-                    [
-                        (
-                            and_(
-                                admin_model.UserRestrictBanDetail.id.is_(None),
-                                admin_model.UserContentReportDetail.reported_item_type
-                                == "post",
-                                admin_model.UserContentReportDetail.status.in_(
-                                    ["RSD", "FRS"]
-                                ),
-                            ),
-                            admin_model.UserContentReportDetail.id,
-                        )
-                    ],
-                    else_=None,
-                )
-            ).label("num_of_post_violations_no_restrict_ban"),
-            func.count(
-                case(
-                    [
-                        (
-                            and_(
-                                admin_model.UserRestrictBanDetail.id.is_(None),
-                                admin_model.UserContentReportDetail.reported_item_type
-                                == "comment",
-                                admin_model.UserContentReportDetail.status.in_(
-                                    ["RSD", "FRS"]
-                                ),
-                            ),
-                            admin_model.UserContentReportDetail.id,
-                        )
-                    ],
-                    else_=None,
-                )
-            ).label("num_of_comment_violations_no_restrict_ban"),
-            func.count(
-                case(
-                    [
-                        (
-                            and_(
-                                admin_model.UserRestrictBanDetail.id.is_(None),
-                                admin_model.UserContentReportDetail.reported_item_type
-                                == "account",
-                                admin_model.UserContentReportDetail.status.in_(
-                                    ["RSD", "FRS"]
-                                ),
-                            ),
-                            admin_model.UserContentReportDetail.id,
-                        )
-                    ],
-                    else_=None,
-                )
-            ).label("num_of_account_violations_no_restrict_ban"),
-            func.count(
-                case(
-                    [
-                        (
-                            and_(
-                                admin_model.UserRestrictBanDetail.id.is_(None),
-                                admin_model.UserContentReportDetail.status.in_(
-                                    ["RSD", "FRS"]
-                                ),
-                            ),
-                            admin_model.UserContentReportDetail.id,
-                        )
-                    ],
-                    else_=None,
-                )
-            ).label("total_num_of_violations_no_restrict_ban"),
-            func.count(
-                case(
-                    [
-                        (
-                            admin_model.UserRestrictBanDetail.status == "RSP",
-                            admin_model.UserRestrictBanDetail.id,
-                        )
-                    ],
-                    else_=None,
-                )
-            ).label("num_of_partial_account_restrictions"),
-            func.count(
-                case(
-                    [
-                        (
-                            admin_model.UserRestrictBanDetail.status == "RSF",
-                            admin_model.UserRestrictBanDetail.id,
-                        )
-                    ],
-                    else_=None,
-                )
-            ).label("num_of_full_account_restrictions"),
-            func.count(
-                case(
-                    [
-                        (
-                            admin_model.UserRestrictBanDetail.status == "TBN",
-                            admin_model.UserRestrictBanDetail.id,
-                        )
-                    ],
-                    else_=None,
-                )
-            ).label("num_of_account_temporary_bans"),
-            func.count(
-                case(
-                    [
-                        (
-                            admin_model.UserRestrictBanDetail.status == "PBN",
-                            admin_model.UserRestrictBanDetail.id,
-                        )
-                    ],
-                    else_=None,
-                )
-            ).label("num_of_account_permanent_bans"),
-            func.count(
-                case(
-                    [
-                        (
-                            admin_model.UserRestrictBanDetail.id.is_not(None),
-                            admin_model.UserRestrictBanDetail.id,
-                        )
-                    ],
-                    else_=None,
-                )
-            ).label("total_num_of_account_restrict_bans"),
-        )
-        .join(
-            admin_model.UserRestrictBanDetail,
-            admin_model.UserContentReportDetail.id
-            == admin_model.UserRestrictBanDetail.report_id,
-            isouter=True,
-        )
-        .filter(
+# violation counts of the users, users without reports get zero counts
+# restrict/ban counts take non deleted restrict/bans, violation counts take resolved
+# reports without a restrict/ban, reports with a deleted restrict/ban are not counted
+def get_users_violation_details_query(user_id_list: list[UUID]):
+    report = admin_model.UserContentReportDetail
+    restrict_ban = admin_model.UserRestrictBanDetail
+
+    def count_violations_no_restrict_ban(reported_item_type: str | None = None):
+        conditions = [restrict_ban.id.is_(None), report.status.in_(["RSD", "FRS"])]
+        if reported_item_type:
+            conditions.append(report.reported_item_type == reported_item_type)
+        return func.count(case([(and_(*conditions), report.id)], else_=None))
+
+    def count_restrict_bans(status: str | None = None):
+        conditions = [restrict_ban.id.is_not(None), restrict_ban.is_deleted == False]
+        if status:
+            conditions.append(restrict_ban.status == status)
+        return func.count(case([(and_(*conditions), restrict_ban.id)], else_=None))
+
+    return (
+        select(
+            user_model.User.id.label("user_id"),
+            count_violations_no_restrict_ban("post").label(
+                "num_of_post_violations_no_restrict_ban"
+            ),
+            count_violations_no_restrict_ban("comment").label(
+                "num_of_comment_violations_no_restrict_ban"
+            ),
+            count_violations_no_restrict_ban("account").label(
+                "num_of_account_violations_no_restrict_ban"
+            ),
+            count_violations_no_restrict_ban().label(
+                "total_num_of_violations_no_restrict_ban"
+            ),
+            count_restrict_bans("RSP").label("num_of_partial_account_restrictions"),
+            count_restrict_bans("RSF").label("num_of_full_account_restrictions"),
+            count_restrict_bans("TBN").label("num_of_account_temporary_bans"),
+            count_restrict_bans("PBN").label("num_of_account_permanent_bans"),
+            count_restrict_bans().label("total_num_of_account_restrict_bans"),
+        )
+        .select_from(user_model.User)
+        .outerjoin(
+            report,
             and_(
-                admin_model.UserContentReportDetail.reported_user_id == user_id,
-                admin_model.UserContentReportDetail.is_deleted == (False),
-                or_(
-                    admin_model.UserRestrictBanDetail.id.is_(None),
-                    admin_model.UserRestrictBanDetail.is_deleted == (False),
-                ),
-            )
+                report.reported_user_id == user_model.User.id,
+                report.is_deleted == False,
+            ),
         )
+        .outerjoin(restrict_ban, restrict_ban.report_id == report.id)
+        .where(user_model.User.id.in_(user_id_list))
+        .group_by(user_model.User.id)
     )
 
-    return query.one()
+
+# get user violation details, from the summary, computed if the user has none yet
+def get_user_violation_details(user_id: UUID, db_session: Session):
+    violation_summary = (
+        db_session.query(admin_model.UserViolationSummary)
+        .filter(admin_model.UserViolationSummary.user_id == user_id)
+        .first()
+    )
+    if violation_summary:
+        return violation_summary
+
+    return db_session.execute(get_users_violation_details_query([user_id])).one()
+
+
+# recompute the violation summary of the users, call it in the transaction that
+# resolves reports or concludes appeals/restrict/bans of the users
+def refresh_user_violation_summary(user_id_list: list[UUID], db_session: Session):
+    # pending report/restrict ban changes are counted
+    db_session.flush()
+
+    violation_details = get_users_violation_details_query(user_id_list).subquery()
+    insert_stmt = insert(admin_model.UserViolationSummary).from_select(
+        list(violation_details.c.keys()), select(violation_details)
+    )
+    upsert_stmt = insert_stmt.on_conflict_do_update(
+        index_elements=[admin_model.UserViolationSummary.user_id],
+        set_={
+            **{
+                column: insert_stmt.excluded[column]
+                for column in violation_details.c.keys()
+                if column != "user_id"
+            },
+            "updated_at": func.now(),
+        },
+    )
+    return db_session.execute(upsert_stmt).rowcount
+
+
+# users with reports against them, a chunk of upto limit users with id > last_user_id
+def get_reported_user_ids_chunk(
+    last_user_id: UUID | None, limit: int, db_session: Session
+):
+    query = db_session.query(user_model.User.id).filter(
+        exists().where(
+            admin_model.UserContentReportDetail.reported_user_id == user_model.User.id
+        )
+    )
+    if last_user_id:
+        query = query.filter(user_model.User.id > last_user_id)
+
+    return query.order_by(user_model.User.id).limit(limit).all()
+
+
+# export type: (case model, timeline model or None, timeline fk column name)
+EXPORT_MODELS = {
+    "reports": (admin_model.UserContentReportDetail, None, None),
+    "appeals": (admin_model.UserContentRestrictBanAppealDetail, None, None),
+    "report_timelines": (
+        admin_model.UserContentReportDetail,
+        admin_model.UserContentReportEventTimeline,
+        "report_id",
+    ),
+    "appeal_timelines": (
+        admin_model.UserContentRestrictBanAppealDetail,
+        admin_model.UserContentRestrictBanAppealEventTimeline,
+        "appeal_id",
+    ),
+}
+
+
+# rows for the admin export, plain columns (no orm objects) fetched yield_per rows at a
+# time through a server side cursor, timelines are filtered by their case's status and
+# moderator, dates apply to created_at of the exported rows, end_date is inclusive
+def get_export_rows_query(
+    export_type: str,
+    status_in_list: list[str] | None,
+    moderator_id: UUID | None,
+    start_date: date | None,
+    end_date: date | None,
+    yield_per: int,
+    db_session: Session,
+):
+    case_model, timeline_model, fk_name = EXPORT_MODELS[export_type]
+    if timeline_model is None:
+        query = db_session.query(*case_model.__table__.columns)
+        row_model = case_model
+    else:
+        query = db_session.query(
+            *timeline_model.__table__.columns, case_model.case_number
+        ).join(case_model, getattr(timeline_model, fk_name) == case_model.id)
+        row_model = timeline_model
+
+    query = query.filter(case_model.is_deleted == False)
+    if status_in_list:
+        query = query.filter(case_model.status.in_(status_in_list))
+    if moderator_id:
+        query = query.filter(case_model.moderator_id == moderator_id)
+    if start_date:
+        query = query.filter(row_model.created_at >= start_date)
+    if end_date:
+        query = query.filter(row_model.created_at < end_date + timedelta(days=1))
+
+    return query.order_by(row_model.created_at, row_model.id).yield_per(yield_per)
 
 
 def get_app_user_metrics(
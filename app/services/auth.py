@@ -1,13 +1,64 @@
 from datetime import timedelta
+from uuid import UUID
 
-from sqlalchemy import and_, func
+from sqlalchemy import and_, func, insert, select, true
 from sqlalchemy.orm import Session
 
 from app.config.app import settings
+from app.models import admin as admin_model
 from app.models import auth as auth_model
 from app.models import user as user_model
 
 
+# login lookup, the user by email or username along with its active restrict/ban entry
+# (None if there is none) in one query
+def get_login_user_with_active_restrict_ban_entry(
+    credential: str, is_email: bool, status_not_in_list: list[str], db_session: Session
+):
+    return (
+        db_session.query(user_model.User, admin_model.UserRestrictBanDetail)
+        .outerjoin(
+            admin_model.UserRestrictBanDetail,
+            and_(
+                admin_model.UserRestrictBanDetail.user_id == user_model.User.id,
+                admin_model.UserRestrictBanDetail.is_active == True,
+                admin_model.UserRestrictBanDetail.is_deleted == False,
+            ),
+        )
+        .filter(
+            (
+                (user_model.User.email == credential)
+                if is_email
+                else (user_model.User.username == credential)
+            ),
+            user_model.User.status.notin_(status_not_in_list),
+            user_model.User.is_deleted == False,
+            user_model.User.is_verified == True,
+        )
+        .first()
+    )
+
+
+# new login session and its auth track entry, both rows in one statement
+def add_user_session_auth_track_entry(
+    user_id: UUID, device_info: str, refresh_token_id: str, db_session: Session
+):
+    new_user_session = (
+        insert(user_model.UserSession)
+        .values(user_id=user_id, device_info=device_info)
+        .cte("new_user_session")
+    )
+    db_session.execute(
+        insert(auth_model.UserAuthTrack)
+        .values(
+            refresh_token_id=refresh_token_id,
+            device_info=device_info,
+            user_id=user_id,
+        )
+        .add_cte(new_user_session)
+    )
+
+
 # get the entry with specific refresh token id and active status
 def check_refresh_token_id_in_user_auth_track(
     token_id: str, status: str, db_session: Session
@@ -100,82 +151,76 @@ def get_all_employee_auth_track_entries_by_employee_id(
     )
 
 
-def user_auth_track_user_inactivity_delete(db_session: Session):
-    # join user and user_auth_track to get the latest entry in the past and compare it with inactive_delete_after to see if it is inactive for specified time to be deleted
-    # subquery to get latest entry for each user
-    latest_entry_subq = (
-        db_session.query(
-            auth_model.UserAuthTrack.user_id,
-            func.max(auth_model.UserAuthTrack.created_at).label("latest_created_at"),
+# latest auth track entry of each user, index lookup per user, join with true()
+def get_latest_user_auth_track_entry_lateral():
+    return (
+        select(
+            auth_model.UserAuthTrack.status,
+            auth_model.UserAuthTrack.created_at,
+            auth_model.UserAuthTrack.is_deleted,
         )
-        .group_by(auth_model.UserAuthTrack.user_id)
-        .subquery()
+        .where(auth_model.UserAuthTrack.user_id == user_model.User.id)
+        .order_by(auth_model.UserAuthTrack.created_at.desc())
+        .limit(1)
+        .lateral()
     )
 
-    # join user, user auth track and subquery with filters
-    return (
+
+# inactive users whose latest entry is older than their inactive_delete_after, a chunk
+# of upto limit users with id > last_user_id ordered by id
+def user_auth_track_user_inactivity_delete(
+    last_user_id: UUID | None, limit: int, db_session: Session
+):
+    latest_entry = get_latest_user_auth_track_entry_lateral()
+
+    query = (
         db_session.query(user_model.User)
-        .join(
-            auth_model.UserAuthTrack,
-            auth_model.UserAuthTrack.user_id == user_model.User.id,
-        )
-        .join(
-            latest_entry_subq,
-            and_(
-                auth_model.UserAuthTrack.user_id == latest_entry_subq.c.user_id,
-                auth_model.UserAuthTrack.created_at
-                == latest_entry_subq.c.latest_created_at,
-            ),
-        )
+        .join(latest_entry, true())
         .filter(
             user_model.User.status.in_(["INA"]),
             user_model.User.is_deleted == False,
             user_model.User.is_verified == True,
-            auth_model.UserAuthTrack.status.in_(["ACT", "INV"]),
+            latest_entry.c.status.in_(["ACT", "INV"]),
             func.now()
             >= (
-                auth_model.UserAuthTrack.created_at
+                latest_entry.c.created_at
                 + (user_model.User.inactive_delete_after * timedelta(days=1))
                 + timedelta(minutes=settings.refresh_token_expire_minutes)
             ),
-            auth_model.UserAuthTrack.is_deleted == False,
+            latest_entry.c.is_deleted == False,
         )
-        .all()
     )
+    if last_user_id:
+        query = query.filter(user_model.User.id > last_user_id)
 
+    return query.order_by(user_model.User.id).limit(limit).all()
 
-def user_auth_track_user_inactivity_inactive(db_session: Session):
-    # join user and user_auth_track to get the latest entry in the past
-    # subquery to get latest entry for each user
-    latest_entry_subq = (
-        db_session.query(
-            auth_model.UserAuthTrack.user_id,
-            func.max(auth_model.UserAuthTrack.created_at).label("latest_created_at"),
-        )
-        .group_by(auth_model.UserAuthTrack.user_id)
-        .subquery()
-    )
 
-    # join user, user auth track, subquery with filters
-    return (
-        db_session.query(auth_model.UserAuthTrack)
-        .join(
-            latest_entry_subq,
-            and_(
-                auth_model.UserAuthTrack.user_id == latest_entry_subq.c.user_id,
-                auth_model.UserAuthTrack.created_at
-                == latest_entry_subq.c.latest_created_at,
-            ),
-        )
+# users whose latest entry is older than user_inactivity_days, a chunk of upto limit
+# users with id > last_user_id ordered by id
+def user_auth_track_user_inactivity_inactive(
+    last_user_id: UUID | None, limit: int, db_session: Session
+):
+    latest_entry = get_latest_user_auth_track_entry_lateral()
+
+    query = (
+        db_session.query(user_model.User)
+        .join(latest_entry, true())
         .filter(
-            auth_model.UserAuthTrack.status.in_(["ACT", "INV"]),
+            user_model.User.status.in_(["ACT", "RSP", "RSF", "TBN"]),
+            user_model.User.is_deleted == False,
+            user_model.User.is_verified == True,
+            latest_entry.c.status.in_(["ACT", "INV"]),
             func.now()
             >= (
-                auth_model.UserAuthTrack.created_at
+                latest_entry.c.created_at
                 + timedelta(days=settings.user_inactivity_days)
                 + timedelta(minutes=settings.refresh_token_expire_minutes)
             ),
-            auth_model.UserAuthTrack.is_deleted == False,
+            latest_entry.c.is_deleted == False,
         )
-        .all()
     )
+    if last_user_id:
+        query = query.filter(user_model.User.id > last_user_id)
+
+    return query.order_by(user_model.User.id).limit(limit).all()
@@ -1,6 +1,7 @@
 from uuid import UUID
 
-from sqlalchemy import exists, func, select
+from sqlalchemy import and_, case, exists, func, select
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.orm import Session
 
 from app.models import comment as comment_model
@@ -69,28 +70,71 @@ def count_comments_admin(
     )
 
 
-def get_all_comments_of_post(
+# one page of comments of a post in a single statement, author, like count and
+# viewer like flag are joined in, newest first
+# ids are ulids, so keyset on id is stable while new comments are added, one extra row is
+# fetched to know if there is a next page
+def get_comments_page_of_post(
     post_id: UUID,
+    curr_user_id: UUID,
     status_in_list: list[str] | None,
     limit: int,
     last_comment_id: UUID | None,
     db_session: Session,
     is_ban_final: bool = False,
 ):
-    query = db_session.query(comment_model.Comment).filter(
-        comment_model.Comment.post_id == post_id,
-        comment_model.Comment.status.in_(status_in_list) if status_in_list else True,
-        comment_model.Comment.is_ban_final == is_ban_final,
-        comment_model.Comment.is_deleted == False,
+    num_of_likes_subquery = (
+        select(func.count(comment_model.CommentLike.id))
+        .where(
+            comment_model.CommentLike.comment_id == comment_model.Comment.id,
+            comment_model.CommentLike.status == "ACT",
+            comment_model.CommentLike.is_deleted == False,
+        )
+        .correlate(comment_model.Comment)
+        .scalar_subquery()
+    )
+    curr_user_like_subquery = (
+        exists()
+        .where(
+            comment_model.CommentLike.comment_id == comment_model.Comment.id,
+            comment_model.CommentLike.user_id == curr_user_id,
+            comment_model.CommentLike.status == "ACT",
+            comment_model.CommentLike.is_deleted == False,
+        )
+        .correlate(comment_model.Comment)
+    )
+
+    query = (
+        db_session.query(
+            comment_model.Comment.id,
+            comment_model.Comment.content,
+            comment_model.Comment.status,
+            comment_model.Comment.created_at,
+            user_model.User.username,
+            user_model.User.profile_picture,
+            num_of_likes_subquery.label("num_of_likes"),
+            curr_user_like_subquery.label("curr_user_like"),
+        )
+        .join(user_model.User, user_model.User.id == comment_model.Comment.user_id)
+        .filter(
+            comment_model.Comment.post_id == post_id,
+            (
+                comment_model.Comment.status.in_(status_in_list)
+                if status_in_list
+                else True
+            ),
+            comment_model.Comment.is_ban_final == is_ban_final,
+            comment_model.Comment.is_deleted == False,
+        )
     )
 
     if last_comment_id:
         query = query.filter(comment_model.Comment.id < last_comment_id)
 
-    results = query.order_by(comment_model.Comment.id.desc()).limit(limit).all()
-    next_last_comment_id = results[-1].id if results else None
+    results = query.order_by(comment_model.Comment.id.desc()).limit(limit + 1).all()
+    next_last_comment_id = results[limit - 1].id if len(results) > limit else None
 
-    return results, next_last_comment_id
+    return results[:limit], next_last_comment_id
 
 
 def count_comment_likes(comment_id: UUID, status: str, db_session: Session):
@@ -119,24 +163,6 @@ def count_comment_likes_admin(
     )
 
 
-def count_all_comments_likes(comment_id_list: list[UUID], db_session: Session):
-    results = (
-        db_session.query(
-            comment_model.CommentLike.comment_id,
-            func.count(comment_model.CommentLike.id),
-        )
-        .filter(
-            comment_model.CommentLike.comment_id.in_(comment_id_list),
-            comment_model.CommentLike.status == "ACT",
-            comment_model.CommentLike.is_deleted == False,
-        )
-        .group_by(comment_model.CommentLike.comment_id)
-        .all()
-    )
-
-    return dict(results)
-
-
 def user_like_exists(user_id: UUID, comment_id: UUID, db_session: Session):
     return (
         db_session.query(comment_model.CommentLike)
@@ -150,17 +176,34 @@ def user_like_exists(user_id: UUID, comment_id: UUID, db_session: Session):
     )
 
 
-def curr_user_like_for_exists_comments(
-    comment_id_list: list[UUID], curr_user_id: UUID, db_session: Session
-):
-    stmt = select(comment_model.CommentLike.comment_id).filter(
-        comment_model.CommentLike.comment_id.in_(comment_id_list),
-        comment_model.CommentLike.status == "ACT",
-        comment_model.CommentLike.user_id == curr_user_id,
-        comment_model.CommentLike.is_deleted == False,
+# apply buffered like/unlike actions in one statement, one row per (user_id, comment_id)
+# a like after unlike is counted as a new like, hidden or deleted likes are left to the status triggers
+def upsert_comment_likes(like_rows: list[dict], db_session: Session):
+    like_table = comment_model.CommentLike.__table__
+    insert_stmt = insert(like_table).values(like_rows)
+    upsert_stmt = insert_stmt.on_conflict_do_update(
+        index_elements=[like_table.c.user_id, like_table.c.comment_id],
+        set_={
+            "status": insert_stmt.excluded.status,
+            "created_at": case(
+                (
+                    and_(
+                        like_table.c.status == "RMV",
+                        insert_stmt.excluded.status == "ACT",
+                    ),
+                    func.now(),
+                ),
+                else_=like_table.c.created_at,
+            ),
+            "updated_at": func.now(),
+        },
+        where=and_(
+            like_table.c.status.in_(["ACT", "RMV"]),
+            like_table.c.status != insert_stmt.excluded.status,
+            like_table.c.is_deleted == False,
+        ),
     )
-
-    return db_session.execute(stmt).scalars().all()
+    return db_session.execute(upsert_stmt).rowcount
 
 
 def get_comment_like_users(
@@ -0,0 +1,127 @@
+from datetime import timedelta
+
+from sqlalchemy import func, select, union_all
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.models import admin as admin_model
+from app.models import employee as employee_model
+from app.models import image as image_model
+from app.models import post as post_model
+from app.models import user as user_model
+
+
+# new blob starts with one reference, an existing one gets another and its upload time bumped
+# so that a gc run in progress does not reclaim it
+def register_image_blob(image_name: str, size: int, db_session: Session):
+    blob_table = image_model.ImageBlob.__table__
+    insert_stmt = insert(blob_table).values(name=image_name, size=size, ref_count=1)
+    db_session.execute(
+        insert_stmt.on_conflict_do_update(
+            index_elements=[blob_table.c.name],
+            set_={
+                "ref_count": blob_table.c.ref_count + 1,
+                "last_uploaded_at": func.now(),
+            },
+        )
+    )
+
+
+# row of a blob about to be written, committed before the write, not in the request
+# transaction, a new blob starts unreferenced, an existing one gets its upload time
+# bumped
+# gc skips both for the grace period, a blob whose request fails is reclaimed after it
+def reserve_image_blob(image_name: str, size: int, db_session: Session):
+    blob_table = image_model.ImageBlob.__table__
+    insert_stmt = insert(blob_table).values(name=image_name, size=size, ref_count=0)
+    db_session.execute(
+        insert_stmt.on_conflict_do_update(
+            index_elements=[blob_table.c.name],
+            set_={"last_uploaded_at": func.now()},
+        )
+    )
+
+
+# every row that uses an image, rows of deleted users/content don't keep blobs alive
+def get_image_references_query():
+    return union_all(
+        select(post_model.Post.image.label("name")).where(
+            post_model.Post.is_deleted == False
+        ),
+        select(user_model.User.profile_picture.label("name")).where(
+            user_model.User.profile_picture.is_not(None),
+            user_model.User.is_deleted == False,
+        ),
+        select(employee_model.Employee.profile_picture.label("name")).where(
+            employee_model.Employee.profile_picture.is_not(None)
+        ),
+        select(
+            admin_model.UserContentRestrictBanAppealDetail.attachment.label("name")
+        ).where(
+            admin_model.UserContentRestrictBanAppealDetail.attachment.is_not(None),
+            admin_model.UserContentRestrictBanAppealDetail.is_deleted == False,
+        ),
+    ).subquery()
+
+
+# recount references of all blobs set based, fixes any drift from edits and deletes
+# which don't maintain ref_count themselves
+def refresh_image_blob_ref_counts(db_session: Session):
+    blob_table = image_model.ImageBlob.__table__
+    references = get_image_references_query()
+    ref_counts = (
+        select(references.c.name, func.count().label("ref_count"))
+        .group_by(references.c.name)
+        .subquery()
+    )
+
+    referenced_result = db_session.execute(
+        blob_table.update()
+        .where(
+            blob_table.c.name == ref_counts.c.name,
+            blob_table.c.ref_count != ref_counts.c.ref_count,
+        )
+        .values(ref_count=ref_counts.c.ref_count)
+    )
+    unreferenced_result = db_session.execute(
+        blob_table.update()
+        .where(
+            blob_table.c.ref_count != 0,
+            ~select(references.c.name)
+            .where(references.c.name == blob_table.c.name)
+            .exists(),
+        )
+        .values(ref_count=0)
+    )
+
+    return referenced_result.rowcount + unreferenced_result.rowcount
+
+
+# delete a batch of unreferenced blobs past the grace period, returns the deleted names
+# ref_count and upload time are checked again on delete, a concurrent upload of the same content wins
+# the rows stay locked until commit, the caller removes the files before committing so
+# that an upload reserving the same blob waits and then writes it again
+def delete_unreferenced_image_blobs(grace_hours: int, limit: int, db_session: Session):
+    blob_table = image_model.ImageBlob.__table__
+    cutoff = func.now() - timedelta(hours=grace_hours)
+
+    candidates = (
+        select(blob_table.c.name)
+        .where(blob_table.c.ref_count == 0, blob_table.c.last_uploaded_at < cutoff)
+        .order_by(blob_table.c.last_uploaded_at)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+
+    result = db_session.execute(
+        blob_table.delete()
+        .where(
+            blob_table.c.name.in_(candidates),
+            blob_table.c.ref_count == 0,
+            blob_table.c.last_uploaded_at < cutoff,
+        )
+        .returning(blob_table.c.name, blob_table.c.size)
+    )
+    return result.all()
+
@@ -0,0 +1,26 @@
+from uuid import UUID
+
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.models import job as job_model
+
+
+def get_job_checkpoint(job_name: str, db_session: Session):
+    return (
+        db_session.query(job_model.JobCheckpoint.last_id)
+        .filter(job_model.JobCheckpoint.job_name == job_name)
+        .scalar()
+    )
+
+
+def save_job_checkpoint(job_name: str, last_id: UUID | None, db_session: Session):
+    insert_stmt = insert(job_model.JobCheckpoint).values(
+        job_name=job_name, last_id=last_id
+    )
+    upsert_stmt = insert_stmt.on_conflict_do_update(
+        index_elements=[job_model.JobCheckpoint.job_name],
+        set_={"last_id": insert_stmt.excluded.last_id, "updated_at": func.now()},
+    )
+    db_session.execute(upsert_stmt)
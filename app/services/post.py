@@ -1,10 +1,12 @@
 from datetime import timedelta
 from uuid import UUID
 
-from sqlalchemy import exists, func, select
+from sqlalchemy import and_, case, exists, func, select
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.orm import Session
 
 from app.config.app import settings
+from app.models import comment as comment_model
 from app.models import post as post_model
 from app.models import user as user_model
 
@@ -39,6 +41,77 @@ def get_all_posts_by_id_query(
     )
 
 
+# posts with their owner, like and comment counts and current user like/follow state,
+# one query for the whole batch instead of a lookup and counts per post
+def get_posts_batch(
+    post_id_list: list[UUID],
+    curr_user_id: UUID,
+    status_not_in_list: list[str],
+    db_session: Session,
+):
+    num_of_likes_subquery = (
+        select(func.count(post_model.PostLike.id))
+        .where(
+            post_model.PostLike.post_id == post_model.Post.id,
+            post_model.PostLike.status == "ACT",
+            post_model.PostLike.is_deleted == False,
+        )
+        .correlate(post_model.Post)
+        .scalar_subquery()
+    )
+    num_of_comments_subquery = (
+        select(func.count(comment_model.Comment.id))
+        .where(
+            comment_model.Comment.post_id == post_model.Post.id,
+            comment_model.Comment.status.in_(["PUB", "FLB"]),
+            comment_model.Comment.is_deleted == False,
+            comment_model.Comment.is_ban_final == False,
+        )
+        .correlate(post_model.Post)
+        .scalar_subquery()
+    )
+    curr_user_like_subquery = (
+        exists()
+        .where(
+            post_model.PostLike.post_id == post_model.Post.id,
+            post_model.PostLike.user_id == curr_user_id,
+            post_model.PostLike.status == "ACT",
+            post_model.PostLike.is_deleted == False,
+        )
+        .correlate(post_model.Post)
+    )
+    is_follower_subquery = (
+        exists()
+        .where(
+            user_model.UserFollowAssociation.follower_user_id == curr_user_id,
+            user_model.UserFollowAssociation.followed_user_id
+            == post_model.Post.user_id,
+            user_model.UserFollowAssociation.status == "ACP",
+            user_model.UserFollowAssociation.is_deleted == False,
+        )
+        .correlate(post_model.Post)
+    )
+
+    return (
+        db_session.query(
+            post_model.Post,
+            user_model.User,
+            num_of_likes_subquery.label("num_of_likes"),
+            num_of_comments_subquery.label("num_of_comments"),
+            curr_user_like_subquery.label("curr_user_like"),
+            is_follower_subquery.label("is_follower"),
+        )
+        .join(user_model.User, user_model.User.id == post_model.Post.user_id)
+        .filter(
+            post_model.Post.id.in_(post_id_list),
+            post_model.Post.status.notin_(status_not_in_list),
+            post_model.Post.is_deleted == False,
+            post_model.Post.is_ban_final == False,
+        )
+        .all()
+    )
+
+
 def count_posts(user_id: UUID, status: str, db_session: Session):
     return (
         db_session.query(func.count(post_model.Post.id))
@@ -163,6 +236,36 @@ def user_like_exists(user_id: UUID, post_id: UUID, db_session: Session):
     return user_like_exists_query(user_id, post_id, db_session).first()
 
 
+# apply buffered like/unlike actions in one statement, one row per (user_id, post_id)
+# a like after unlike is counted as a new like, hidden or deleted likes are left to the status triggers
+def upsert_post_likes(like_rows: list[dict], db_session: Session):
+    like_table = post_model.PostLike.__table__
+    insert_stmt = insert(like_table).values(like_rows)
+    upsert_stmt = insert_stmt.on_conflict_do_update(
+        index_elements=[like_table.c.user_id, like_table.c.post_id],
+        set_={
+            "status": insert_stmt.excluded.status,
+            "created_at": case(
+                (
+                    and_(
+                        like_table.c.status == "RMV",
+                        insert_stmt.excluded.status == "ACT",
+                    ),
+                    func.now(),
+                ),
+                else_=like_table.c.created_at,
+            ),
+            "updated_at": func.now(),
+        },
+        where=and_(
+            like_table.c.status.in_(["ACT", "RMV"]),
+            like_table.c.status != insert_stmt.excluded.status,
+            like_table.c.is_deleted == False,
+        ),
+    )
+    return db_session.execute(upsert_stmt).rowcount
+
+
 def get_post_like_users(
     curr_user_id: UUID,
     post_id: UUID,
@@ -1,13 +1,18 @@
 from datetime import timedelta
 from uuid import UUID
 
-from sqlalchemy import and_, func, select
+from sqlalchemy import and_, exists, func, literal_column, select, true, update
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.orm import Session, aliased
 
 from app.config.app import settings
 from app.models import admin as admin_model
+from app.models import post as post_model
 from app.models import user as user_model
 
+# stands for no report reason user in the open report key
+NIL_UUID = literal_column("'00000000-0000-0000-0000-000000000000'::uuid")
+
 
 def get_user_by_username(
     username: str,
@@ -211,6 +216,54 @@ def get_user_session_entries_query_by_user_id(
     )
 
 
+# login doesn't close the previous session of the same user and device, this closes
+# upto limit active sessions that are not the latest of their user/device pair, logged
+# out at the time of the login that replaced them
+# latest is by login time and then id, so sessions with the same login time are closed
+# too
+def deactivate_superseded_user_sessions(limit: int, db_session: Session):
+    user_device_window = {
+        "partition_by": (
+            user_model.UserSession.user_id,
+            user_model.UserSession.device_info,
+        ),
+        "order_by": (
+            user_model.UserSession.login_at.desc(),
+            user_model.UserSession.id.desc(),
+        ),
+    }
+    ranked_sessions = (
+        select(
+            user_model.UserSession.id,
+            func.row_number().over(**user_device_window).label("session_rank"),
+            func.first_value(user_model.UserSession.login_at)
+            .over(**user_device_window)
+            .label("latest_login_at"),
+        )
+        .where(
+            user_model.UserSession.is_active == True,
+            user_model.UserSession.is_deleted == False,
+        )
+        .subquery()
+    )
+    superseded_sessions = (
+        select(ranked_sessions.c.id, ranked_sessions.c.latest_login_at)
+        .where(ranked_sessions.c.session_rank > 1)
+        .limit(limit)
+        .subquery()
+    )
+
+    return db_session.execute(
+        update(user_model.UserSession)
+        .where(
+            user_model.UserSession.id == superseded_sessions.c.id,
+            user_model.UserSession.is_active == True,
+        )
+        .values(is_active=False, logout_at=superseded_sessions.c.latest_login_at)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+
 # get user follow entry
 def get_user_follow_association_entry_query(
     follower_id: str, followed_id: str, status: str, db_session: Session
@@ -244,51 +297,59 @@ def get_user_follow_requests(followed_id: str, status: str, db_session: Session)
 
 
 # get users whose deactivation period for scheduled delete is done
-def check_deactivation_expiration_for_scheduled_delete(db_session: Session):
-    # get latest entries of each user
-    subq = (
-        db_session.query(
-            user_model.UserAccountHistory.user_id,
-            func.max(user_model.UserAccountHistory.created_at).label(
-                "latest_created_at"
-            ),
+# a chunk of upto limit users with id > last_user_id ordered by id
+def check_deactivation_expiration_for_scheduled_delete(
+    last_user_id: UUID | None, limit: int, db_session: Session
+):
+    # latest account history entry of each user, index lookup per user
+    latest_entry = (
+        select(
+            user_model.UserAccountHistory.account_detail_type,
+            user_model.UserAccountHistory.event_type,
+            user_model.UserAccountHistory.created_at,
+            user_model.UserAccountHistory.is_deleted,
         )
-        .group_by(user_model.UserAccountHistory.user_id)
-        .subquery()
+        .where(user_model.UserAccountHistory.user_id == user_model.User.id)
+        .order_by(user_model.UserAccountHistory.created_at.desc())
+        .limit(1)
+        .lateral()
     )
 
-    # inner join with the table to get the required user account history entries
-    return (
-        db_session.query(user_model.UserAccountHistory)
-        .join(
-            subq,
-            and_(
-                user_model.UserAccountHistory.user_id == subq.c.user_id,
-                user_model.UserAccountHistory.created_at == subq.c.latest_created_at,
-            ),
-        )
+    query = (
+        db_session.query(user_model.User)
+        .join(latest_entry, true())
         .filter(
-            user_model.UserAccountHistory.account_detail_type == "Account",
-            user_model.UserAccountHistory.event_type.in_(["DDS", "BDS", "IDS"]),
+            user_model.User.status.in_(["PDH", "PDB", "PDI"]),
+            latest_entry.c.account_detail_type == "Account",
+            latest_entry.c.event_type.in_(["DDS", "BDS", "IDS"]),
             func.now()
             >= (
-                user_model.UserAccountHistory.created_at
+                latest_entry.c.created_at
                 + timedelta(days=settings.deactivation_delete_expiry_days)
             ),
-            user_model.UserAccountHistory.is_deleted == False,
+            latest_entry.c.is_deleted == False,
         )
-        .all()
     )
+    if last_user_id:
+        query = query.filter(user_model.User.id > last_user_id)
+
+    return query.order_by(user_model.User.id).limit(limit).all()
 
 
 # get report entry from usercontentreportdetail table
+# a report can have more reporters than the one who opened it, so reporters are checked
 def check_if_same_report_exists(
     user_id: str, content_id: str, report_reason: str, db_session: Session
 ):
     return (
         db_session.query(admin_model.UserContentReportDetail)
+        .join(
+            admin_model.UserContentReportReporter,
+            admin_model.UserContentReportReporter.report_id
+            == admin_model.UserContentReportDetail.id,
+        )
         .filter(
-            admin_model.UserContentReportDetail.reporter_user_id == user_id,
+            admin_model.UserContentReportReporter.reporter_user_id == user_id,
             admin_model.UserContentReportDetail.reported_item_id == content_id,
             admin_model.UserContentReportDetail.report_reason == report_reason,
             admin_model.UserContentReportDetail.is_deleted == False,
@@ -297,6 +358,50 @@ def check_if_same_report_exists(
     )
 
 
+# add a report to the open report of the item with the same reason (and reason user),
+# a new report is opened if there's none, upsert on the unique open report index
+# returns the report id, None if the reporter is already a reporter of the report
+def add_report(
+    reporter_user_id: UUID,
+    reported_item_id: UUID,
+    reported_item_type: str,
+    reported_user_id: UUID,
+    report_reason: str,
+    report_reason_user_id: UUID | None,
+    db_session: Session,
+):
+    report_table = admin_model.UserContentReportDetail
+    insert_stmt = insert(report_table).values(
+        reporter_user_id=reporter_user_id,
+        reported_item_id=reported_item_id,
+        reported_item_type=reported_item_type,
+        reported_user_id=reported_user_id,
+        report_reason=report_reason,
+        report_reason_user_id=report_reason_user_id,
+    )
+    upsert_stmt = insert_stmt.on_conflict_do_update(
+        index_elements=[
+            report_table.reported_item_id,
+            report_table.reported_item_type,
+            report_table.report_reason,
+            func.coalesce(report_table.report_reason_user_id, NIL_UUID),
+        ],
+        index_where=and_(
+            report_table.status == "OPN", report_table.is_deleted == False
+        ),
+        set_={"reporter_count": report_table.reporter_count + 1},
+    ).returning(report_table.id)
+    report_id = db_session.execute(upsert_stmt).scalar()
+
+    reporter_stmt = (
+        insert(admin_model.UserContentReportReporter)
+        .values(report_id=report_id, reporter_user_id=reporter_user_id)
+        .on_conflict_do_nothing()
+        .returning(admin_model.UserContentReportReporter.report_id)
+    )
+    return db_session.execute(reporter_stmt).scalar()
+
+
 # get user account history entry for a user
 def get_user_account_history_entry(
     user_id: UUID, account_detail_type: str, event_type: str, db_session: Session
@@ -361,6 +466,117 @@ def user_followed_by(current_user_id: UUID, profile_user_id: UUID, db_session: S
     )
 
 
+# followers of a user among the given users
+def get_user_follower_ids(
+    user_id: UUID, follower_id_list: list[UUID], db_session: Session
+):
+    stmt = select(user_model.UserFollowAssociation.follower_user_id).filter(
+        user_model.UserFollowAssociation.followed_user_id == user_id,
+        user_model.UserFollowAssociation.follower_user_id.in_(follower_id_list),
+        user_model.UserFollowAssociation.status == "ACP",
+        user_model.UserFollowAssociation.is_deleted == False,
+    )
+
+    return db_session.execute(stmt).scalars().all()
+
+
+# users with post, follower and following counts and whether the current user follows,
+# one query for the whole batch instead of a lookup and counts per user
+def get_users_batch(
+    username_list: list[str],
+    curr_user_id: UUID,
+    status_not_in_list: list[str],
+    db_session: Session,
+):
+    num_of_posts_subquery = (
+        select(func.count(post_model.Post.id))
+        .where(
+            post_model.Post.user_id == user_model.User.id,
+            post_model.Post.status == "PUB",
+            post_model.Post.is_deleted == False,
+            post_model.Post.is_ban_final == False,
+        )
+        .correlate(user_model.User)
+        .scalar_subquery()
+    )
+    num_of_followers_subquery = (
+        select(func.count(user_model.UserFollowAssociation.id))
+        .where(
+            user_model.UserFollowAssociation.followed_user_id == user_model.User.id,
+            user_model.UserFollowAssociation.status == "ACP",
+            user_model.UserFollowAssociation.is_deleted == False,
+        )
+        .correlate(user_model.User)
+        .scalar_subquery()
+    )
+    num_of_following_subquery = (
+        select(func.count(user_model.UserFollowAssociation.id))
+        .where(
+            user_model.UserFollowAssociation.follower_user_id == user_model.User.id,
+            user_model.UserFollowAssociation.status == "ACP",
+            user_model.UserFollowAssociation.is_deleted == False,
+        )
+        .correlate(user_model.User)
+        .scalar_subquery()
+    )
+    follows_user_subquery = (
+        exists()
+        .where(
+            user_model.UserFollowAssociation.follower_user_id == curr_user_id,
+            user_model.UserFollowAssociation.followed_user_id == user_model.User.id,
+            user_model.UserFollowAssociation.status == "ACP",
+            user_model.UserFollowAssociation.is_deleted == False,
+        )
+        .correlate(user_model.User)
+    )
+
+    return (
+        db_session.query(
+            user_model.User,
+            num_of_posts_subquery.label("num_of_posts"),
+            num_of_followers_subquery.label("num_of_followers"),
+            num_of_following_subquery.label("num_of_following"),
+            follows_user_subquery.label("follows_user"),
+        )
+        .filter(
+            user_model.User.username.in_(username_list),
+            user_model.User.status.notin_(status_not_in_list),
+            user_model.User.is_deleted == False,
+            user_model.User.is_verified == True,
+        )
+        .all()
+    )
+
+
+# user_followed_by for many profile users, (profile user id, username) rows
+def get_users_followed_by_batch(
+    current_user_id: UUID, profile_user_id_list: list[UUID], db_session: Session
+):
+    user_follow_assoc_1 = aliased(user_model.UserFollowAssociation, name="ufa1")
+    user_follow_assoc_2 = aliased(user_model.UserFollowAssociation, name="ufa2")
+    return (
+        db_session.query(user_follow_assoc_2.followed_user_id, user_model.User.username)
+        .select_from(user_follow_assoc_1)
+        .join(
+            user_follow_assoc_2,
+            user_follow_assoc_1.followed_user_id
+            == user_follow_assoc_2.follower_user_id,
+        )
+        .join(
+            user_model.User, user_model.User.id == user_follow_assoc_1.followed_user_id
+        )
+        .filter(
+            user_follow_assoc_1.follower_user_id == current_user_id,
+            user_follow_assoc_2.followed_user_id.in_(profile_user_id_list),
+            user_follow_assoc_1.status == "ACP",
+            user_follow_assoc_2.status == "ACP",
+            user_follow_assoc_1.is_deleted == False,
+            user_follow_assoc_2.is_deleted == False,
+        )
+        .all()
+    )
+
+
 # get user following ids
 def get_user_following_ids(user_id: UUID, db_session: Session):
     stmt = select(user_model.UserFollowAssociation.followed_user_id).filter(
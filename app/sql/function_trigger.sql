@@ -877,4 +877,182 @@ CREATE TRIGGER comment_is_deleted_update_trigger
 AFTER UPDATE OF status ON comment
 FOR EACH ROW
 WHEN (OLD.is_deleted = FALSE AND NEW.is_deleted = TRUE)
-EXECUTE FUNCTION update_post_postlike_comment_commentlike_status(4);
\ No newline at end of file
+EXECUTE FUNCTION update_post_postlike_comment_commentlike_status(4);
+
+
+/*Content versions for conditional GET (ETag). Bumped once per statement for every post/user whose likes, comments, comment likes, posts or follows changed, so the etag check reads a single column instead of aggregating the child rows*/
+CREATE OR REPLACE FUNCTION bump_post_version()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        UPDATE post SET version = version + 1
+        WHERE id IN (SELECT post_id FROM old_rows);
+    ELSE
+        UPDATE post SET version = version + 1
+        WHERE id IN (SELECT post_id FROM new_rows);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+
+CREATE OR REPLACE FUNCTION bump_post_version_comment_like()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        UPDATE post SET version = version + 1
+        WHERE id IN (
+            SELECT c.post_id FROM comment c JOIN old_rows r ON r.comment_id = c.id
+        );
+    ELSE
+        UPDATE post SET version = version + 1
+        WHERE id IN (
+            SELECT c.post_id FROM comment c JOIN new_rows r ON r.comment_id = c.id
+        );
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+
+/*comments show the author's username and profile picture*/
+CREATE OR REPLACE FUNCTION bump_post_version_comment_user()
+RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE post SET version = version + 1
+    WHERE id IN (SELECT post_id FROM comment WHERE user_id = NEW.id);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+
+CREATE OR REPLACE FUNCTION bump_user_version_follow()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        UPDATE "user" SET version = version + 1
+        WHERE id IN (
+            SELECT followed_user_id FROM old_rows
+            UNION
+            SELECT follower_user_id FROM old_rows
+        );
+    ELSE
+        UPDATE "user" SET version = version + 1
+        WHERE id IN (
+            SELECT followed_user_id FROM new_rows
+            UNION
+            SELECT follower_user_id FROM new_rows
+        );
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+
+CREATE OR REPLACE FUNCTION bump_user_version_post()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        UPDATE "user" SET version = version + 1 WHERE id = OLD.user_id;
+    ELSE
+        UPDATE "user" SET version = version + 1 WHERE id = NEW.user_id;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+
+CREATE TRIGGER post_like_insert_post_version_trigger
+AFTER INSERT ON post_like
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION bump_post_version();
+
+CREATE TRIGGER post_like_update_post_version_trigger
+AFTER UPDATE ON post_like
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION bump_post_version();
+
+CREATE TRIGGER post_like_delete_post_version_trigger
+AFTER DELETE ON post_like
+REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION bump_post_version();
+
+CREATE TRIGGER comment_insert_post_version_trigger
+AFTER INSERT ON comment
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION bump_post_version();
+
+CREATE TRIGGER comment_update_post_version_trigger
+AFTER UPDATE ON comment
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION bump_post_version();
+
+CREATE TRIGGER comment_delete_post_version_trigger
+AFTER DELETE ON comment
+REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION bump_post_version();
+
+CREATE TRIGGER comment_like_insert_post_version_trigger
+AFTER INSERT ON comment_like
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION bump_post_version_comment_like();
+
+CREATE TRIGGER comment_like_update_post_version_trigger
+AFTER UPDATE ON comment_like
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION bump_post_version_comment_like();
+
+CREATE TRIGGER comment_like_delete_post_version_trigger
+AFTER DELETE ON comment_like
+REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION bump_post_version_comment_like();
+
+CREATE TRIGGER user_profile_update_post_version_trigger
+AFTER UPDATE OF username, profile_picture ON "user"
+FOR EACH ROW
+WHEN (OLD.username IS DISTINCT FROM NEW.username OR OLD.profile_picture IS DISTINCT FROM NEW.profile_picture)
+EXECUTE FUNCTION bump_post_version_comment_user();
+
+CREATE TRIGGER user_follow_insert_user_version_trigger
+AFTER INSERT ON user_follow_association
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION bump_user_version_follow();
+
+CREATE TRIGGER user_follow_update_user_version_trigger
+AFTER UPDATE ON user_follow_association
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION bump_user_version_follow();
+
+CREATE TRIGGER user_follow_delete_user_version_trigger
+AFTER DELETE ON user_follow_association
+REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION bump_user_version_follow();
+
+/*profile shows the post count, caption/like changes don't bump the owner*/
+CREATE TRIGGER post_insert_user_version_trigger
+AFTER INSERT ON post
+FOR EACH ROW
+EXECUTE FUNCTION bump_user_version_post();
+
+CREATE TRIGGER post_status_update_user_version_trigger
+AFTER UPDATE OF status, is_deleted ON post
+FOR EACH ROW
+WHEN (OLD.status IS DISTINCT FROM NEW.status OR OLD.is_deleted IS DISTINCT FROM NEW.is_deleted)
+EXECUTE FUNCTION bump_user_version_post();
+
+CREATE TRIGGER post_delete_user_version_trigger
+AFTER DELETE ON post
+FOR EACH ROW
+EXECUTE FUNCTION bump_user_version_post();
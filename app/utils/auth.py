@@ -333,10 +333,24 @@ def get_current_user(
     return access_token_data
 
 
+# token types allowed on a route, union of the permitted roles compiled once when the
+# route is defined, requests are checked with a single set lookup
+# an unknown role fails at startup instead of on every request
+# per route designation bitmasks can be compiled here the same way if needed
+def compile_access_policy(permitted_roles: list[str]) -> frozenset[str]:
+    allowed_types: set[str] = set()
+    for role in permitted_roles:
+        if role not in map_utils.access_role_types_dict:
+            raise ValueError(f"Role configuration is invalid: {role}")
+        allowed_types |= map_utils.access_role_types_dict[role]
+    return frozenset(allowed_types)
+
+
 # custom dependency for role based authorization
 class AccessRoleDependency:
     def __init__(self, role: list[str]):
         self.role = role
+        self.allowed_types = compile_access_policy(role)
 
     def __call__(
         self, current_user: auth_schema.AccessTokenPayload = Depends(get_current_user)
@@ -346,17 +360,8 @@ class AccessRoleDependency:
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Invalid user payload",
             )
-        type_desgn = current_user.type
-
-        for user_role in self.role:
-            try:
-                if type_desgn in map_utils.transform_access_role(value=user_role):
-                    # print(access_roles[user_role])
-                    # print(user_role)
-                    return current_user
-
-            except HTTPException as exc:
-                raise exc
+        if current_user.type in self.allowed_types:
+            return current_user
 
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -366,6 +371,8 @@ class AccessRoleDependency:
 
 # role based authorization using decorator and wrapper
 def authorize(permitted_roles: list[str]):
+    allowed_types = compile_access_policy(permitted_roles)
+
     def decorator(func):
         @wraps(func)
         def wrapper(*args, **kwargs):
@@ -382,12 +389,8 @@ def authorize(permitted_roles: list[str]):
                     status_code=status.HTTP_401_UNAUTHORIZED,
                     detail="Invalid user payload",
                 )
-            for role in permitted_roles:
-                try:
-                    if user_type in map_utils.transform_access_role(value=role):
-                        return func(*args, **kwargs)
-                except HTTPException as exc:
-                    raise exc
+            if user_type in allowed_types:
+                return func(*args, **kwargs)
 
             raise HTTPException(
                 status_code=403,
@@ -0,0 +1,58 @@
+import time
+from typing import Callable
+from uuid import UUID
+
+from sqlalchemy.orm import Session
+
+from app.config.app import settings
+from app.services import job as job_service
+from app.utils import metrics as metrics_utils
+
+
+# keyset chunked runner for jobs that may match a lot of rows at once
+# fetch_chunk(last_id, limit, db_session) returns upto limit rows with id > last_id
+# ordered by id (from the start if last_id is None), process_chunk(rows, db_session)
+# applies the changes and returns the number of rows changed, after_commit(rows) runs
+# once the chunk is committed (e.g. send mails)
+# each chunk is committed together with the job checkpoint, transactions stay small and
+# a failed or time limited run resumes after the last committed chunk on the next run
+def run_chunked_job(
+    job_name: str,
+    fetch_chunk: Callable[[UUID | None, int, Session], list],
+    process_chunk: Callable[[list, Session], int],
+    db_session: Session,
+    after_commit: Callable[[list], None] | None = None,
+    batch_size: int = settings.job_batch_size,
+    time_budget: float = settings.job_time_budget_seconds,
+):
+    checkpoint = job_service.get_job_checkpoint(
+        job_name=job_name, db_session=db_session
+    )
+    last_id = checkpoint
+    deadline = time.monotonic() + time_budget
+    num_of_rows = 0
+
+    while True:
+        rows = fetch_chunk(last_id, batch_size, db_session)
+        is_done = len(rows) < batch_size
+        if rows:
+            num_of_rows += process_chunk(rows, db_session)
+            last_id = rows[-1].id
+
+        # all rows seen, the next run starts from the beginning
+        new_checkpoint = None if is_done else last_id
+        if new_checkpoint != checkpoint:
+            job_service.save_job_checkpoint(
+                job_name=job_name, last_id=new_checkpoint, db_session=db_session
+            )
+            checkpoint = new_checkpoint
+        db_session.commit()
+
+        if rows and after_commit:
+            after_commit(rows)
+
+        if is_done or time.monotonic() >= deadline:
+            break
+
+    metrics_utils.record_job_rows(job_name, num_of_rows)
+    return num_of_rows
@@ -0,0 +1,58 @@
+import hashlib
+
+from fastapi import Response, status
+
+from app.utils import storage as storage_utils
+
+
+# weak etag from the values a response is built from (ids, updated_at, counts)
+def generate_etag(*parts) -> str:
+    digest = hashlib.sha1(
+        "|".join(str(part) for part in parts).encode("utf-8")
+    ).hexdigest()
+    return f'W/"{digest}"'
+
+
+# responses carry media urls, presigned urls expire while the content version stays
+# the same, so etags are not used with such storage
+def is_etag_enabled() -> bool:
+    return not storage_utils.get_storage().has_expiring_urls
+
+
+# weak comparison as per RFC 9110, If-None-Match can be * or a list of etags
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match or not is_etag_enabled():
+        return False
+    if if_none_match.strip() == "*":
+        return True
+
+    opaque_tag = etag.removeprefix("W/")
+    return any(
+        item.strip().removeprefix("W/") == opaque_tag
+        for item in if_none_match.split(",")
+    )
+
+
+# responses depend on the viewer so they are never shared, and always revalidated using etag
+# private account content seen by a non follower is not stored at all,
+# so that the limited view is not reused once the follow request is accepted
+def get_cache_control(is_private_account: bool, is_owner_or_follower: bool) -> str:
+    if is_private_account and not is_owner_or_follower:
+        return "private, no-store"
+    return "private, no-cache"
+
+
+def set_cache_headers(response: Response, etag: str, cache_control: str):
+    if not is_etag_enabled():
+        response.headers["Cache-Control"] = "private, no-store"
+        response.headers["Vary"] = "Authorization"
+        return
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = cache_control
+    response.headers["Vary"] = "Authorization"
+
+
+def not_modified_response(etag: str, cache_control: str):
+    response = Response(status_code=status.HTTP_304_NOT_MODIFIED)
+    set_cache_headers(response, etag, cache_control)
+    return response
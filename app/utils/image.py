@@ -1,244 +1,498 @@
-import shutil
-from datetime import datetime
+import hashlib
+import json
+import re
+import tempfile
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor
+from functools import partial
+from io import BytesIO
 from logging import Logger
-from pathlib import Path
+from pathlib import Path, PurePath, PurePosixPath
+from threading import Lock
 
 from fastapi import HTTPException, UploadFile, status
-from PIL import Image, UnidentifiedImageError
+from fastapi.responses import JSONResponse
+from PIL import Image, ImageOps, UnidentifiedImageError, features
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Receive, Scope, Send
 
 from app.config.app import settings
+from app.db.db_sqlalchemy import SessionLocal
+from app.services import image as image_service
+from app.utils import storage as storage_utils
 
 image_folder = Path("images")
 MAX_SIZE = settings.image_max_size
 
+# sized variants generated for every uploaded image, variant: (max size in px, square crop)
+IMAGE_VARIANTS = {"thumb": (150, True), "grid": (320, True), "full": (1080, False)}
+IMAGE_VARIANT_FORMATS = {"webp": "WEBP", "jpeg": "JPEG"}
+DERIVATIVES_FOLDER = "derivatives"
 
-# user subfolder
-def get_or_create_entity_image_subfolder(entity: str, repr_id: str, logger: Logger):
-    entity_subfolder = image_folder / entity / repr_id
+# content addressed store, blobs/<aa>/<bb>/<sha256>.<ext> in the configured storage backend
+# the two level fan-out keeps directories small no matter how many images a user uploads
+BLOBS_FOLDER = "blobs"
+# appeal attachment blobs, blobs/appeals/<aa>/<bb>/<sha256>.<ext>, kept apart so that
+# they are served with the private cache policy
+APPEAL_BLOBS_FOLDER = storage_utils.PRIVATE_FOLDER
+# uploads waiting for background validation, not served by the media app
+STAGING_FOLDER = "staging"
+BLOB_NAME_PATTERN = re.compile(r"^[0-9a-f]{64}\.[a-z]+$")
+IMAGE_FORMAT_EXTENSIONS = {"JPEG": "jpg", "PNG": "png", "GIF": "gif", "WEBP": "webp"}
 
-    try:
-        entity_subfolder.mkdir(parents=True, exist_ok=True)
-    except FileNotFoundError as exc:
-        logger.error(exc, exc_info=True)
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="A required file or directory was not found on the server",
-        ) from exc
-    except OSError as exc:
-        logger.error(exc, exc_info=True)
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Error processing create folder request",
-        ) from exc
+derivative_executor: ProcessPoolExecutor | None = None
+derivative_executor_lock = Lock()
 
-    return entity_subfolder
 
-
-# profile subfolder
-def get_or_create_entity_profile_image_subfolder(
-    entity_subfolder: Path, logger: Logger
-):
-    profile_subfolder = entity_subfolder / "profile"
-
-    try:
-        profile_subfolder.mkdir(parents=True, exist_ok=True)
-    except FileNotFoundError as exc:
-        logger.error(exc, exc_info=True)
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="A required file or directory was not found on the server",
-        ) from exc
-    except OSError as exc:
-        logger.error(exc, exc_info=True)
+def remove_image(path: Path):
+    Path.unlink(path, missing_ok=True)
+    remove_image_derivatives(image_path=path)
+
+
+# the same content may be stored as an image and as an appeal attachment, both go
+def remove_image_blob(image_name: str):
+    blob_key = get_blob_key(image_name)
+    storage_utils.get_storage().delete_many(
+        [
+            blob_key,
+            *get_derivative_keys(blob_key),
+            str(get_manifest_path(PurePosixPath(blob_key))),
+            get_blob_key(image_name, is_appeal_attachment=True),
+        ]
+    )
+
+
+# accepted image formats by magic number, checked before pillow parses anything
+IMAGE_SIGNATURES = {
+    b"\xff\xd8\xff": "JPEG",
+    b"\x89PNG\r\n\x1a\n": "PNG",
+    b"GIF87a": "GIF",
+    b"GIF89a": "GIF",
+}
+ACCEPTED_IMAGE_FORMATS = ("JPEG", "PNG", "GIF", "WEBP")
+IMAGE_HEADER_SIZE = 16
+UPLOAD_CHUNK_SIZE = 64 * 1024
+# room for multipart boundaries and other form fields on top of the image
+UPLOAD_FORM_OVERHEAD_SIZE = 64 * 1024
+IMAGE_TOO_LARGE_DETAIL = (
+    f"Image too large, you can upload upto {MAX_SIZE / (1024 * 1024):g} MiB"
+)
+
+
+# rejects multipart requests whose body is larger than the image limit allows
+# before the form is parsed and spooled, using content-length or counting the received chunks
+class UploadSizeLimitMiddleware:
+    def __init__(self, app: ASGIApp, max_body_size: int):
+        self.app = app
+        self.max_body_size = max_body_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        if not headers.get("content-type", "").startswith("multipart/form-data"):
+            await self.app(scope, receive, send)
+            return
+
+        content_length = headers.get("content-length")
+        if content_length and content_length.isdigit():
+            if int(content_length) > self.max_body_size:
+                response = JSONResponse(
+                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                    content={"detail": IMAGE_TOO_LARGE_DETAIL},
+                )
+                await response(scope, receive, send)
+                return
+
+        received_size = 0
+
+        async def limited_receive():
+            nonlocal received_size
+            message = await receive()
+            if message["type"] == "http.request":
+                received_size += len(message.get("body", b""))
+                if received_size > self.max_body_size:
+                    raise HTTPException(
+                        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                        detail=IMAGE_TOO_LARGE_DETAIL,
+                    )
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+def sniff_image_format(header: bytes):
+    for signature, image_format in IMAGE_SIGNATURES.items():
+        if header.startswith(signature):
+            return image_format
+    # RIFF container with WEBP form type
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        return "WEBP"
+    return None
+
+
+# images uploaded before the blob store are named <username>_<timestamp>_<filename>
+# and live in per user/employee folders
+def is_blob_name(image_name: str):
+    return bool(BLOB_NAME_PATTERN.match(image_name))
+
+
+def get_blob_key(image_name: str, is_appeal_attachment: bool = False):
+    folders = (BLOBS_FOLDER,)
+    if is_appeal_attachment:
+        folders += (APPEAL_BLOBS_FOLDER,)
+    return str(PurePosixPath(*folders, image_name[:2], image_name[2:4], image_name))
+
+
+def get_appeal_attachment_url(image_name: str | None):
+    if not image_name or not is_blob_name(image_name):
+        return None
+    return storage_utils.get_storage().get_url(
+        get_blob_key(image_name, is_appeal_attachment=True)
+    )
+
+
+INVALID_IMAGE_DETAIL = "Invalid image format"
+
+
+# size cut-off before reading, format sniffed from the header, chunks written to
+# the temp file while counting size and hashing, no pillow work here
+def spool_image_upload(image: UploadFile, temp_file):
+    image_too_large = HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=IMAGE_TOO_LARGE_DETAIL,
+    )
+
+    # size is known from the multipart parser, no need to read the file
+    if image.size is not None and image.size > MAX_SIZE:
+        raise image_too_large
+
+    image.file.seek(0)
+    header = image.file.read(IMAGE_HEADER_SIZE)
+    image_format = sniff_image_format(header)
+    if not image_format:
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Error processing create folder request",
-        ) from exc
-
-    return profile_subfolder
+            status_code=status.HTTP_400_BAD_REQUEST, detail=INVALID_IMAGE_DETAIL
+        )
+
+    image_hash = hashlib.sha256(header)
+    image_size = len(header)
+    temp_file.write(header)
+    while chunk := image.file.read(UPLOAD_CHUNK_SIZE):
+        image_size += len(chunk)
+        if image_size > MAX_SIZE:
+            raise image_too_large
+        image_hash.update(chunk)
+        temp_file.write(chunk)
 
+    return image_format, image_hash, image_size
 
-# appeals subfolder
-def get_or_create_user_appeals_attachment_subfolder(
-    user_subfolder: Path, logger: Logger
-):
-    appeals_subfolder = user_subfolder / "appeals"
 
+# blob row is committed in its own session before the storage write, so a blob written
+# for a request that fails still has a row and gc finds it
+def reserve_image_blob(image_name: str, size: int):
+    db = SessionLocal()
     try:
-        appeals_subfolder.mkdir(parents=True, exist_ok=True)
-    except FileNotFoundError as exc:
-        logger.error(exc, exc_info=True)
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="A required file or directory was not found on the server",
-        ) from exc
-    except OSError as exc:
-        logger.error(exc, exc_info=True)
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Error processing create folder request",
-        ) from exc
-
-    return appeals_subfolder
-
-
-# posts subfolder
-def get_or_create_user_posts_image_subfolder(user_subfolder: Path, logger: Logger):
-    posts_subfolder = user_subfolder / "posts"
-
+        image_service.reserve_image_blob(
+            image_name=image_name, size=size, db_session=db
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+# streaming ingest of an uploaded image in one pass
+# spooled to a temp file, full pillow verification on the temp file and then
+# stored under its content address, an already stored image is not written again
+def handle_image_operations(image: UploadFile, logger: Logger):
+    invalid_image = HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST, detail=INVALID_IMAGE_DETAIL
+    )
+
+    temp_path = None
     try:
-        posts_subfolder.mkdir(parents=True, exist_ok=True)
-    except FileNotFoundError as exc:
-        logger.error(exc, exc_info=True)
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="A required file or directory was not found on the server",
-        ) from exc
-    except OSError as exc:
-        logger.error(exc, exc_info=True)
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Error processing create folder request",
-        ) from exc
-
-    return posts_subfolder
-
-
-def remove_image(path: Path):
-    Path.unlink(path, missing_ok=True)
-
-
-def remove_folder(path: Path):
-    shutil.rmtree(path, ignore_errors=True)
+        with tempfile.NamedTemporaryFile(prefix=".upload_", delete=False) as temp_file:
+            temp_path = Path(temp_file.name)
+            image_format, image_hash, image_size = spool_image_upload(
+                image=image, temp_file=temp_file
+            )
 
+        # verifies the image for any tampering/corruption, only after size and format checks pass
+        try:
+            with Image.open(temp_path) as img:
+                if img.format not in ACCEPTED_IMAGE_FORMATS:
+                    raise invalid_image
+                img.verify()
+        except (UnidentifiedImageError, SyntaxError, OSError) as exc:
+            raise invalid_image from exc
+
+        image_name = (
+            f"{image_hash.hexdigest()}.{IMAGE_FORMAT_EXTENSIONS[image_format]}"
+        )
+        reserve_image_blob(image_name=image_name, size=image_size)
+        storage = storage_utils.get_storage()
+        blob_key = get_blob_key(image_name)
+        if storage.exists(blob_key):
+            logger.info("Image already stored, name: %s", image_name)
+        else:
+            storage.save_file(blob_key, temp_path)
 
-def write_image(image: UploadFile, image_path: Path, logger: Logger):
-    try:
-        with open(image_path, "wb+") as f:
-            shutil.copyfileobj(image.file, f)
-    except FileNotFoundError as exc:
+    except HTTPException as exc:
+        raise exc
+    except OSError as exc:
         logger.error(exc, exc_info=True)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="File path not found",
+            detail="Error writing image",
         ) from exc
-    except OSError as exc:
-        if image_path.exists():
-            remove_image(path=image_path)
+    except Exception as exc:
         logger.error(exc, exc_info=True)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Error writing image",
+            detail="Error processing image",
         ) from exc
+    finally:
+        if temp_path:
+            Path.unlink(temp_path, missing_ok=True)
 
-    return image_path
+    return image_name, image_size
 
 
-def validate_image_generate_name(
-    username: str,
-    image: UploadFile,
-    logger: Logger,
-):
+# staged upload for background ingest (appeal attachments), only the cheap size and
+# format checks run on the request, returns the staging key
+# the caller removes the staged file if its transaction fails
+def stage_image_upload(image: UploadFile, logger: Logger):
+    temp_path = None
     try:
-        # we try to open the image, raises UnidentifiedImageError when image doesn't open
-        with Image.open(image.file) as img:
-            # verifies the image for any tampering/corruption, raises exception if verification fails
-            img.verify()
-
-        # move file pointer to the beginning of the file
-        image.file.seek(0)
-
-        # Move to the end of the file, get image size, no need to read the file
-        image.file.seek(0, 2)
-        image_size = image.file.tell()
-
-        # move file pointer to the beginning of the file
-        image.file.seek(0)
-
-        # if len(img_read) > MAX_SIZE: if image is read, we need to get the size using len()
-        if image_size > MAX_SIZE:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Image too large, you can upload upto 5 MiB",
+        with tempfile.NamedTemporaryFile(prefix=".upload_", delete=False) as temp_file:
+            temp_path = Path(temp_file.name)
+            image_format, _, _ = spool_image_upload(image=image, temp_file=temp_file)
+
+        staging_key = str(
+            PurePosixPath(
+                STAGING_FOLDER,
+                f"{uuid.uuid4().hex}.{IMAGE_FORMAT_EXTENSIONS[image_format]}",
             )
+        )
+        storage_utils.get_storage().save_file(staging_key, temp_path)
 
-        # image name
-        upload_datetime = datetime.now().strftime("%Y%m%d%H%M%S")
-        image_name = f"{username}_{upload_datetime}_{image.filename}"
-
-    except UnidentifiedImageError as exc:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid image format"
-        ) from exc
     except HTTPException as exc:
         raise exc
-    except Exception as exc:
+    except OSError as exc:
         logger.error(exc, exc_info=True)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Error processing image",
+            detail="Error writing image",
         ) from exc
+    finally:
+        if temp_path:
+            Path.unlink(temp_path, missing_ok=True)
 
-    return image_name
+    return staging_key
 
 
-def handle_image_operations(
-    username: str,
-    target_folder: Path,
-    image: UploadFile,
-    logger: Logger,
-):
-    try:
-        # we try to open the image, raises UnidentifiedImageError when image doesn't open
-        with Image.open(image.file) as img:
-            # verifies the image for any tampering/corruption, raises exception if verification fails
-            img.verify()
+def remove_staged_image(staging_key: str):
+    storage_utils.get_storage().delete_many([staging_key])
 
-        # move file pointer to the beginning of the file
-        image.file.seek(0)
 
-        # Move to the end of the file, get image size, no need to read the file
-        image.file.seek(0, 2)
-        image_size = image.file.tell()
+# validate and normalize a staged upload and store it under its content address
+# normalizing applies the camera orientation and drops metadata (exif, gps), animated
+# images are kept as uploaded, raises ValueError for an invalid image
+# the staged file is left in place, it is removed once the result is committed
+def ingest_staged_image(staging_key: str):
+    storage = storage_utils.get_storage()
+    data = storage.read_bytes(staging_key)
+    if len(data) > MAX_SIZE or not sniff_image_format(data[:IMAGE_HEADER_SIZE]):
+        raise ValueError(INVALID_IMAGE_DETAIL)
 
-        # move file pointer to the beginning of the file
-        image.file.seek(0)
-        print(image_size)
+    try:
+        with Image.open(BytesIO(data)) as img:
+            if img.format not in ACCEPTED_IMAGE_FORMATS:
+                raise ValueError(INVALID_IMAGE_DETAIL)
+            img.verify()
 
-        # if len(img_read) > MAX_SIZE: if image is read, we need to get the size using len()
-        if image_size > MAX_SIZE:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Image too large, you can upload upto 5 MiB",
+        # verify leaves the image unusable, open again to normalize
+        with Image.open(BytesIO(data)) as img:
+            image_format = img.format
+            if getattr(img, "n_frames", 1) == 1:
+                normalized = ImageOps.exif_transpose(img)
+                if image_format == "JPEG" and normalized.mode not in ("RGB", "L"):
+                    normalized = normalized.convert("RGB")
+                buffer = BytesIO()
+                normalized.save(buffer, format=image_format, quality=90)
+                data = buffer.getvalue()
+    except (UnidentifiedImageError, SyntaxError, OSError) as exc:
+        raise ValueError(INVALID_IMAGE_DETAIL) from exc
+
+    image_name = (
+        f"{hashlib.sha256(data).hexdigest()}.{IMAGE_FORMAT_EXTENSIONS[image_format]}"
+    )
+    reserve_image_blob(image_name=image_name, size=len(data))
+    blob_key = get_blob_key(image_name, is_appeal_attachment=True)
+    if not storage.exists(blob_key):
+        storage.save_bytes(blob_key, data)
+
+    return image_name, len(data)
+
+
+# works with local paths and storage keys (PurePosixPath)
+def get_derivative_path(image_path: PurePath, variant: str, ext: str):
+    return image_path.parent / DERIVATIVES_FOLDER / f"{image_path.stem}_{variant}.{ext}"
+
+
+def get_manifest_path(image_path: PurePath):
+    return image_path.parent / DERIVATIVES_FOLDER / f"{image_path.stem}.json"
+
+
+def get_derivative_key(blob_key: str, variant: str, ext: str):
+    return str(get_derivative_path(PurePosixPath(blob_key), variant, ext))
+
+
+def get_derivative_keys(blob_key: str):
+    return [
+        get_derivative_key(blob_key, variant, ext)
+        for variant in IMAGE_VARIANTS
+        for ext in IMAGE_VARIANT_FORMATS
+    ]
+
+
+def remove_image_derivatives(image_path: Path):
+    for variant in IMAGE_VARIANTS:
+        for ext in IMAGE_VARIANT_FORMATS:
+            Path.unlink(get_derivative_path(image_path, variant, ext), missing_ok=True)
+    Path.unlink(get_manifest_path(image_path), missing_ok=True)
+
+
+# generate sized webp/jpeg variants of a blob and a manifest describing them
+# runs in a worker process, so it takes plain args, uses its own storage backend and raises
+# instead of logging
+def generate_image_derivatives(image_name: str):
+    storage = storage_utils.get_storage()
+    source_key = PurePosixPath(get_blob_key(image_name))
+    # same content uploaded again, variants are already there
+    manifest_key = str(get_manifest_path(source_key))
+    if storage.exists(manifest_key):
+        return manifest_key
+
+    formats = {
+        ext: format_
+        for ext, format_ in IMAGE_VARIANT_FORMATS.items()
+        if format_ != "WEBP" or features.check("webp")
+    }
+    manifest = {"original": image_name, "variants": {}}
+
+    with Image.open(BytesIO(storage.read_bytes(str(source_key)))) as img:
+        # apply camera orientation, derivatives don't keep exif
+        img = ImageOps.exif_transpose(img)
+        has_alpha = img.mode in ("RGBA", "LA", "PA") or "transparency" in img.info
+        img = img.convert("RGBA" if has_alpha else "RGB")
+
+        for variant, (size, crop) in IMAGE_VARIANTS.items():
+            if crop:
+                resized = ImageOps.fit(img, (size, size), Image.Resampling.LANCZOS)
+            else:
+                resized = img.copy()
+                resized.thumbnail((size, size), Image.Resampling.LANCZOS)
+
+            manifest["variants"][variant] = {}
+            for ext, format_ in formats.items():
+                variant_key = get_derivative_path(source_key, variant, ext)
+                # jpeg has no alpha channel
+                variant_image = (
+                    resized.convert("RGB")
+                    if format_ == "JPEG" and resized.mode != "RGB"
+                    else resized
+                )
+                buffer = BytesIO()
+                variant_image.save(buffer, format=format_, quality=80)
+                storage.save_bytes(str(variant_key), buffer.getvalue())
+                manifest["variants"][variant][ext] = {
+                    "name": variant_key.name,
+                    "width": variant_image.width,
+                    "height": variant_image.height,
+                    "size": buffer.tell(),
+                }
+
+    # manifest is written last, its presence means all variants are stored
+    storage.save_bytes(manifest_key, json.dumps(manifest).encode("utf-8"))
+
+    return manifest_key
+
+
+def log_image_derivatives_result(future: Future, image_name: str, logger: Logger):
+    exc = future.exception()
+    if exc:
+        logger.error(
+            "Error generating image derivatives, name: %s", image_name, exc_info=exc
+        )
+    else:
+        logger.info("Image derivatives generated, manifest: %s", future.result())
+
+
+# generate derivatives off the request path in a process pool, image resizing is cpu bound
+def schedule_image_derivatives(image_name: str, logger: Logger):
+    global derivative_executor
+
+    # in process storage (tests) is not visible to worker processes
+    if not storage_utils.get_storage().shared_across_processes:
+        future = Future()
+        try:
+            future.set_result(generate_image_derivatives(image_name))
+        except Exception as exc:
+            future.set_exception(exc)
+        log_image_derivatives_result(future, image_name=image_name, logger=logger)
+        return
+
+    with derivative_executor_lock:
+        if derivative_executor is None:
+            derivative_executor = ProcessPoolExecutor(
+                max_workers=settings.image_derivative_workers
             )
 
-        # image name and path
-        upload_datetime = datetime.now().strftime("%Y%m%d%H%M%S")
-        image_name = f"{username}_{upload_datetime}_{image.filename}"
-
-        image_path = target_folder / image_name
-
-        with open(image_path, "wb+") as f:
-            shutil.copyfileobj(image.file, f)
-
-    except UnidentifiedImageError as exc:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid image format"
-        ) from exc
-    except HTTPException as exc:
-        raise exc
-    except IOError as exc:
-        remove_image(path=image_path)
-        logger.error(exc, exc_info=True)
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Error writing image",
-        ) from exc
-    except Exception as exc:
-        logger.error(exc, exc_info=True)
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Error processing image",
-        ) from exc
-
-    return image_name, image_path
+    future = derivative_executor.submit(generate_image_derivatives, image_name)
+    future.add_done_callback(
+        partial(log_image_derivatives_result, image_name=image_name, logger=logger)
+    )
+
+
+def shutdown_derivative_executor():
+    if derivative_executor is not None:
+        derivative_executor.shutdown(wait=False, cancel_futures=True)
+
+
+# urls of the original image and its derivatives
+# derivatives are generated in the background, clients should fall back to original if a variant is not there yet
+def get_image_urls(entity: str, repr_id: str, subfolder: str, image_name: str | None):
+    if not image_name:
+        return None
+
+    if is_blob_name(image_name):
+        storage = storage_utils.get_storage()
+        blob_key = get_blob_key(image_name)
+        return {
+            "original": storage.get_url(blob_key),
+            **{
+                ext: {
+                    variant: storage.get_url(get_derivative_key(blob_key, variant, ext))
+                    for variant in IMAGE_VARIANTS
+                }
+                for ext in IMAGE_VARIANT_FORMATS
+            },
+        }
+
+    # images stored before the blob store, served from local disk
+    base_url = f"/images/{entity}/{repr_id}/{subfolder}"
+    image_stem = Path(image_name).stem
+
+    return {
+        "original": f"{base_url}/{image_name}",
+        **{
+            ext: {
+                variant: f"{base_url}/{DERIVATIVES_FOLDER}/{image_stem}_{variant}.{ext}"
+                for variant in IMAGE_VARIANTS
+            }
+            for ext in IMAGE_VARIANT_FORMATS
+        },
+    }
@@ -1,3 +1,4 @@
+import time
 from datetime import timedelta
 from logging import Logger
 
@@ -16,40 +17,39 @@ from app.models import post as post_model
 from app.services import admin as admin_service
 from app.services import auth as auth_service
 from app.services import comment as comment_service
+from app.services import image as image_service
 from app.services import post as post_service
 from app.services import user as user_service
+from app.utils import batch as batch_utils
+from app.utils import image as image_utils
 from app.utils import log as log_utils
+from app.utils import metrics as metrics_utils
 from app.utils import operation as operation_utils
 
 
+@metrics_utils.track_job
 def delete_user_after_deactivation_period_expiration():
     db: Session = next(get_db())
     logger: Logger = log_utils.get_logger()
 
-    # get all delete schedule duration expiry entries
-    scheduled_delete_entries = (
-        user_service.check_deactivation_expiration_for_scheduled_delete(db_session=db)
-    )
+    def delete_users(users_to_be_deleted: list, db_session: Session):
+        for user in users_to_be_deleted:
+            user.status = "DEL"
+            user.is_deleted = True
+        return len(users_to_be_deleted)
 
     try:
-        if scheduled_delete_entries:
-            # fetch user ids
-            scheduled_delete_user_ids = [
-                user.user_id for user in scheduled_delete_entries
-            ]
-
-            # get the users
-            users_to_be_deleted = user_service.get_all_users_by_id(
-                user_id_list=scheduled_delete_user_ids,
-                status_in_list=["PDH", "PDB", "PDI"],
-                db_session=db,
-            )
-            if users_to_be_deleted:
-                for user in users_to_be_deleted:
-                    user.status = "DEL"
-                    user.is_deleted = True
-
-                db.commit()
+        # users whose delete schedule duration expired, in chunks
+        batch_utils.run_chunked_job(
+            job_name="delete_user_after_deactivation_period_expiration",
+            fetch_chunk=lambda last_id, limit, db_session: (
+                user_service.check_deactivation_expiration_for_scheduled_delete(
+                    last_user_id=last_id, limit=limit, db_session=db_session
+                )
+            ),
+            process_chunk=delete_users,
+            db_session=db,
+        )
     except SQLAlchemyError as exc:
         db.rollback()
         logger.error(exc, exc_info=True)
@@ -60,6 +60,7 @@ def delete_user_after_deactivation_period_expiration():
     print("Delete Users. Job Done")
 
 
+@metrics_utils.track_job
 def remove_restriction_on_user_after_duration_expiration():
     db: Session = next(get_db())
     logger: Logger = log_utils.get_logger()
@@ -202,6 +203,10 @@ def remove_restriction_on_user_after_duration_expiration():
                     )
 
             db.commit()
+            metrics_utils.record_job_rows(
+                "remove_restriction_on_user_after_duration_expiration",
+                len(remove_restrict_users),
+            )
 
             if user and consecutive_violation and send_mail:
                 url = "http://127.0.0.1:8000/api/v0/users/send-ban-mail"
@@ -244,6 +249,7 @@ def remove_restriction_on_user_after_duration_expiration():
     print("Restrict Users. Job Done")
 
 
+@metrics_utils.track_job
 def remove_ban_on_user_after_duration_expiration():
     db: Session = next(get_db())
     logger: Logger = log_utils.get_logger()
@@ -388,6 +394,10 @@ def remove_ban_on_user_after_duration_expiration():
                     )
 
             db.commit()
+            metrics_utils.record_job_rows(
+                "remove_ban_on_user_after_duration_expiration",
+                len(remove_banned_users),
+            )
 
             if user and consecutive_violation and send_mail:
                 url = "http://127.0.0.1:8000/api/v0/users/send-ban-mail"
@@ -429,85 +439,79 @@ def remove_ban_on_user_after_duration_expiration():
     print("Ban Users. Job Done")
 
 
+@metrics_utils.track_job
 def user_inactivity_delete():
     db: Session = next(get_db())
     logger: Logger = log_utils.get_logger()
 
-    send_mail = False
-    inactive_user_emails = list()
-
-    # get all users whose user auth track entries last entry has passed 6/12 months, recent ones
-    inactive_auth_entries = auth_service.user_auth_track_user_inactivity_delete(
-        db_session=db
-    )
-
-    # get user ids
-    inactive_user_ids = [user.id for user in inactive_auth_entries]
+    def schedule_delete_inactive_users(inactive_users: list, db_session: Session):
+        inactive_user_ids = [user.id for user in inactive_users]
 
-    # check if the users have active restrict/ban, if yes then get the query
-    users_active_restrict_ban_query = (
+        # revoke the restrict/ban if there's one, by changing is_active to False, since the user is to be deleted permanently, restrict/ban is meaningless after this
         admin_service.get_users_active_restrict_ban_entry_query(
             user_id_list=inactive_user_ids,
             status_in_list=["RSP", "RSF", "TBN"],
-            db_session=db,
+            db_session=db_session,
+        ).update(
+            {"is_active": False},
+            synchronize_session=False,
         )
-    )
 
-    try:
-        if inactive_auth_entries:
-            # revoke the restrict/ban if there's one, by changing is_active to False, since the user is to be deleted permanently, restrict/ban is meaningless after this
-            users_active_restrict_ban_query.update(
-                {"is_active": False},
-                synchronize_session=False,
+        # get all open/under review reports and close them
+        open_under_review_reports = (
+            admin_service.get_all_reports_reporter_user_id_status(
+                reporter_user_id_list=inactive_user_ids,
+                status_in_list=["OPN", "URV"],
+                db_session=db_session,
             )
+        )
+        for report in open_under_review_reports:
+            report.status = "CSD"
+            report.moderator_note = "UDI"  # User deleted
+
+        # change user status to PDI
+        for user in inactive_users:
+            user.status = "PDI"
+
+        return len(inactive_users)
+
+    # mail is sent per committed chunk
+    def send_delete_mail(inactive_users: list):
+        url = "http://127.0.0.1:8000/api/v0/users/send-delete-mail"
+        json_data = {
+            "email": [user.email for user in inactive_users],
+            "subject": "VPKonnect - Account Deletion Due to User Inactivity",
+            "template": "inactivity_delete_email.html",
+        }
+
+        try:
+            # Make the POST request with JSON body parameters and a timeout
+            response = requests.post(url, json=json_data, timeout=3)
+            response.raise_for_status()
+            logger.info("Request sent to %s successfully", url)
+        except requests.Timeout as e:
+            logger.error(e, exc_info=True)
+            raise e
+        except requests.HTTPError as err:
+            logger.error(err, exc_info=True)
+            raise err
+        except requests.RequestException as exc:
+            logger.error(exc, exc_info=True)
+            raise exc
 
-            # get user emails
-            inactive_user_emails = [user.email for user in inactive_auth_entries]
-
-            # get all open/under review reports and close them
-            open_under_review_reports = (
-                admin_service.get_all_reports_reporter_user_id_status(
-                    reporter_user_id_list=inactive_user_ids,
-                    status_in_list=["OPN", "URV"],
-                    db_session=db,
+    try:
+        # users whose auth track last entry has passed 6/12 months, in chunks
+        batch_utils.run_chunked_job(
+            job_name="user_inactivity_delete",
+            fetch_chunk=lambda last_id, limit, db_session: (
+                auth_service.user_auth_track_user_inactivity_delete(
+                    last_user_id=last_id, limit=limit, db_session=db_session
                 )
-            )
-            for report in open_under_review_reports:
-                report.status = "CSD"
-                report.moderator_note = "UDI"  # User deleted
-
-            # change user status to PDI
-            for user in inactive_auth_entries:
-                user.status = "PDI"
-
-            send_mail = True
-
-        db.commit()
-
-        if inactive_user_emails and send_mail:
-            url = "http://127.0.0.1:8000/api/v0/users/send-delete-mail"
-            json_data = {
-                "email": inactive_user_emails,
-                "subject": "VPKonnect - Account Deletion Due to User Inactivity",
-                "template": "inactivity_delete_email.html",
-            }
-
-            response = None
-            try:
-                # Make the POST request with JSON body parameters and a timeout
-                response = requests.post(url, json=json_data, timeout=3)
-                response.raise_for_status()
-                logger.info("Request sent to %s successfully", url)
-            except requests.Timeout as e:
-                logger.error(e, exc_info=True)
-                raise e
-            except requests.HTTPError as err:
-                logger.error(err, exc_info=True)
-                raise err
-            except requests.RequestException as exc:
-                logger.error(exc, exc_info=True)
-                raise exc
-
+            ),
+            process_chunk=schedule_delete_inactive_users,
+            db_session=db,
+            after_commit=send_delete_mail,
+        )
     except SQLAlchemyError as exc:
         db.rollback()
         logger.error(exc, exc_info=True)
@@ -523,31 +527,28 @@ def user_inactivity_delete():
     print("Inactive Delete Users. Job Done")
 
 
+@metrics_utils.track_job
 def user_inactivity_inactive():
     db: Session = next(get_db())
     logger: Logger = log_utils.get_logger()
 
-    # get all user auth track entries whose last entry has passed 3 months, recent ones
-    inactive_auth_entries = auth_service.user_auth_track_user_inactivity_inactive(
-        db_session=db
-    )
-    try:
-        if inactive_auth_entries:
-            # fetch user ids
-            inactive_user_ids = [user.user_id for user in inactive_auth_entries]
-
-            # get the users
-            users_to_be_inactivated = user_service.get_all_users_by_id(
-                user_id_list=inactive_user_ids,
-                status_in_list=["ACT", "RSP", "RSF", "TBN"],
-                db_session=db,
-            )
-            if users_to_be_inactivated:
-                for user in users_to_be_inactivated:
-                    user.status = "INA"
-
-                db.commit()
+    def inactivate_users(users_to_be_inactivated: list, db_session: Session):
+        for user in users_to_be_inactivated:
+            user.status = "INA"
+        return len(users_to_be_inactivated)
 
+    try:
+        # get users whose user auth track last entry has passed 3 months, in chunks
+        batch_utils.run_chunked_job(
+            job_name="user_inactivity_inactive",
+            fetch_chunk=lambda last_id, limit, db_session: (
+                auth_service.user_auth_track_user_inactivity_inactive(
+                    last_user_id=last_id, limit=limit, db_session=db_session
+                )
+            ),
+            process_chunk=inactivate_users,
+            db_session=db,
+        )
     except SQLAlchemyError as exc:
         db.rollback()
         logger.error(exc, exc_info=True)
@@ -559,6 +560,7 @@ def user_inactivity_inactive():
 
 
 # PBN 21 day appeal limit check
+@metrics_utils.track_job
 def delete_user_after_permanent_ban_appeal_limit_expiry():
     db: Session = next(get_db())
     logger: Logger = log_utils.get_logger()
@@ -632,6 +634,10 @@ def delete_user_after_permanent_ban_appeal_limit_expiry():
             send_mail = True
 
         db.commit()
+        metrics_utils.record_job_rows(
+            "delete_user_after_permanent_ban_appeal_limit_expiry",
+            len(pbn_users_with_no_pending_appeal),
+        )
 
         if pbn_no_appeal_user_emails and send_mail:
             url = "http://127.0.0.1:8000/api/v0/users/send-delete-mail"
@@ -675,6 +681,7 @@ def delete_user_after_permanent_ban_appeal_limit_expiry():
 
 
 # post/comment 28 day appeal limit check
+@metrics_utils.track_job
 def delete_content_after_ban_appeal_limit_expiry():
     db: Session = next(get_db())
     logger: Logger = log_utils.get_logger()
@@ -769,6 +776,10 @@ def delete_content_after_ban_appeal_limit_expiry():
             )
 
         db.commit()
+        metrics_utils.record_job_rows(
+            "delete_content_after_ban_appeal_limit_expiry",
+            len(posts_with_no_pending_appeal) + len(comments_with_no_pending_appeal),
+        )
     except SQLAlchemyError as exc:
         db.rollback()
         logger.error(exc, exc_info=True)
@@ -784,6 +795,7 @@ def delete_content_after_ban_appeal_limit_expiry():
     )
 
 
+@metrics_utils.track_job
 def close_appeal_after_duration_limit_expiration():
     # this is for PBN and post/comment ban appeals only
     # for RSP, RSF and TBN it is handled during removing restrict/ban job
@@ -937,6 +949,11 @@ def close_appeal_after_duration_limit_expiration():
             )
 
         db.commit()
+        metrics_utils.record_job_rows(
+            "close_appeal_after_duration_limit_expiration",
+            len(pbn_users_pending_appeal_expired_limit)
+            + len(pending_appeals_process_limit_expiry),
+        )
     except SQLAlchemyError as exc:
         db.rollback()
         logger.error(exc, exc_info=True)
@@ -947,78 +964,176 @@ def close_appeal_after_duration_limit_expiration():
     print("Close Appeal. Job Done")
 
 
+@metrics_utils.track_job
 def reduce_violation_score_quarterly():
-    # get the user ids of latest reports which are resolved, appeals for reports if any are not accepted, and are older than 3 months
+    # users whose resolved reports (not appealed successfully) are older than 3 months
     # meaning there should be no violation of user in last three months for score to reduce by 50%
+    # set based update, each score is reduced once every 91 days
 
     db: Session = next(get_db())
     logger: Logger = log_utils.get_logger()
 
-    # join user_content_report_detail and user_content_restrict_ban_appeal_detail
-    report_appeal_join = (
-        db.query(admin_model.UserContentReportDetail.reported_user_id)
-        .join(
-            admin_model.UserContentRestrictBanAppealDetail,
-            admin_model.UserContentReportDetail.id
-            == admin_model.UserContentRestrictBanAppealDetail.report_id,
-            isouter=True,
+    start = time.perf_counter()
+    try:
+        num_of_reduced_scores = admin_service.reduce_violation_scores(
+            reduce_rate=0.50,
+            period_days=settings.violation_score_reduction_days,
+            db_session=db,
         )
-        .filter(
-            admin_model.UserContentReportDetail.status == "RSD",
-            or_(
-                admin_model.UserContentRestrictBanAppealDetail.status.is_(None),
-                admin_model.UserContentRestrictBanAppealDetail.status.notin_(
-                    ["ACP", "ACR"]
-                ),
-            ),
-            func.now()
-            > (
-                admin_model.UserContentReportDetail.updated_at
-                + timedelta(days=settings.violation_score_reduction_days)
-            ),
-            admin_model.UserContentReportDetail.is_deleted == False,
-            or_(
-                admin_model.UserContentRestrictBanAppealDetail.is_deleted.is_(None),
-                admin_model.UserContentRestrictBanAppealDetail.is_deleted == False,
-            ),
+        db.commit()
+        metrics_utils.record_job_rows(
+            "reduce_violation_score_quarterly", num_of_reduced_scores
         )
-        .all()
-    )
+        logger.info(
+            "Violation scores reduced: %s in %.3fs",
+            num_of_reduced_scores,
+            time.perf_counter() - start,
+        )
+    except SQLAlchemyError as exc:
+        db.rollback()
+        logger.error(exc, exc_info=True)
+    finally:
+        db.close()
 
-    # get the user ids
-    no_violation_three_months_user_ids = [item[0] for item in report_appeal_join]
+    logger.info("Score Reduction. Job Done")
+    print("Score Reduction. Job Done")
 
-    # fetch guideline_violation_score entry and reduce the scores by 50% in all
-    guideline_violation_score_entries_query = (
-        admin_service.get_users_guideline_violation_score_query(
-            user_id_list=no_violation_three_months_user_ids, db_session=db
-        )
-    )
 
-    # we need to check the updated_at as to make sure it is updated every 91 days only, not everytime when job runs
-    guideline_violation_score_entries = guideline_violation_score_entries_query.filter(
-        func.now()
-        > admin_model.GuidelineViolationScore.updated_at
-        + timedelta(days=settings.violation_score_reduction_days)
-    ).all()
+@metrics_utils.track_job
+def remove_unreferenced_image_blobs():
+    db: Session = next(get_db())
+    logger: Logger = log_utils.get_logger()
 
+    deleted_blobs = []
+    reclaimed_size = 0
     try:
-        if guideline_violation_score_entries:
-            reduce_rate = 0.50
-            for entry in guideline_violation_score_entries:
-                entry.post_score = round(entry.post_score * reduce_rate)
-                entry.comment_score = round(entry.comment_score * reduce_rate)
-                entry.message_score = round(entry.message_score * reduce_rate)
-                entry.final_violation_score = round(
-                    entry.final_violation_score * reduce_rate
-                )
+        # recount references from posts, profile pictures and appeal attachments
+        updated_count = image_service.refresh_image_blob_ref_counts(db_session=db)
+
+        deleted_blobs = image_service.delete_unreferenced_image_blobs(
+            grace_hours=settings.image_blob_gc_grace_hours,
+            limit=settings.image_blob_gc_batch_size,
+            db_session=db,
+        )
+
+        # files are removed while the rows are still locked, an upload of the same
+        # content waits for the commit and writes the blob again
+        for blob in deleted_blobs:
+            try:
+                image_utils.remove_image_blob(image_name=blob.name)
+                reclaimed_size += blob.size
+            except OSError as exc:
+                logger.error(exc, exc_info=True)
 
         db.commit()
+        logger.info(
+            "Image blob ref counts updated: %s, blobs deleted: %s",
+            updated_count,
+            len(deleted_blobs),
+        )
     except SQLAlchemyError as exc:
         db.rollback()
         logger.error(exc, exc_info=True)
+        deleted_blobs = []
     finally:
         db.close()
 
-    logger.info("Score Reduction. Job Done")
-    print("Score Reduction. Job Done")
+    if deleted_blobs:
+        metrics_utils.record_job_rows(
+            "remove_unreferenced_image_blobs", len(deleted_blobs)
+        )
+        logger.info("Image blob storage reclaimed: %s bytes", reclaimed_size)
+
+    logger.info("Image Blob GC. Job Done")
+    print("Image Blob GC. Job Done")
+
+
+# close sessions replaced by a later login on the same device, login leaves this out of
+# the request
+@metrics_utils.track_job
+def deactivate_superseded_user_sessions():
+    db: Session = next(get_db())
+    logger: Logger = log_utils.get_logger()
+
+    try:
+        num_of_sessions = user_service.deactivate_superseded_user_sessions(
+            limit=settings.job_batch_size, db_session=db
+        )
+        db.commit()
+        metrics_utils.record_job_rows(
+            "deactivate_superseded_user_sessions", num_of_sessions
+        )
+    except SQLAlchemyError as exc:
+        db.rollback()
+        logger.error(exc, exc_info=True)
+    finally:
+        db.close()
+
+    logger.info("Deactivate Superseded User Sessions. Job Done")
+    print("Deactivate Superseded User Sessions. Job Done")
+
+
+# appeal attachments left pending, the background task did not run or failed midway
+@metrics_utils.track_job
+def process_pending_appeal_attachments():
+    db: Session = next(get_db())
+    logger: Logger = log_utils.get_logger()
+
+    pending_attachments = []
+    try:
+        pending_attachments = admin_service.get_pending_appeal_attachments(
+            older_than_minutes=settings.appeal_attachment_retry_minutes,
+            limit=settings.job_batch_size,
+            db_session=db,
+        )
+    except SQLAlchemyError as exc:
+        logger.error(exc, exc_info=True)
+    finally:
+        db.close()
+
+    # each attachment is committed on its own session
+    for pending_attachment in pending_attachments:
+        operation_utils.process_appeal_attachment(
+            appeal_id=pending_attachment.id,
+            staging_key=pending_attachment.attachment_staging_key,
+        )
+
+    if pending_attachments:
+        metrics_utils.record_job_rows(
+            "process_pending_appeal_attachments", len(pending_attachments)
+        )
+
+    logger.info("Process Pending Appeal Attachments. Job Done")
+    print("Process Pending Appeal Attachments. Job Done")
+
+
+# recompute violation summaries of reported users, fixes any drift from the updates
+# done along with report/appeal actions
+@metrics_utils.track_job
+def rebuild_user_violation_summary():
+    db: Session = next(get_db())
+    logger: Logger = log_utils.get_logger()
+
+    try:
+        batch_utils.run_chunked_job(
+            job_name="rebuild_user_violation_summary",
+            fetch_chunk=lambda last_id, limit, db_session: (
+                admin_service.get_reported_user_ids_chunk(
+                    last_user_id=last_id, limit=limit, db_session=db_session
+                )
+            ),
+            process_chunk=lambda users, db_session: (
+                admin_service.refresh_user_violation_summary(
+                    user_id_list=[user.id for user in users], db_session=db_session
+                )
+            ),
+            db_session=db,
+        )
+    except SQLAlchemyError as exc:
+        db.rollback()
+        logger.error(exc, exc_info=True)
+    finally:
+        db.close()
+
+    logger.info("Rebuild Violation Summary. Job Done")
+    print("Rebuild Violation Summary. Job Done")
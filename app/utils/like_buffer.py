@@ -0,0 +1,196 @@
+from threading import Event, Lock, Thread
+from uuid import UUID
+
+from app.config.app import settings
+from app.db.session import get_db
+from app.services import comment as comment_service
+from app.services import post as post_service
+from app.utils import log as log_utils
+from app.utils import metrics as metrics_utils
+
+# kind -> (upsert service, target id column)
+LIKE_UPSERTS = {
+    "post": (post_service.upsert_post_likes, "post_id"),
+    "comment": (comment_service.upsert_comment_likes, "comment_id"),
+}
+
+likes_buffered_total = metrics_utils.registry.register(
+    metrics_utils.Counter(
+        "likes_buffered_total", "Like/unlike actions accepted by the buffer", ("kind",)
+    )
+)
+likes_coalesced_total = metrics_utils.registry.register(
+    metrics_utils.Counter(
+        "likes_coalesced_total",
+        "Like/unlike actions merged into a pending action before flush",
+        ("kind",),
+    )
+)
+likes_written_total = metrics_utils.registry.register(
+    metrics_utils.Counter(
+        "likes_written_total", "Like rows upserted by buffer flushes", ("kind",)
+    )
+)
+like_flush_errors_total = metrics_utils.registry.register(
+    metrics_utils.Counter("like_flush_errors_total", "Failed like buffer flushes")
+)
+
+
+def get_like_count_contribution(initial_status: str | None, status: str):
+    return int(status == "ACT") - int(initial_status == "ACT")
+
+
+# write-behind buffer for like/unlike actions
+# actions are kept per (kind, user_id, target_id), the last action wins within a flush window,
+# a burst of taps ends up as at most one upsert row and none if it nets out to the initial state
+# routes read pending state and like count deltas so the user sees their own action right away
+class LikeBuffer:
+    def __init__(self, flush_interval: float):
+        self.flush_interval = flush_interval
+        # key -> [initial_status, status], initial status is the db status before buffering
+        self._pending: dict[tuple[str, UUID, UUID], list] = {}
+        # entries taken by a flush in progress, still visible to readers until committed
+        self._flushing: dict[tuple[str, UUID, UUID], list] = {}
+        # (kind, target_id) -> like count change not yet in db
+        self._deltas: dict[tuple[str, UUID], int] = {}
+        self._lock = Lock()
+        self._flush_lock = Lock()
+        self._stop_event = Event()
+        self._thread: Thread | None = None
+
+    def get_pending_status(self, kind: str, user_id: UUID, target_id: UUID):
+        key = (kind, user_id, target_id)
+        with self._lock:
+            entry = self._pending.get(key) or self._flushing.get(key)
+            return entry[1] if entry else None
+
+    def get_pending_delta(self, kind: str, target_id: UUID):
+        with self._lock:
+            return self._deltas.get((kind, target_id), 0)
+
+    # status is ACT for like and RMV for unlike
+    def submit(
+        self,
+        kind: str,
+        user_id: UUID,
+        target_id: UUID,
+        initial_status: str | None,
+        status: str,
+    ):
+        key = (kind, user_id, target_id)
+        with self._lock:
+            entry = self._pending.get(key)
+            if entry:
+                likes_coalesced_total.inc(kind=kind)
+                previous_status = entry[1]
+                entry[1] = status
+            else:
+                previous_status = initial_status
+                self._pending[key] = [initial_status, status]
+
+            delta_key = (kind, target_id)
+            self._deltas[delta_key] = self._deltas.get(
+                delta_key, 0
+            ) + get_like_count_contribution(previous_status, status)
+        likes_buffered_total.inc(kind=kind)
+
+        # buffering disabled, write through
+        if self.flush_interval <= 0:
+            self.flush()
+
+    def _drop_deltas(self, entries: dict):
+        for (kind, _, target_id), (initial_status, status) in entries.items():
+            delta_key = (kind, target_id)
+            delta = self._deltas.get(delta_key, 0) - get_like_count_contribution(
+                initial_status, status
+            )
+            if delta:
+                self._deltas[delta_key] = delta
+            else:
+                self._deltas.pop(delta_key, None)
+
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                self._flushing, self._pending = self._pending, {}
+                entries = self._flushing
+            if not entries:
+                return 0
+
+            logger = log_utils.get_logger()
+            written_count = 0
+            db = None
+            # any failure puts the entries back, not only db errors, so that no like is
+            # dropped by the next flush
+            try:
+                like_rows = {kind: [] for kind in LIKE_UPSERTS}
+                for key, (initial_status, status) in entries.items():
+                    kind, user_id, target_id = key
+                    # like then unlike (or the other way) within the window, nothing to
+                    # write
+                    if not get_like_count_contribution(initial_status, status):
+                        continue
+                    target_column = LIKE_UPSERTS[kind][1]
+                    like_rows[kind].append(
+                        {"user_id": user_id, target_column: target_id, "status": status}
+                    )
+
+                db = next(get_db())
+                for kind, rows in like_rows.items():
+                    if rows:
+                        upsert = LIKE_UPSERTS[kind][0]
+                        upsert(like_rows=rows, db_session=db)
+                        likes_written_total.inc(len(rows), kind=kind)
+                        written_count += len(rows)
+                db.commit()
+            except Exception as exc:
+                if db is not None:
+                    db.rollback()
+                logger.error(exc, exc_info=True)
+                like_flush_errors_total.inc()
+                # put the entries back, newer actions on the same key keep their status
+                with self._lock:
+                    for key, (initial_status, status) in entries.items():
+                        entry = self._pending.get(key)
+                        if entry:
+                            entry[0] = initial_status
+                        else:
+                            self._pending[key] = [initial_status, status]
+                    self._flushing = {}
+                return 0
+            finally:
+                if db is not None:
+                    db.close()
+
+            with self._lock:
+                self._drop_deltas(entries)
+                self._flushing = {}
+
+            return written_count
+
+    # the thread outlives a failed flush, pending entries would grow without limit if
+    # it died
+    def _run(self):
+        while not self._stop_event.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as exc:
+                log_utils.get_logger().error(exc, exc_info=True)
+
+    def start(self):
+        if self.flush_interval <= 0 or self._thread is not None:
+            return
+        self._stop_event.clear()
+        self._thread = Thread(target=self._run, name="like-buffer-flush", daemon=True)
+        self._thread.start()
+
+    # stop the flush thread and write what is left
+    def stop(self):
+        if self._thread is not None:
+            self._stop_event.set()
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+
+like_buffer = LikeBuffer(flush_interval=settings.like_buffer_flush_interval_ms / 1000)
@@ -5,6 +5,8 @@ from http import HTTPStatus
 from fastapi import Request, Response
 from typing_extensions import override
 
+from app.config.app import settings
+
 logger = logging.getLogger("my_app")
 status_reasons = {x.value: x.name for x in list(HTTPStatus)}
 
@@ -14,7 +16,7 @@ def get_logger():
 
 
 def get_extra_info(request: Request, response: Response):
-    return {
+    extra_info = {
         "req": {
             "url": request.url.path,
             "headers": {
@@ -36,6 +38,15 @@ def get_extra_info(request: Request, response: Response):
         },
     }
 
+    # db query stats, set by query tracking middleware
+    db_query_stats = getattr(request.state, "db_query_stats", None)
+    if db_query_stats:
+        extra_info["db"] = db_query_stats.as_log_fields(
+            settings.db_query_repeat_threshold
+        )
+
+    return extra_info
+
 
 def write_log_data(request, response):
     logger.info(
@@ -75,6 +86,7 @@ def get_access_log(record):
             },
             "req": record.extra_info["req"],
             "res": record.extra_info["res"],
+            "db": record.extra_info.get("db"),
         }
     }
 
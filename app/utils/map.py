@@ -76,6 +76,22 @@ severity_groups_scores_dict = {
     "MN": 1,
 }
 
+# work queue order of severity groups, lower is picked first, highest score first
+# CMD has no score (the moderator decides the group), it goes right after the groups
+# scored above MS since the content may still turn out to be severe
+report_severity_groups_order = sorted(
+    severity_groups_scores_dict, key=severity_groups_scores_dict.get, reverse=True
+)
+report_severity_groups_order.insert(report_severity_groups_order.index("MS"), "CMD")
+report_severity_group_rank_dict = {
+    group: rank for rank, group in enumerate(report_severity_groups_order, start=1)
+}
+
+report_reasons_severity_rank_dict = {
+    reason: report_severity_group_rank_dict[group]
+    for reason, group in report_reasons_severity_group_dict.items()
+}
+
 content_weigths_dict = {
     "post": 0.5,
     "comment": 0.35,
@@ -185,6 +201,12 @@ def create_violation_moderator_notes(
             No appeals submitted by {username} upon permanent ban within the specified time. Hence user account is deleted. So this report submmited by user is hence closed.
             """,
         },
+        "DUP": {
+            "message": "Report merged with an open report of the same content and reason",
+            "detail": f"""Case number: {case_number}
+            This report is closed and its reporters are added to the open report of {username}'s {content_type} for the same reason.
+            """,
+        },
     }
 
     return violation_moderator_notes_dict.get(moderator_note)
@@ -348,84 +370,90 @@ def transform_type(value: str):
     )
 
 
-def transform_access_role(value: str):
-    # access_roles dict
-    access_roles = {
-        "management": [
-            "CEO",
-            "CTO",
-            "CMO",
-            "CSO",
-            "CFO",
-            "COO",
-            "DHR",
-            "DOP",
-            "DOM",
-        ],
-        "software_dev": [
-            "SDE1F",
-            "SDE2F",
-            "SDE3F",
-            "SDE4F",
-            "SDE1B",
-            "SDE2B",
-            "SDE3B",
-            "SDE4B",
-            "SDET1",
-            "SDET2",
-            "SDET3",
-            "SDET4",
-            "SDM1F",
-            "SDM2F",
-            "SDM1B",
-            "SDM2B",
-        ],
-        "hr": ["HR1", "HR2", "HR3", "HRM1", "HRM2"],
-        "content_admin": ["CCA"],
-        "content_mgmt": ["CNM", "CMM", "UOA"],
-        "busn_govt_user": ["BUS", "GOV"],
-        "std_ver_user": ["STD", "VER"],
-        "user": ["STD", "VER", "BUS", "GOV"],
-        "employee": [
-            "CEO",
-            "CTO",
-            "CMO",
-            "CSO",
-            "CFO",
-            "COO",
-            "SDE1F",
-            "SDE2F",
-            "SDE3F",
-            "SDE4F",
-            "SDE1B",
-            "SDE2B",
-            "SDE3B",
-            "SDE4B",
-            "SDET1",
-            "SDET2",
-            "SDET3",
-            "SDET4",
-            "SDM1F",
-            "SDM2F",
-            "SDM1B",
-            "SDM2B",
-            "CCA",
-            "CNM",
-            "CMM",
-            "UOA",
-            "HR1",
-            "HR2",
-            "HR3",
-            "HRM1",
-            "HRM2",
-            "DHR",
-            "DOP",
-            "DOM",
-        ],
-    }
+# access roles, role: employee designations/user types
+access_roles_dict = {
+    "management": [
+        "CEO",
+        "CTO",
+        "CMO",
+        "CSO",
+        "CFO",
+        "COO",
+        "DHR",
+        "DOP",
+        "DOM",
+    ],
+    "software_dev": [
+        "SDE1F",
+        "SDE2F",
+        "SDE3F",
+        "SDE4F",
+        "SDE1B",
+        "SDE2B",
+        "SDE3B",
+        "SDE4B",
+        "SDET1",
+        "SDET2",
+        "SDET3",
+        "SDET4",
+        "SDM1F",
+        "SDM2F",
+        "SDM1B",
+        "SDM2B",
+    ],
+    "hr": ["HR1", "HR2", "HR3", "HRM1", "HRM2"],
+    "content_admin": ["CCA"],
+    "content_mgmt": ["CNM", "CMM", "UOA"],
+    "busn_govt_user": ["BUS", "GOV"],
+    "std_ver_user": ["STD", "VER"],
+    "user": ["STD", "VER", "BUS", "GOV"],
+    "employee": [
+        "CEO",
+        "CTO",
+        "CMO",
+        "CSO",
+        "CFO",
+        "COO",
+        "SDE1F",
+        "SDE2F",
+        "SDE3F",
+        "SDE4F",
+        "SDE1B",
+        "SDE2B",
+        "SDE3B",
+        "SDE4B",
+        "SDET1",
+        "SDET2",
+        "SDET3",
+        "SDET4",
+        "SDM1F",
+        "SDM2F",
+        "SDM1B",
+        "SDM2B",
+        "CCA",
+        "CNM",
+        "CMM",
+        "UOA",
+        "HR1",
+        "HR2",
+        "HR3",
+        "HRM1",
+        "HRM2",
+        "DHR",
+        "DOP",
+        "DOM",
+    ],
+}
 
-    if value in access_roles:
-        return access_roles[value]
+# compiled once at import, role: frozenset of token types for single lookup checks
+access_role_types_dict = {
+    role: frozenset(types) for role, types in access_roles_dict.items()
+}
+
+
+def transform_access_role(value: str):
+    if value in access_roles_dict:
+        return access_roles_dict[value]
     raise HTTPException(
         status_code=status.HTTP_403_FORBIDDEN,
         detail="Role configuration is invalid",
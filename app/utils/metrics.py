@@ -0,0 +1,261 @@
+import time
+from bisect import bisect_left
+from functools import wraps
+from threading import Lock
+
+from fastapi import Request
+
+# default latency buckets in seconds, same as prometheus client defaults
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape_label_value(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(label_names: tuple[str, ...], label_values: tuple, **extra):
+    pairs = list(zip(label_names, label_values)) + list(extra.items())
+    if not pairs:
+        return ""
+    return (
+        "{"
+        + ",".join(f'{name}="{_escape_label_value(value)}"' for name, value in pairs)
+        + "}"
+    )
+
+
+# metric types keep plain dicts keyed by label value tuples, guarded by a lock
+# updates are O(1) (histogram is O(log buckets)) so it is cheap enough to leave on
+class Counter:
+    type_ = "counter"
+
+    def __init__(self, name: str, documentation: str, label_names: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self._values: dict[tuple, float] = {}
+        self._lock = Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(labels[name] for name in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def collect(self):
+        with self._lock:
+            values = list(self._values.items())
+        for key, value in values:
+            yield f"{self.name}{_format_labels(self.label_names, key)} {value}"
+
+
+class Gauge(Counter):
+    type_ = "gauge"
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        key = tuple(labels[name] for name in self.label_names)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram:
+    type_ = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        label_names: tuple = (),
+        buckets: tuple = DEFAULT_BUCKETS,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self.buckets = buckets
+        # per label key: [bucket counts..., +Inf count], sum
+        self._values: dict[tuple, list] = {}
+        self._lock = Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(labels[name] for name in self.label_names)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = [[0] * (len(self.buckets) + 1), 0.0]
+                self._values[key] = entry
+            entry[0][index] += 1
+            entry[1] += value
+
+    def collect(self):
+        with self._lock:
+            values = [
+                (key, list(counts), total)
+                for key, (counts, total) in self._values.items()
+            ]
+        for key, counts, total in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                labels = _format_labels(self.label_names, key, le=bound)
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _format_labels(self.label_names, key)
+            yield f"{self.name}_sum{labels} {total}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._collect_hooks = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    # hooks run right before rendering, used for values that are sampled (pool stats) instead of tracked
+    def add_collect_hook(self, hook):
+        self._collect_hooks.append(hook)
+
+    def render(self) -> str:
+        for hook in self._collect_hooks:
+            hook()
+
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type_}")
+            lines.extend(metric.collect())
+
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+# http
+http_request_duration_seconds = registry.register(
+    Histogram(
+        "http_request_duration_seconds",
+        "HTTP request latency by route template and status code",
+        ("method", "route", "status"),
+    )
+)
+http_requests_in_flight = registry.register(
+    Gauge(
+        "http_requests_in_flight",
+        "HTTP requests currently being processed",
+    )
+)
+
+# db pool
+db_pool_size = registry.register(Gauge("db_pool_size", "DB connection pool size"))
+db_pool_checked_out = registry.register(
+    Gauge("db_pool_checked_out", "DB connections currently checked out")
+)
+db_pool_checked_in = registry.register(
+    Gauge("db_pool_checked_in", "DB connections idle in the pool")
+)
+db_pool_overflow = registry.register(
+    Gauge("db_pool_overflow", "DB connections opened beyond the pool size")
+)
+
+# jobs
+job_duration_seconds = registry.register(
+    Histogram(
+        "job_duration_seconds",
+        "Scheduled job run duration",
+        ("job",),
+        buckets=(0.01, 0.05, 0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0),
+    )
+)
+job_runs_total = registry.register(
+    Counter("job_runs_total", "Scheduled job runs by outcome", ("job", "outcome"))
+)
+job_rows_processed_total = registry.register(
+    Counter("job_rows_processed_total", "Rows processed by scheduled jobs", ("job",))
+)
+
+# moderation work queue, per moderator emp id
+moderation_cases_claimed_total = registry.register(
+    Counter(
+        "moderation_cases_claimed_total",
+        "Cases claimed from the work queue",
+        ("case_type", "moderator"),
+    )
+)
+moderation_cases_reclaimed_total = registry.register(
+    Counter(
+        "moderation_cases_reclaimed_total",
+        "Claimed cases whose lease expired, claimed again",
+        ("case_type", "moderator"),
+    )
+)
+moderation_cases_reviewed_total = registry.register(
+    Counter(
+        "moderation_cases_reviewed_total",
+        "Cases marked for review",
+        ("case_type", "moderator"),
+    )
+)
+
+# route template lookup, endpoint function -> path template
+# filled at startup so that path params don't blow up label cardinality
+route_templates: dict = {}
+
+
+def register_routes(routes):
+    for route in routes:
+        endpoint = getattr(route, "endpoint", None)
+        if endpoint is not None:
+            route_templates[endpoint] = route.path
+
+
+def get_route_label(request: Request):
+    endpoint = request.scope.get("endpoint")
+    return route_templates.get(endpoint, "unmatched")
+
+
+def register_db_pool(engine):
+    def collect_pool_stats():
+        pool = engine.pool
+        # not every pool class exposes these (e.g. NullPool), skip silently
+        if not hasattr(pool, "checkedout"):
+            return
+        db_pool_size.set(pool.size())
+        db_pool_checked_out.set(pool.checkedout())
+        db_pool_checked_in.set(pool.checkedin())
+        db_pool_overflow.set(pool.overflow())
+
+    registry.add_collect_hook(collect_pool_stats)
+
+
+def record_job_rows(job: str, count: int):
+    if count:
+        job_rows_processed_total.inc(count, job=job)
+
+
+# decorator for scheduled jobs, records duration and outcome
+# jobs swallow their own db errors, so outcome is "error" only for unhandled exceptions
+def track_job(func):
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        outcome = "success"
+        try:
+            return func(*args, **kwargs)
+        except Exception:
+            outcome = "error"
+            raise
+        finally:
+            job_duration_seconds.observe(
+                time.perf_counter() - start, job=func.__name__
+            )
+            job_runs_total.inc(job=func.__name__, outcome=outcome)
+
+    return wrapper
+
+
+def render_metrics() -> str:
+    return registry.render()
@@ -0,0 +1,297 @@
+import asyncio
+from collections import OrderedDict
+from itertools import count
+from threading import Lock
+from uuid import UUID
+
+import orjson
+from fastapi.responses import StreamingResponse
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+from starlette.types import Receive, Scope, Send
+
+from app.config.app import settings
+from app.services import user as user_service
+from app.utils import log as log_utils
+from app.utils import metrics as metrics_utils
+
+# sent to a client whose queue overflowed, it should refetch feed and follow requests
+RESYNC_EVENT = "resync"
+# sse comment line, keeps proxies from closing an idle stream
+HEARTBEAT = b": keepalive\n\n"
+# client reconnect delay in ms
+RECONNECT_DELAY = 5000
+
+notification_connections = metrics_utils.registry.register(
+    metrics_utils.Gauge("notification_connections", "Open notification streams")
+)
+notifications_published_total = metrics_utils.registry.register(
+    metrics_utils.Counter(
+        "notifications_published_total",
+        "Notifications queued to open streams",
+        ("event",),
+    )
+)
+notifications_dropped_total = metrics_utils.registry.register(
+    metrics_utils.Counter(
+        "notifications_dropped_total",
+        "Notifications dropped because the stream queue was full",
+        ("event",),
+    )
+)
+
+
+def format_event(event: str, data: dict) -> bytes:
+    return b"event: %s\ndata: %s\n\n" % (event.encode("utf-8"), orjson.dumps(data))
+
+
+# one open stream, publishers (request or job threads) queue events and the stream reads
+# the queue is bounded so a slow client never blocks publishers or grows memory,
+# an event with the key of a queued event replaces it (many new posts -> one new_posts),
+# events that don't fit are dropped and the client gets a resync event instead
+class Subscription:
+    def __init__(self, user_id: UUID, max_queue_size: int):
+        self.user_id = user_id
+        self.max_queue_size = max_queue_size
+        self._queue: OrderedDict[str, tuple[str, dict]] = OrderedDict()
+        self._overflowed = False
+        self._closed = False
+        self._lock = Lock()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._wakeup: asyncio.Event | None = None
+
+    @property
+    def closed(self):
+        return self._closed
+
+    # called from the stream once it runs on the event loop
+    def bind(self, loop: asyncio.AbstractEventLoop):
+        with self._lock:
+            self._loop = loop
+            self._wakeup = asyncio.Event()
+            if self._queue or self._overflowed or self._closed:
+                self._wakeup.set()
+
+    def _wake(self):
+        loop, wakeup = self._loop, self._wakeup
+        if loop is not None and wakeup is not None:
+            loop.call_soon_threadsafe(wakeup.set)
+
+    def push(self, key: str, event: str, data: dict):
+        with self._lock:
+            if self._closed:
+                return True
+            if key not in self._queue and len(self._queue) >= self.max_queue_size:
+                self._overflowed = True
+                return False
+            self._queue[key] = (event, data)
+        self._wake()
+        return True
+
+    # queued events are still sent before the stream ends
+    def close(self):
+        with self._lock:
+            self._closed = True
+        self._wake()
+
+    # wait for queued events, empty list on timeout
+    async def get_events(self, timeout: float):
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout)  # type: ignore
+        except asyncio.TimeoutError:
+            return []
+
+        with self._lock:
+            self._wakeup.clear()  # type: ignore
+            events = list(self._queue.values())
+            self._queue.clear()
+            if self._overflowed:
+                events.append((RESYNC_EVENT, {"message": "Some updates were missed"}))
+                self._overflowed = False
+        return events
+
+
+# in process pub/sub for user notifications, streams are capped in total and per user
+# each worker process has its own hub, events reach streams opened on the same worker
+class NotificationHub:
+    def __init__(
+        self, max_connections: int, max_connections_per_user: int, max_queue_size: int
+    ):
+        self.max_connections = max_connections
+        self.max_connections_per_user = max_connections_per_user
+        self.max_queue_size = max_queue_size
+        self._subscriptions: dict[UUID, set[Subscription]] = {}
+        self._num_of_connections = 0
+        self._lock = Lock()
+        # unique keys for events that are never merged
+        self._event_ids = count()
+
+    # None if the connection cap is reached
+    def connect(self, user_id: UUID):
+        with self._lock:
+            user_subscriptions = self._subscriptions.get(user_id, set())
+            if (
+                self._num_of_connections >= self.max_connections
+                or len(user_subscriptions) >= self.max_connections_per_user
+            ):
+                return None
+
+            subscription = Subscription(user_id, self.max_queue_size)
+            user_subscriptions.add(subscription)
+            self._subscriptions[user_id] = user_subscriptions
+            self._num_of_connections += 1
+        notification_connections.inc()
+        return subscription
+
+    def disconnect(self, subscription: Subscription):
+        with self._lock:
+            user_subscriptions = self._subscriptions.get(subscription.user_id)
+            if not user_subscriptions or subscription not in user_subscriptions:
+                return
+            user_subscriptions.discard(subscription)
+            if not user_subscriptions:
+                del self._subscriptions[subscription.user_id]
+            self._num_of_connections -= 1
+        notification_connections.dec()
+
+    def get_connected_user_ids(self):
+        with self._lock:
+            return list(self._subscriptions)
+
+    def _get_subscriptions(self, user_ids):
+        with self._lock:
+            return [
+                subscription
+                for user_id in user_ids
+                for subscription in self._subscriptions.get(user_id, ())
+            ]
+
+    # key merges the event with a queued event of the same key, None to never merge
+    def publish(self, user_ids, event: str, data: dict, key: str | None = None):
+        subscriptions = self._get_subscriptions(user_ids)
+        if not subscriptions:
+            return
+
+        key = key or f"{event}:{next(self._event_ids)}"
+        for subscription in subscriptions:
+            if not subscription.push(key, event, data):
+                notifications_dropped_total.inc(event=event)
+        notifications_published_total.inc(len(subscriptions), event=event)
+
+    # end the streams of a user, e.g. on ban, queued events are sent first
+    def close_user(self, user_id: UUID):
+        for subscription in self._get_subscriptions([user_id]):
+            subscription.close()
+
+    # end all streams, e.g. on shutdown
+    def close_all(self):
+        for subscription in self._get_subscriptions(self.get_connected_user_ids()):
+            subscription.close()
+
+
+notification_hub = NotificationHub(
+    max_connections=settings.notification_max_connections,
+    max_connections_per_user=settings.notification_max_connections_per_user,
+    max_queue_size=settings.notification_queue_size,
+)
+
+
+# sse body of a stream, unregisters the stream when the client goes away
+# sends block while the client is not reading, events collect in the bounded queue
+async def stream_notifications(subscription: Subscription):
+    subscription.bind(asyncio.get_running_loop())
+    try:
+        yield f"retry: {RECONNECT_DELAY}\n\n".encode("utf-8")
+        while not subscription.closed:
+            events = await subscription.get_events(
+                timeout=settings.notification_heartbeat_seconds
+            )
+            if not events:
+                yield HEARTBEAT
+                continue
+            yield b"".join(format_event(event, data) for event, data in events)
+    finally:
+        notification_hub.disconnect(subscription)
+
+
+# sse response of a stream, the stream is unregistered however the response ends
+# the body generator's finally never runs if the client is gone before the first chunk
+class NotificationStreamResponse(StreamingResponse):
+    def __init__(self, subscription: Subscription):
+        super().__init__(
+            stream_notifications(subscription),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+        self.subscription = subscription
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            notification_hub.disconnect(self.subscription)
+
+
+# tell followers with an open stream that there are new posts in their feed
+def notify_new_post(user_id: UUID, db_session: Session):
+    connected_user_ids = notification_hub.get_connected_user_ids()
+    if not connected_user_ids:
+        return
+
+    try:
+        follower_ids = user_service.get_user_follower_ids(
+            user_id=user_id, follower_id_list=connected_user_ids, db_session=db_session
+        )
+    except SQLAlchemyError as exc:
+        log_utils.get_logger().error(exc, exc_info=True)
+        return
+
+    notification_hub.publish(
+        follower_ids,
+        event="new_posts",
+        data={"message": "New posts available"},
+        key="new_posts",
+    )
+
+
+# follow request (PND) or new follower (ACP), sent to the followed user
+def notify_follow(followed_user_id: UUID, follower_username: str, status: str):
+    event = "follow_request" if status == "PND" else "new_follower"
+    notification_hub.publish(
+        [followed_user_id],
+        event=event,
+        data={"username": follower_username},
+        key=f"{event}:{follower_username}",
+    )
+
+
+# sent to the follower when the followed user accepts the request
+def notify_follow_request_accepted(follower_user_id: UUID, followed_username: str):
+    notification_hub.publish(
+        [follower_user_id],
+        event="follow_request_accepted",
+        data={"username": followed_username},
+    )
+
+
+# restrict/ban on the user account or content, banned users are logged out so their
+# streams are ended after the event
+def notify_moderation_action(
+    user_id: UUID,
+    case_number: int,
+    content_type: str,
+    action: str,
+    is_active: bool,
+):
+    notification_hub.publish(
+        [user_id],
+        event="moderation",
+        data={
+            "case_number": case_number,
+            "content_type": content_type,
+            "action": action,
+            "is_active": is_active,
+        },
+    )
+    if is_active and action in ("TBN", "PBN"):
+        notification_hub.close_user(user_id)
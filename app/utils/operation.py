@@ -3,14 +3,19 @@ from uuid import UUID
 
 from fastapi import HTTPException, status
 from sqlalchemy import func
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import Session
 
 from app.config.app import settings
+from app.db.session import get_db
 from app.models import admin as admin_model
 from app.services import admin as admin_service
 from app.services import comment as comment_service
+from app.services import image as image_service
 from app.services import post as post_service
 from app.services import user as user_service
+from app.utils import image as image_utils
+from app.utils import log as log_utils
 
 
 def consecutive_violation_operations(
@@ -196,6 +201,10 @@ def consecutive_violation_operations(
             elif comment.status == "FLB":
                 comment.status = "BAN"
 
+    admin_service.refresh_user_violation_summary(
+        user_id_list=[consecutive_violation_report.reported_user_id], db_session=db
+    )
+
 
 def user_restrict_ban_detail_user_operation(
     user_id: UUID,
@@ -638,6 +647,8 @@ def operations_after_appeal_accept(
                 content_already_unbanned=0,
             )
 
+    admin_service.refresh_user_violation_summary(user_id_list=[user_id], db_session=db)
+
     return consecutive_violation, send_mail
 
 
@@ -822,3 +833,50 @@ def operations_after_appeal_reject(
 
                 # update is_ban_final to True
                 appeal_reject_comment.is_ban_final = True
+
+    admin_service.refresh_user_violation_summary(user_id_list=[user_id], db_session=db)
+
+
+# validate/normalize a staged appeal attachment and record the result on the appeal
+# runs after the response (background task) or from the retry job, uses its own session
+# the staged file is removed once the result is committed, on a storage or db error
+# it is kept and the retry job picks the appeal up again
+def process_appeal_attachment(appeal_id: UUID, staging_key: str):
+    logger = log_utils.get_logger()
+
+    image_name, image_size = None, 0
+    try:
+        image_name, image_size = image_utils.ingest_staged_image(staging_key)
+        attachment_status = "RDY"
+    except (ValueError, FileNotFoundError) as exc:
+        logger.info("Appeal attachment rejected, appeal: %s, %s", appeal_id, exc)
+        attachment_status = "INV"
+    except (OSError, SQLAlchemyError) as exc:
+        logger.error(exc, exc_info=True)
+        return
+
+    db: Session = next(get_db())
+    try:
+        updated = admin_service.set_appeal_attachment_result(
+            appeal_id=appeal_id,
+            staging_key=staging_key,
+            attachment=image_name,
+            attachment_status=attachment_status,
+            db_session=db,
+        )
+        if updated and image_name:
+            image_service.register_image_blob(
+                image_name=image_name, size=image_size, db_session=db
+            )
+        db.commit()
+    except SQLAlchemyError as exc:
+        db.rollback()
+        logger.error(exc, exc_info=True)
+        return
+    finally:
+        db.close()
+
+    try:
+        image_utils.remove_staged_image(staging_key=staging_key)
+    except OSError as exc:
+        logger.error(exc, exc_info=True)
@@ -0,0 +1,248 @@
+from functools import wraps
+from threading import Event, Thread
+
+from apscheduler.events import EVENT_JOB_MAX_INSTANCES, EVENT_JOB_MISSED, JobEvent
+from apscheduler.executors.pool import ThreadPoolExecutor
+from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.triggers.interval import IntervalTrigger
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.config.app import settings
+from app.db.db_sqlalchemy import engine
+from app.utils import job_task as job_task_utils
+from app.utils import log as log_utils
+from app.utils import metrics as metrics_utils
+
+# advisory lock keys (namespace, key), leader lock is (LEADER_LOCK_NAMESPACE, 0),
+# job run locks are (JOB_LOCK_NAMESPACE, hashtext(job name))
+LEADER_LOCK_NAMESPACE = 8201
+JOB_LOCK_NAMESPACE = 8202
+
+# applied to every job unless overridden in SCHEDULED_JOBS
+# max_instances 1: a run is skipped while the previous run of the job is still going
+# coalesce: runs missed meanwhile (busy or down) collapse into a single run
+JOB_DEFAULTS = {
+    "max_instances": 1,
+    "coalesce": True,
+    "misfire_grace_time": settings.scheduler_misfire_grace_seconds,
+}
+
+# job, interval trigger args, job options
+SCHEDULED_JOBS = [
+    (
+        job_task_utils.delete_user_after_deactivation_period_expiration,
+        {"seconds": 10},
+        {},
+    ),
+    (
+        job_task_utils.remove_restriction_on_user_after_duration_expiration,
+        {"seconds": 5},
+        {},
+    ),
+    (job_task_utils.remove_ban_on_user_after_duration_expiration, {"seconds": 5}, {}),
+    (job_task_utils.user_inactivity_inactive, {"seconds": 7}, {}),
+    (job_task_utils.user_inactivity_delete, {"seconds": 7}, {}),
+    (job_task_utils.close_appeal_after_duration_limit_expiration, {"seconds": 3}, {}),
+    (
+        job_task_utils.delete_user_after_permanent_ban_appeal_limit_expiry,
+        {"seconds": 5},
+        {},
+    ),
+    (job_task_utils.delete_content_after_ban_appeal_limit_expiry, {"seconds": 3}, {}),
+    (job_task_utils.reduce_violation_score_quarterly, {"hours": 1}, {}),
+    (
+        job_task_utils.remove_unreferenced_image_blobs,
+        {"hours": 1},
+        {"misfire_grace_time": None},
+    ),
+    (job_task_utils.rebuild_user_violation_summary, {"minutes": 30}, {}),
+    (job_task_utils.process_pending_appeal_attachments, {"minutes": 5}, {}),
+    (job_task_utils.deactivate_superseded_user_sessions, {"minutes": 1}, {}),
+]
+
+job_skipped_runs_total = metrics_utils.registry.register(
+    metrics_utils.Counter(
+        "job_skipped_runs_total",
+        "Scheduled job runs skipped, overlap (previous run still going) or misfire",
+        ("job", "reason"),
+    )
+)
+scheduler_is_leader = metrics_utils.registry.register(
+    metrics_utils.Gauge(
+        "scheduler_leader", "1 if this process is the one running scheduled jobs"
+    )
+)
+
+
+def _try_advisory_lock(connection: Connection, namespace: int, key_sql: str, **params):
+    return connection.execute(
+        text(f"SELECT pg_try_advisory_lock(:namespace, {key_sql})"),
+        {"namespace": namespace, **params},
+    ).scalar()
+
+
+def _advisory_unlock(connection: Connection, namespace: int, key_sql: str, **params):
+    connection.execute(
+        text(f"SELECT pg_advisory_unlock(:namespace, {key_sql})"),
+        {"namespace": namespace, **params},
+    )
+
+
+# cross process overlap guard, a run is skipped if another process is running the job
+# (e.g. a standalone runner and an embedded scheduler left on by mistake, or a leader
+# that lost its lock while a run was still going)
+def run_exclusive(func):
+    job_name = func.__name__
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        logger = log_utils.get_logger()
+        # autocommit, the lock is session level, no transaction is kept open for it
+        with engine.connect().execution_options(
+            isolation_level="AUTOCOMMIT"
+        ) as connection:
+            if not _try_advisory_lock(
+                connection, JOB_LOCK_NAMESPACE, "hashtext(:job)", job=job_name
+            ):
+                logger.warning("%s. Running in another process, run skipped", job_name)
+                job_skipped_runs_total.inc(job=job_name, reason="overlap")
+                return None
+
+            try:
+                return func(*args, **kwargs)
+            finally:
+                try:
+                    _advisory_unlock(
+                        connection, JOB_LOCK_NAMESPACE, "hashtext(:job)", job=job_name
+                    )
+                except SQLAlchemyError as exc:
+                    # lock is released with the lost connection
+                    logger.error(exc, exc_info=True)
+
+    return wrapper
+
+
+def job_skipped_listener(event: JobEvent):
+    logger = log_utils.get_logger()
+    if event.code == EVENT_JOB_MAX_INSTANCES:
+        logger.warning("%s. Previous run still going, run skipped", event.job_id)
+        job_skipped_runs_total.inc(job=event.job_id, reason="overlap")
+    else:
+        logger.warning("%s. Run missed its schedule, skipped", event.job_id)
+        job_skipped_runs_total.inc(job=event.job_id, reason="misfire")
+
+
+def create_scheduler():
+    scheduler = BackgroundScheduler(
+        executors={"default": ThreadPoolExecutor(settings.scheduler_max_workers)},
+        job_defaults=JOB_DEFAULTS,
+    )
+    for func, trigger_args, job_options in SCHEDULED_JOBS:
+        scheduler.add_job(
+            func=run_exclusive(func),
+            trigger=IntervalTrigger(**trigger_args),
+            id=func.__name__,
+            name=func.__name__,
+            **job_options,
+        )
+    scheduler.add_listener(
+        job_skipped_listener, EVENT_JOB_MAX_INSTANCES | EVENT_JOB_MISSED
+    )
+    return scheduler
+
+
+# leader election using a session level advisory lock held on a dedicated connection
+# every process (api worker or job runner) runs this, only the lock holder runs the
+# scheduler, the others retry and take over when the leader exits or is disconnected
+class SchedulerLeader:
+    def __init__(self, retry_interval: float):
+        self.retry_interval = retry_interval
+        self._connection: Connection | None = None
+        self._scheduler: BackgroundScheduler | None = None
+        self._stop_event = Event()
+        self._thread: Thread | None = None
+
+    @property
+    def is_leader(self):
+        return self._scheduler is not None
+
+    def _try_acquire(self):
+        connection = engine.connect().execution_options(isolation_level="AUTOCOMMIT")
+        try:
+            acquired = _try_advisory_lock(connection, LEADER_LOCK_NAMESPACE, "0")
+        except SQLAlchemyError:
+            connection.close()
+            raise
+
+        if not acquired:
+            connection.close()
+            return False
+
+        self._connection = connection
+        return True
+
+    def _is_connection_alive(self):
+        try:
+            self._connection.execute(text("SELECT 1"))  # type: ignore
+        except SQLAlchemyError:
+            return False
+        return True
+
+    def _start_scheduler(self):
+        self._scheduler = create_scheduler()
+        self._scheduler.start()
+        scheduler_is_leader.set(1)
+
+    def _stop_scheduler(self, wait: bool):
+        if self._scheduler is not None:
+            self._scheduler.shutdown(wait=wait)
+            self._scheduler = None
+        scheduler_is_leader.set(0)
+
+    def _release(self):
+        if self._connection is None:
+            return
+        try:
+            _advisory_unlock(self._connection, LEADER_LOCK_NAMESPACE, "0")
+        except SQLAlchemyError:
+            # connection is gone, and the lock with it
+            self._connection.invalidate()
+        finally:
+            self._connection.close()
+            self._connection = None
+
+    def _run(self):
+        logger = log_utils.get_logger()
+        while not self._stop_event.is_set():
+            try:
+                if self._connection is None:
+                    if self._try_acquire():
+                        self._start_scheduler()
+                        logger.info("Scheduler leader lock acquired, jobs started")
+                elif not self._is_connection_alive():
+                    # lock is lost with the connection, stop and compete again
+                    logger.warning("Scheduler leader lock lost, jobs stopped")
+                    self._stop_scheduler(wait=False)
+                    self._release()
+            except SQLAlchemyError as exc:
+                logger.error(exc, exc_info=True)
+
+            self._stop_event.wait(self.retry_interval)
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop_event.clear()
+        self._thread = Thread(target=self._run, name="scheduler-leader", daemon=True)
+        self._thread.start()
+
+    # running jobs are waited for before the lock is released
+    def stop(self):
+        if self._thread is not None:
+            self._stop_event.set()
+            self._thread.join()
+            self._thread = None
+        self._stop_scheduler(wait=True)
+        self._release()
@@ -0,0 +1,287 @@
+import mimetypes
+import os
+import shutil
+import uuid
+from abc import ABC, abstractmethod
+from pathlib import Path, PurePath
+from threading import Lock
+
+from app.config.app import settings
+
+# stored media never changes under a key (content addressed), let clients and CDNs keep it
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# appeal attachments are only meant for the user and moderators, don't let shared
+# caches keep them
+PRIVATE_CACHE_CONTROL = "private, max-age=31536000, immutable"
+# keys (and local paths) with this folder get the private cache policy
+PRIVATE_FOLDER = "appeals"
+# boto3 switches to multipart uploads above this size, parts are uploaded concurrently
+MULTIPART_THRESHOLD = 8 * 1024 * 1024
+MULTIPART_CHUNK_SIZE = 8 * 1024 * 1024
+
+
+def get_content_type(key: str):
+    return mimetypes.guess_type(key)[0] or "application/octet-stream"
+
+
+# same policy for objects served by the media app and by the object store
+def get_cache_control(key: str | os.PathLike):
+    if PRIVATE_FOLDER in PurePath(key).parts:
+        return PRIVATE_CACHE_CONTROL
+    return IMMUTABLE_CACHE_CONTROL
+
+
+# media storage interface, keys are "/" separated paths relative to the storage root
+# e.g. blobs/ab/cd/<sha256>.jpg
+class StorageBackend(ABC):
+    # worker processes (image derivatives) build their own backend from settings,
+    # backends that live only in this process must be used in process
+    shared_across_processes = True
+    # urls that stop working after a while (presigned), responses holding them are
+    # not cached
+    has_expiring_urls = False
+
+    @abstractmethod
+    def exists(self, key: str) -> bool:
+        raise NotImplementedError
+
+    # store a finished local file, the file may be moved instead of copied
+    @abstractmethod
+    def save_file(self, key: str, path: Path):
+        raise NotImplementedError
+
+    @abstractmethod
+    def save_bytes(self, key: str, data: bytes):
+        raise NotImplementedError
+
+    @abstractmethod
+    def read_bytes(self, key: str) -> bytes:
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete_many(self, keys: list[str]):
+        raise NotImplementedError
+
+    # url clients use to fetch the object
+    @abstractmethod
+    def get_url(self, key: str) -> str:
+        raise NotImplementedError
+
+
+class LocalStorage(StorageBackend):
+    def __init__(self, root: Path, url_prefix: str = "/images"):
+        self.root = root
+        self.url_prefix = url_prefix
+
+    def get_path(self, key: str):
+        return self.root / key
+
+    def exists(self, key: str) -> bool:
+        return self.get_path(key).exists()
+
+    # write next to the target and rename, readers never see a partial file
+    def _get_temp_path(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        return path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+
+    def save_file(self, key: str, path: Path):
+        target_path = self.get_path(key)
+        target_path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            path.replace(target_path)
+        except OSError:
+            # different filesystem, copy then rename
+            temp_path = self._get_temp_path(target_path)
+            try:
+                shutil.copyfile(path, temp_path)
+                temp_path.replace(target_path)
+            finally:
+                Path.unlink(temp_path, missing_ok=True)
+
+    def save_bytes(self, key: str, data: bytes):
+        target_path = self.get_path(key)
+        temp_path = self._get_temp_path(target_path)
+        try:
+            temp_path.write_bytes(data)
+            temp_path.replace(target_path)
+        finally:
+            Path.unlink(temp_path, missing_ok=True)
+
+    def read_bytes(self, key: str) -> bytes:
+        return self.get_path(key).read_bytes()
+
+    def delete_many(self, keys: list[str]):
+        for key in keys:
+            Path.unlink(self.get_path(key), missing_ok=True)
+
+    # served by the media app (app.media)
+    def get_url(self, key: str) -> str:
+        return f"{self.url_prefix}/{key}"
+
+
+# s3 compatible object store (aws s3, minio, r2, ...), needs boto3
+# reads are served straight from the bucket, using public_base_url (bucket website/CDN) when set,
+# presigned urls otherwise
+class S3Storage(StorageBackend):
+    def __init__(
+        self,
+        bucket: str,
+        endpoint_url: str | None = None,
+        region_name: str | None = None,
+        access_key_id: str | None = None,
+        secret_access_key: str | None = None,
+        public_base_url: str | None = None,
+        presigned_url_expire_seconds: int = 3600,
+    ):
+        # imported here so that local/memory setups don't pay the boto3 import cost
+        import boto3
+        from boto3.s3.transfer import TransferConfig
+        from botocore.exceptions import ClientError
+
+        self.bucket = bucket
+        self.public_base_url = public_base_url.rstrip("/") if public_base_url else None
+        self.presigned_url_expire_seconds = presigned_url_expire_seconds
+        self.has_expiring_urls = self.public_base_url is None
+        self.client = boto3.client(
+            "s3",
+            endpoint_url=endpoint_url,
+            region_name=region_name,
+            aws_access_key_id=access_key_id,
+            aws_secret_access_key=secret_access_key,
+        )
+        self.transfer_config = TransferConfig(
+            multipart_threshold=MULTIPART_THRESHOLD,
+            multipart_chunksize=MULTIPART_CHUNK_SIZE,
+        )
+        self.client_error = ClientError
+
+    def _get_extra_args(self, key: str):
+        return {
+            "ContentType": get_content_type(key),
+            "CacheControl": get_cache_control(key),
+        }
+
+    def exists(self, key: str) -> bool:
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=key)
+        except self.client_error as exc:
+            if exc.response.get("Error", {}).get("Code") in ("404", "NoSuchKey"):
+                return False
+            raise
+        return True
+
+    def save_file(self, key: str, path: Path):
+        self.client.upload_file(
+            str(path),
+            self.bucket,
+            key,
+            ExtraArgs=self._get_extra_args(key),
+            Config=self.transfer_config,
+        )
+
+    def save_bytes(self, key: str, data: bytes):
+        self.client.put_object(
+            Bucket=self.bucket, Key=key, Body=data, **self._get_extra_args(key)
+        )
+
+    def read_bytes(self, key: str) -> bytes:
+        response = self.client.get_object(Bucket=self.bucket, Key=key)
+        return response["Body"].read()
+
+    def delete_many(self, keys: list[str]):
+        # delete_objects takes upto 1000 keys per call, missing keys are not an error
+        for i in range(0, len(keys), 1000):
+            self.client.delete_objects(
+                Bucket=self.bucket,
+                Delete={
+                    "Objects": [{"Key": key} for key in keys[i : i + 1000]],
+                    "Quiet": True,
+                },
+            )
+
+    def get_url(self, key: str) -> str:
+        if self.public_base_url:
+            return f"{self.public_base_url}/{key}"
+        return self.client.generate_presigned_url(
+            "get_object",
+            Params={"Bucket": self.bucket, "Key": key},
+            ExpiresIn=self.presigned_url_expire_seconds,
+        )
+
+
+# in process stand-in for tests and local runs without disk or object store
+# keeps objects in a dict, urls look like local ones
+class InMemoryStorage(StorageBackend):
+    shared_across_processes = False
+
+    def __init__(self, url_prefix: str = "/images"):
+        self.url_prefix = url_prefix
+        self.objects: dict[str, bytes] = {}
+        self._lock = Lock()
+
+    def exists(self, key: str) -> bool:
+        return key in self.objects
+
+    def save_file(self, key: str, path: Path):
+        self.save_bytes(key, path.read_bytes())
+
+    def save_bytes(self, key: str, data: bytes):
+        with self._lock:
+            self.objects[key] = bytes(data)
+
+    def read_bytes(self, key: str) -> bytes:
+        try:
+            return self.objects[key]
+        except KeyError as exc:
+            raise FileNotFoundError(key) from exc
+
+    def delete_many(self, keys: list[str]):
+        with self._lock:
+            for key in keys:
+                self.objects.pop(key, None)
+
+    def get_url(self, key: str) -> str:
+        return f"{self.url_prefix}/{key}"
+
+
+storage: StorageBackend | None = None
+storage_lock = Lock()
+
+
+def create_storage() -> StorageBackend:
+    if settings.storage_backend == "s3":
+        return S3Storage(
+            bucket=str(settings.s3_bucket),
+            endpoint_url=settings.s3_endpoint_url,
+            region_name=settings.s3_region,
+            access_key_id=settings.s3_access_key_id,
+            secret_access_key=settings.s3_secret_access_key,
+            public_base_url=settings.s3_public_base_url,
+            presigned_url_expire_seconds=settings.s3_presigned_url_expire_seconds,
+        )
+    if settings.storage_backend == "memory":
+        return InMemoryStorage()
+    return LocalStorage(root=settings.image_folder)
+
+
+# backend configured by STORAGE_BACKEND (local, s3, memory), created once per process
+def get_storage() -> StorageBackend:
+    global storage
+
+    with storage_lock:
+        if storage is None:
+            storage = create_storage()
+    return storage
+
+
+# swap the backend, e.g. set_storage(InMemoryStorage()) in tests
+def set_storage(backend: StorageBackend | None):
+    global storage
+
+    with storage_lock:
+        storage = backend
+
+
+def is_local_storage():
+    return isinstance(get_storage(), LocalStorage)
+
@@ -0,0 +1,54 @@
+from fastapi import status
+
+from app.config.app import settings
+from app.models import post as post_model
+from app.models import user as user_model
+
+# visibility rules shared by the single and batch get endpoints of posts and profiles
+# each check returns None if the item can be shown, else (status code, detail)
+# 303 means the client has to be sent to the user profile instead
+
+
+def get_profile_url(username: str):
+    return settings.api_prefix + "/users/" + username + "/profile"
+
+
+# post_user is the post owner
+def check_post_visibility(
+    post: post_model.Post,
+    post_user: user_model.User,
+    curr_user_id,
+    is_follower: bool,
+):
+    # post owner is deactivated or deleted
+    if post_user.status in ("DAH", "PDH", "PBN", "PDB", "PDI", "DEL"):
+        return status.HTTP_303_SEE_OTHER, "Post owner profile is not available"
+
+    if post_user.id != curr_user_id:
+        # private account and current user is not a follower
+        if post_user.account_visibility == "PRV" and not is_follower:
+            return status.HTTP_303_SEE_OTHER, "Post owner account is private"
+        elif post.status == "BAN":
+            return status.HTTP_403_FORBIDDEN, "Requested post is banned"
+        elif post.status == "DRF":
+            return (
+                status.HTTP_403_FORBIDDEN,
+                "Not authorized to access requested resource",
+            )
+
+    return None
+
+
+# FLB posts are shown to other users with a tag and without their like state
+def is_post_flagged(post: post_model.Post, post_user: user_model.User, curr_user_id):
+    return post_user.id != curr_user_id and post.status == "FLB"
+
+
+# user is fetched excluding DEL, PDB and PDI
+def check_profile_visibility(user: user_model.User):
+    if user.status in ("DAH", "PDH"):
+        return status.HTTP_404_NOT_FOUND, "User profile not found"
+    elif user.status == "PBN":
+        return status.HTTP_403_FORBIDDEN, "User is banned, cannot access profile"
+
+    return None
@@ -0,0 +1,176 @@
+# micro-benchmark for per-response serialization cost of list endpoints
+# measures what fastapi does with the return value of a route:
+# old path, validated models re-validated through response_model + stdlib json response
+# current path, construct() models encoded without response_model + orjson response
+# run from project root: python -m scripts.bench_serialization
+import asyncio
+import timeit
+from uuid import uuid4
+
+import orjson
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from app.schemas import comment as comment_schema
+from app.schemas import post as post_schema
+
+NUM_ITEMS = 10
+REPEAT = 2000
+
+FEED_RESPONSE_FIELD = create_response_field(
+    name="feed_response", type_=dict[str, list[post_schema.PostUserFeedResponse]]
+)
+COMMENTS_RESPONSE_FIELD = create_response_field(
+    name="comments_response",
+    type_=dict[str, list[comment_schema.CommentResponse]],
+)
+
+
+# one loop for all runs, loop setup is not part of the measured path
+loop = asyncio.new_event_loop()
+
+
+# serialize_response and render as done by fastapi for a route's return value
+def render_response(content, field, response_class):
+    response_content = loop.run_until_complete(
+        serialize_response(field=field, response_content=content)
+    )
+    return response_class(content=response_content).body
+
+
+# fake rows shaped like the feed query results
+def make_feed_rows():
+    return [
+        {
+            "id": uuid4(),
+            "image": f"images/user/abc/posts/user_20240101000000_{i}.jpg",
+            "num_of_likes": i * 3,
+            "num_of_comments": i,
+            "profile_picture": "images/user/abc/profile/user.jpg",
+            "username": f"user_{i}",
+            "caption": "caption " * 10,
+            "posted_time_ago": "2 hours ago",
+            "curr_user_like": bool(i % 2),
+        }
+        for i in range(NUM_ITEMS)
+    ]
+
+
+def make_comment_rows():
+    return [
+        {
+            "id": uuid4(),
+            "profile_picture": "images/user/abc/profile/user.jpg",
+            "username": f"user_{i}",
+            "content": "comment " * 8,
+            "num_of_likes": i,
+            "commented_time_ago": "5 minutes ago",
+            "curr_user_like": bool(i % 2),
+        }
+        for i in range(NUM_ITEMS)
+    ]
+
+
+def feed_validated(rows):
+    posts = [
+        post_schema.PostUserFeedResponse(
+            id=row["id"],
+            image=row["image"],
+            num_of_likes=row["num_of_likes"],
+            num_of_comments=row["num_of_comments"],
+            post_user=post_schema.PostUserOutput(
+                profile_picture=row["profile_picture"], username=row["username"]
+            ),
+            caption=row["caption"],
+            posted_time_ago=row["posted_time_ago"],
+            curr_user_like=row["curr_user_like"],
+        )
+        for row in rows
+    ]
+    return render_response({"posts": posts}, FEED_RESPONSE_FIELD, JSONResponse)
+
+
+def feed_constructed(rows):
+    posts = [
+        post_schema.PostUserFeedResponse.construct(
+            id=row["id"],
+            image=row["image"],
+            num_of_likes=row["num_of_likes"],
+            num_of_comments=row["num_of_comments"],
+            post_user=post_schema.PostUserOutput.construct(
+                profile_picture=row["profile_picture"], username=row["username"]
+            ),
+            caption=row["caption"],
+            posted_time_ago=row["posted_time_ago"],
+            curr_user_like=row["curr_user_like"],
+        )
+        for row in rows
+    ]
+    return render_response({"posts": posts}, None, ORJSONResponse)
+
+
+def comments_validated(rows):
+    comments = [
+        comment_schema.CommentResponse(
+            id=row["id"],
+            comment_user=comment_schema.CommentUserOutput(
+                profile_picture=row["profile_picture"], username=row["username"]
+            ),
+            content=row["content"],
+            num_of_likes=row["num_of_likes"],
+            commented_time_ago=row["commented_time_ago"],
+            curr_user_like=row["curr_user_like"],
+            tag=None,
+        )
+        for row in rows
+    ]
+    return render_response(
+        {"comments": comments}, COMMENTS_RESPONSE_FIELD, JSONResponse
+    )
+
+
+def comments_constructed(rows):
+    comments = [
+        comment_schema.CommentResponse.construct(
+            id=row["id"],
+            comment_user=comment_schema.CommentUserOutput.construct(
+                profile_picture=row["profile_picture"], username=row["username"]
+            ),
+            content=row["content"],
+            num_of_likes=row["num_of_likes"],
+            commented_time_ago=row["commented_time_ago"],
+            curr_user_like=row["curr_user_like"],
+            tag=None,
+        )
+        for row in rows
+    ]
+    return render_response({"comments": comments}, None, ORJSONResponse)
+
+
+def run(name, func, rows):
+    elapsed = timeit.timeit(lambda: func(rows), number=REPEAT)
+    print(f"{name:<24} {elapsed / REPEAT * 1_000_000:10.1f} us/response")
+
+
+def main():
+    feed_rows = make_feed_rows()
+    comment_rows = make_comment_rows()
+
+    # sanity check, both paths must produce the same body
+    assert orjson.loads(feed_validated(feed_rows)) == orjson.loads(
+        feed_constructed(feed_rows)
+    )
+    assert orjson.loads(comments_validated(comment_rows)) == orjson.loads(
+        comments_constructed(comment_rows)
+    )
+
+    print(f"{NUM_ITEMS} items per response, {REPEAT} runs")
+    run("feed validated", feed_validated, feed_rows)
+    run("feed constructed", feed_constructed, feed_rows)
+    run("comments validated", comments_validated, comment_rows)
+    run("comments constructed", comments_constructed, comment_rows)
+
+
+if __name__ == "__main__":
+    main()